@@ -0,0 +1,322 @@
+# backend/analytics.py
+"""
+Columnar analytics over logged tutoring turns (see event_log.py).
+
+load_events() reads the event segments once into NumPy arrays with every
+string column dictionary-encoded to int32 codes. Submit events are also
+exploded into one row per required concept (concept code, missed yes/no), so
+every report below is a handful of np.bincount / np.unique group-bys instead
+of a Python loop over events.
+
+Reports:
+  concept_miss_rates()    per (module, concept), optionally split by question key or cohort
+  turns_to_completion()   histogram of submits needed before "advance", per question
+  skip_rates()            share of (session, question) attempts that ended in a skip
+
+Every event of a question must carry the same qkey (the app files them all
+under keyphrase_index.grounded_key), or one question's submits and skips
+land in different groups.
+
+CLI:
+  python -m backend.analytics [logs/events] [--top 20]
+  python -m backend.analytics --check      # mixed submit / skip log groups by question
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from backend.event_log import DEFAULT_DIR, FLAG_GIBBERISH, FLAG_UNCERTAIN, iter_events
+except Exception:
+    from event_log import DEFAULT_DIR, FLAG_GIBBERISH, FLAG_UNCERTAIN, iter_events
+
+KINDS = ("submit", "followup", "advance", "diagram", "skip", "bonus")
+_KIND_CODE = {k: i for i, k in enumerate(KINDS)}
+
+
+class _Encoder:
+    """String -> dense int code, remembering the dictionary."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __call__(self, s: str) -> int:
+        code = self.codes.get(s)
+        if code is None:
+            code = self.codes[s] = len(self.values)
+            self.values.append(s)
+        return code
+
+
+@dataclass
+class EventTable:
+    # one row per event
+    ts: np.ndarray          # float64
+    kind: np.ndarray        # int8, index into KINDS
+    session: np.ndarray     # int32 codes
+    cohort: np.ndarray      # int32 codes
+    module: np.ndarray      # int32 codes
+    question: np.ndarray    # int32 codes of "module:qkey"
+    flags: np.ndarray       # int8
+    # one row per (submit event, required concept)
+    c_event: np.ndarray     # int32 row index into the event columns
+    c_concept: np.ndarray   # int32 codes of "module:concept"
+    c_missed: np.ndarray    # bool
+
+    sessions: List[str]
+    cohorts: List[str]
+    modules: List[str]
+    questions: List[str]
+    concepts: List[str]
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+def load_events(directory: str = DEFAULT_DIR, events: Optional[Iterable[dict]] = None) -> EventTable:
+    """Build an EventTable from the segment files (or any iterable of event dicts)."""
+    enc_session, enc_cohort, enc_module, enc_question, enc_concept = (_Encoder() for _ in range(5))
+    ts: List[float] = []
+    kind: List[int] = []
+    session: List[int] = []
+    cohort: List[int] = []
+    module: List[int] = []
+    question: List[int] = []
+    flags: List[int] = []
+    c_event: List[int] = []
+    c_concept: List[int] = []
+    c_missed: List[bool] = []
+
+    for i, ev in enumerate(iter_events(directory) if events is None else events):
+        mod = ev.get("module", "")
+        ts.append(ev.get("ts", 0.0))
+        kind.append(_KIND_CODE.get(ev.get("kind"), -1))
+        session.append(enc_session(ev.get("session", "")))
+        cohort.append(enc_cohort(ev.get("cohort", "")))
+        module.append(enc_module(mod))
+        question.append(enc_question(f"{mod}:{ev.get('qkey', '')}"))
+        flags.append(ev.get("flags", 0))
+
+        required = ev.get("required") or ()
+        if required:
+            missing = set(ev.get("missing") or ())
+            for c in required:
+                c_event.append(i)
+                c_concept.append(enc_concept(f"{mod}:{c}"))
+                c_missed.append(c in missing)
+
+    return EventTable(
+        ts=np.asarray(ts, dtype=np.float64),
+        kind=np.asarray(kind, dtype=np.int8),
+        session=np.asarray(session, dtype=np.int32),
+        cohort=np.asarray(cohort, dtype=np.int32),
+        module=np.asarray(module, dtype=np.int32),
+        question=np.asarray(question, dtype=np.int32),
+        flags=np.asarray(flags, dtype=np.int8),
+        c_event=np.asarray(c_event, dtype=np.int32),
+        c_concept=np.asarray(c_concept, dtype=np.int32),
+        c_missed=np.asarray(c_missed, dtype=bool),
+        sessions=enc_session.values,
+        cohorts=enc_cohort.values,
+        modules=enc_module.values,
+        questions=enc_question.values,
+        concepts=enc_concept.values,
+    )
+
+
+# ---------- group-by helpers ----------
+
+def _group(*codes: np.ndarray):
+    """
+    Group rows by several int code columns at once. Codes are packed into one
+    int64 key, so this is a single np.unique. Returns (keys, inverse) where
+    keys[g, j] is the j-th column's code for group g.
+    """
+    radix = [int(c.max()) + 1 if len(c) else 1 for c in codes]
+    packed = codes[0].astype(np.int64)
+    for c, r in zip(codes[1:], radix[1:]):
+        packed = packed * r + c
+    uniq, inverse = np.unique(packed, return_inverse=True)
+
+    keys = np.empty((len(uniq), len(codes)), dtype=np.int64)
+    rest = uniq
+    for j in range(len(codes) - 1, 0, -1):
+        rest, keys[:, j] = np.divmod(rest, radix[j])
+    keys[:, 0] = rest
+    return keys, inverse.reshape(-1)
+
+
+def concept_miss_rates(t: EventTable, by: Optional[str] = None, exclude_flagged: bool = True) -> List[dict]:
+    """
+    Miss rate of each required concept over submit events, sorted worst first.
+    by=None | "question" | "cohort" adds that split.
+    Uncertain / gibberish submissions are excluded by default (they aren't attempts).
+    """
+    rows = np.ones(len(t.c_event), dtype=bool)
+    if exclude_flagged and len(rows):
+        ev_flags = t.flags[t.c_event]
+        rows = (ev_flags & (FLAG_UNCERTAIN | FLAG_GIBBERISH)) == 0
+
+    concept = t.c_concept[rows]
+    missed = t.c_missed[rows]
+    if not len(concept):
+        return []
+
+    cols = [concept]
+    if by == "question":
+        cols.append(t.question[t.c_event[rows]])
+    elif by == "cohort":
+        cols.append(t.cohort[t.c_event[rows]])
+    elif by is not None:
+        raise ValueError(f"unknown split: {by}")
+
+    uniq, inv = _group(*cols)
+    seen = np.bincount(inv, minlength=len(uniq))
+    misses = np.bincount(inv, weights=missed, minlength=len(uniq))
+    rate = misses / np.maximum(seen, 1)
+
+    out = []
+    for g in np.lexsort((-seen, -rate)):
+        module, name = t.concepts[uniq[g, 0]].split(":", 1)
+        row = {"module": module, "concept": name, "evaluated": int(seen[g]),
+               "missed": int(misses[g]), "miss_rate": float(rate[g])}
+        if by == "question":
+            row["qkey"] = t.questions[uniq[g, 1]].split(":", 1)[1]
+        elif by == "cohort":
+            row["cohort"] = t.cohorts[uniq[g, 1]]
+        out.append(row)
+    return out
+
+
+def turns_to_completion(t: EventTable) -> Dict[str, np.ndarray]:
+    """
+    For every question: histogram (index = number of submits) of how many
+    submits sessions needed before the tutor advanced. Skipped / unfinished
+    attempts are not counted.
+    """
+    if not len(t):
+        return {}
+    uniq, inv = _group(t.session, t.question)
+    n = len(uniq)
+    submits = np.bincount(inv, weights=t.kind == _KIND_CODE["submit"], minlength=n).astype(np.int64)
+    done = np.bincount(inv, weights=t.kind == _KIND_CODE["advance"], minlength=n) > 0
+
+    q_of_group = uniq[:, 1]
+    out: Dict[str, np.ndarray] = {}
+    for q in np.unique(q_of_group[done]):
+        sel = done & (q_of_group == q)
+        out[t.questions[q]] = np.bincount(submits[sel])
+    return out
+
+
+def skip_rates(t: EventTable) -> List[dict]:
+    """Per question: attempts (session touched it) and the share that were skipped."""
+    if not len(t):
+        return []
+    uniq, inv = _group(t.session, t.question)
+    n = len(uniq)
+    skipped = np.bincount(inv, weights=t.kind == _KIND_CODE["skip"], minlength=n) > 0
+
+    q_of_group = uniq[:, 1]
+    attempts = np.bincount(q_of_group, minlength=len(t.questions))
+    skips = np.bincount(q_of_group, weights=skipped, minlength=len(t.questions))
+
+    out = []
+    for q in np.flatnonzero(attempts):
+        module, qkey = t.questions[q].split(":", 1)
+        out.append({"module": module, "qkey": qkey, "attempts": int(attempts[q]),
+                    "skipped": int(skips[q]), "skip_rate": float(skips[q] / attempts[q])})
+    out.sort(key=lambda r: -r["skip_rate"])
+    return out
+
+
+# ---------- self-check ----------
+
+def self_check() -> int:
+    """
+    A mixed log for one module01 question, keyed the way the app keys it:
+    session A submits twice and advances, session B submits once and skips.
+    Both must land in one group: 2 attempts, 1 skipped, one completion in 2
+    submits.
+    """
+    try:
+        from backend.keyphrase_index import grounded_key
+        from backend.question_loader import load_module_bundle
+    except Exception:
+        from keyphrase_index import grounded_key
+        from question_loader import load_module_bundle
+
+    q = grounded_key("module01", 0, 0, load_module_bundle("module01").questions[0].get("q") or "")
+    events = [
+        {"ts": 1.0, "kind": "submit", "session": "A", "module": "module01", "qkey": q},
+        {"ts": 2.0, "kind": "followup", "session": "A", "module": "module01", "qkey": q},
+        {"ts": 3.0, "kind": "submit", "session": "B", "module": "module01", "qkey": q},
+        {"ts": 4.0, "kind": "followup", "session": "B", "module": "module01", "qkey": q},
+        {"ts": 5.0, "kind": "skip", "session": "B", "module": "module01", "qkey": q},
+        {"ts": 6.0, "kind": "submit", "session": "A", "module": "module01", "qkey": q},
+        {"ts": 7.0, "kind": "advance", "session": "A", "module": "module01", "qkey": q},
+    ]
+    table = load_events(events=events)
+    failures = []
+    skips = skip_rates(table)
+    want = [{"module": "module01", "qkey": q, "attempts": 2, "skipped": 1, "skip_rate": 0.5}]
+    if skips != want:
+        failures.append(f"skip_rates {skips} != {want}")
+    turns = {k: v.tolist() for k, v in turns_to_completion(table).items()}
+    if turns != {f"module01:{q}": [0, 0, 1]}:
+        failures.append(f"turns_to_completion {turns}")
+
+    for f in failures:
+        print(f"❌ {f}")
+    if not failures:
+        print(f"✅ submits and skips of module01 {q!r} group together")
+    return 1 if failures else 0
+
+
+# ---------- CLI ----------
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Concept miss rates and completion stats from the event log.")
+    ap.add_argument("directory", nargs="?", default=DEFAULT_DIR)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--by", choices=["question", "cohort"], default=None)
+    ap.add_argument("--check", action="store_true", help="self-check the per-question grouping")
+    args = ap.parse_args(argv)
+    if args.check:
+        return self_check()
+
+    t0 = time.perf_counter()
+    table = load_events(args.directory)
+    t1 = time.perf_counter()
+    misses = concept_miss_rates(table, by=args.by)
+    skips = skip_rates(table)
+    turns = turns_to_completion(table)
+    t2 = time.perf_counter()
+
+    print(f"📊 {len(table)} events, {len(table.c_event)} concept checks "
+          f"(load {t1 - t0:.2f}s, aggregate {t2 - t1:.3f}s)\n")
+
+    print("Most-missed required concepts:")
+    for r in misses[: args.top]:
+        split = f" [{r.get('qkey') or r.get('cohort')}]" if args.by else ""
+        print(f"  {r['miss_rate']:6.1%}  {r['module']} · {r['concept']}{split}  ({r['missed']}/{r['evaluated']})")
+
+    print("\nMost-skipped questions:")
+    for r in skips[: args.top]:
+        print(f"  {r['skip_rate']:6.1%}  {r['module']} · {r['qkey']}  ({r['skipped']}/{r['attempts']})")
+
+    print("\nMedian submits to complete:")
+    for q, hist in sorted(turns.items()):
+        counts = np.repeat(np.arange(len(hist)), hist)
+        print(f"  {q}: {float(np.median(counts)):.1f} (n={len(counts)})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
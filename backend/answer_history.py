@@ -0,0 +1,151 @@
+# backend/answer_history.py
+"""
+Append-only answer history for one question.
+
+The old approach rebuilt `prev + " " + ans` on every submit and re-matched
+the whole string. Here each submission is a segment analyzed once; for each
+spec we keep the set of concept needles seen so far, so a new turn only scans
+the new segment and merges its needle hits into the running coverage.
+The newest segment is scanned for every needle of the spec (not only the
+still-missing ones), so the same scan also yields its match spans.
+
+Coverage is the union over segments, so stems spread across several turns
+("uncontrolled" now, "proliferation" later) still count, just as they did
+with the concatenated string.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Set, Tuple
+
+try:
+    from backend.concept_check import (
+        ConceptMatch, TextAnalysis, Needle, analyze_text, needle_spans, needles_in, plan_matches, spec_plans,
+    )
+    from backend.input_guard import MAX_HISTORY_CHARS, guard_answer
+except Exception:
+    from concept_check import (
+        ConceptMatch, TextAnalysis, Needle, analyze_text, needle_spans, needles_in, plan_matches, spec_plans,
+    )
+    from input_guard import MAX_HISTORY_CHARS, guard_answer
+
+
+class _SpecCoverage:
+    """
+    Running needle coverage of one spec over the first `seen` segments, plus
+    where each needle sits in the newest segment.
+    """
+    __slots__ = ("seen", "needles", "found", "latest")
+
+    def __init__(self, needles: Set[Needle]):
+        self.seen = 0
+        self.needles = needles
+        self.found: Set[Needle] = set()
+        self.latest: Dict[Needle, Tuple[int, int]] = {}
+
+
+class AnswerHistory:
+    __slots__ = ("segments", "chars", "max_chars", "_analyses", "_coverage")
+
+    def __init__(self, segments: List[str] | None = None, max_chars: int = MAX_HISTORY_CHARS):
+        self.segments: List[str] = []
+        self.chars = 0
+        self.max_chars = max_chars
+        self._analyses: List[TextAnalysis] = []
+        self._coverage: Dict[str, _SpecCoverage] = {}
+        for seg in segments or []:
+            self.append(seg)
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def append(self, text: str) -> bool:
+        """
+        Add one submission. Text past the per-question budget (max_chars) is
+        cut, so memory and the one-off rescans on a new subpart stay bounded.
+        Returns False if nothing could be kept.
+        """
+        text = (text or "").strip()
+        room = self.max_chars - self.chars if self.max_chars > 0 else len(text)
+        if not text or room <= 0:
+            return False
+        if len(text) > room:
+            text = guard_answer(text, room).text
+        self.segments.append(text)
+        self.chars += len(text)
+        self._analyses.append(analyze_text(text))
+        return True
+
+    def text(self) -> str:
+        """The combined answer, for display/logging only (matching never needs it)."""
+        return " ".join(self.segments)
+
+    def missing(self, spec_key: str, spec: dict) -> Tuple[List[str], List[str]]:
+        """
+        (missing_required, missing_optional) for `spec`, analyzing only the
+        segments added since this spec was last checked.
+        """
+        required = spec.get("required_concepts", []) or []
+        optional = spec.get("optional_concepts", []) or []
+        plans = spec_plans(spec)
+
+        cov = self._spec_coverage(spec_key, spec)
+        last = len(self._analyses) - 1
+        if cov.seen <= last:
+            self._scan_older(cov, last)
+            cov.latest = needle_spans(self._analyses[last], cov.needles)
+            cov.found.update(cov.latest)
+        cov.seen = len(self._analyses)
+
+        missing_required = [c for c in required if not plans[c].satisfied(cov.found)]
+        missing_optional = [c for c in optional if not plans[c].satisfied(cov.found)]
+        return missing_required, missing_optional
+
+    def newest_unscanned(self, spec_key: str) -> bool:
+        """True when the newest segment hasn't been checked against this spec yet."""
+        cov = self._coverage.get(spec_key)
+        return bool(self._analyses) and (cov is None or cov.seen < len(self._analyses))
+
+    def absorb(self, spec_key: str, spec: dict, latest: Dict[Needle, Tuple[int, int]]):
+        """
+        Take the needle spans of the newest segment from a scan done elsewhere
+        (the eval service), so missing() / matches() don't rescan it. Older
+        segments not yet checked against this spec are still scanned here.
+        """
+        cov = self._spec_coverage(spec_key, spec)
+        last = len(self._analyses) - 1
+        if last < 0:
+            return
+        self._scan_older(cov, last)
+        cov.latest = {n: span for n, span in latest.items() if n in cov.needles}
+        cov.found.update(cov.latest)
+        cov.seen = len(self._analyses)
+
+    def _spec_coverage(self, spec_key: str, spec: dict) -> _SpecCoverage:
+        cov = self._coverage.get(spec_key)
+        if cov is None:
+            needles: Set[Needle] = set()
+            for plan in spec_plans(spec).values():
+                needles |= plan.needles()
+            cov = self._coverage[spec_key] = _SpecCoverage(needles)
+        return cov
+
+    def _scan_older(self, cov: _SpecCoverage, last: int):
+        """Fold segments seen..last-1 into `found`, looking only for still-missing needles."""
+        for i in range(cov.seen, last):
+            pending = cov.needles - cov.found
+            if not pending:
+                break
+            cov.found |= needles_in(self._analyses[i], pending)
+
+    def matches(self, spec_key: str, spec: dict) -> List[ConceptMatch]:
+        """
+        Spans in the newest segment for concepts that are covered, sorted by
+        start. Offsets index into self.segments[-1].
+        """
+        self.missing(spec_key, spec)
+        cov = self._coverage[spec_key]
+        out: List[ConceptMatch] = []
+        for c, plan in spec_plans(spec).items():
+            out.extend(plan_matches(c, plan, cov.found, cov.latest))
+        out.sort()
+        return out
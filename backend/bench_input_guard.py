@@ -0,0 +1,104 @@
+# backend/bench_input_guard.py
+"""
+Worst-case benchmark for oversized / pathological answers.
+
+Runs the per-submit text path (guard_answer -> classify_text ->
+AnswerHistory.append -> missing() for every module spec) on inputs from 1 KB
+to 512 KB and checks two things:
+  1. unguarded cost per character stays flat as input grows (linear matching)
+  2. with the default cap, a 512 KB paste costs about the same as a capped one
+
+Usage:
+  python -m backend.bench_input_guard [module01] [--max-kb 512]
+Exits 1 if either check fails.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+try:
+    from backend.answer_history import AnswerHistory
+    from backend.concept_check import classify_text, load_concept_spec
+    from backend.input_guard import MAX_ANSWER_CHARS, guard_answer
+except Exception:
+    from answer_history import AnswerHistory
+    from concept_check import classify_text, load_concept_spec
+    from input_guard import MAX_ANSWER_CHARS, guard_answer
+
+# per-char cost at the largest size may be at most this multiple of the smallest
+LINEAR_SLACK = 3.0
+# a capped huge paste may cost at most this multiple of a paste right at the cap
+GUARD_SLACK = 3.0
+
+PATTERNS: Dict[str, Callable[[int], str]] = {
+    "prose": lambda n: ("Cancer cells show uncontrolled proliferation after the loss of cell cycle control. " * (n // 84 + 1))[:n],
+    "one-char": lambda n: "a" * n,
+    "near-miss": lambda n: ("uncontrollen prolifera clona " * (n // 29 + 1))[:n],
+    "digits": lambda n: ("6.0 16.05 9.2 " * (n // 14 + 1))[:n],
+    "whitespace": lambda n: (" \t\n" * (n // 3 + 1))[:n] + "x",
+    "no-spaces": lambda n: ("sljgflsdakjfgqwpoeiruty" * (n // 23 + 1))[:n],
+}
+
+
+def run_turn(text: str, specs: dict, limit: int) -> None:
+    answer = guard_answer(text, limit).text
+    classify_text(answer)
+    history = AnswerHistory(max_chars=0)
+    history.append(answer)
+    for key, spec in specs.items():
+        if isinstance(spec, dict):
+            history.missing(key, spec)
+
+
+def time_turn(text: str, specs: dict, limit: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run_turn(text, specs, limit)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark worst-case answer sizes.")
+    ap.add_argument("module", nargs="?", default="module01")
+    ap.add_argument("--max-kb", type=int, default=512)
+    args = ap.parse_args(argv)
+
+    specs = load_concept_spec(args.module)
+    sizes = []
+    kb = 1
+    while kb < args.max_kb:
+        sizes.append(kb * 1024)
+        kb *= 4
+    sizes.append(args.max_kb * 1024)  # always end at --max-kb (the ×4 steps skip 512)
+
+    ok = True
+    print(f"{'pattern':<12}{'size':>9}{'unguarded ms':>15}{'ns/char':>10}{'guarded ms':>13}")
+    for name, make in PATTERNS.items():
+        per_char = []
+        guarded = []
+        for n in sizes:
+            text = make(n)
+            raw = time_turn(text, specs, limit=0)
+            capped = time_turn(text, specs, limit=MAX_ANSWER_CHARS)
+            per_char.append(raw / n * 1e9)
+            guarded.append(capped)
+            print(f"{name:<12}{n // 1024:>7}KB{raw * 1e3:>15.2f}{per_char[-1]:>10.1f}{capped * 1e3:>13.2f}")
+
+        if per_char[-1] > LINEAR_SLACK * max(per_char[0], 1.0):
+            print(f"  ❌ {name}: cost per char grew {per_char[-1] / per_char[0]:.1f}x")
+            ok = False
+        at_cap = time_turn(make(MAX_ANSWER_CHARS), specs, limit=MAX_ANSWER_CHARS)
+        if guarded[-1] > GUARD_SLACK * at_cap + 1e-3:
+            print(f"  ❌ {name}: capped {sizes[-1] // 1024}KB paste took {guarded[-1] * 1e3:.2f}ms vs {at_cap * 1e3:.2f}ms at the cap")
+            ok = False
+
+    print("✅ linear and bounded" if ok else "❌ worst-case check failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,259 @@
+# backend/bench_matcher.py
+"""
+Accuracy and speed of the concept matcher, measured together.
+
+Every change to concept_hit (stems, CHEM_TOKENS, numeric handling) or to
+the keyphrase extraction trades one against the other, so this harness
+reports both from one labeled corpus, modules/<id>/<id>_corpus.jsonl, one
+answer per line:
+
+  {"qkey": "3", "answer": "...", "expected": ["clonal origin", ...]}
+
+Each row is scored against the spec the tutor checks for that key (required
++ optional concepts): the answers.json spec, else the keyphrase_index spec.
+
+Only rows scored against a hand-written answers.json spec measure grading:
+their labels are what a grader would credit, not what the matcher says
+today, so the harness shows misses as well as false hits, and only they are
+gated. Rows scored against extracted keyphrases (module02 has no
+answers.json) are labeled with those same keyphrases; they are reported
+separately as a regression check on the extraction and never gated.
+
+Reports:
+  accuracy   precision / recall / F1 per concept, plus micro totals and
+             the macro F1 across concepts (answers.json rows)
+  keyphrase  the same for keyphrase-labeled rows (not gated)
+  speed      spec_matches() per answer (warm caches): answers/s and latency
+             p50 / p95 / p99
+
+Fails (exit 1) when a threshold is crossed:
+  --min-f1 / --min-recall          micro F1 / recall floors (answers.json rows)
+  --max-p95-ms / --min-rate        latency ceiling / throughput floor
+  --baseline FILE                  earlier --save output: also fail if micro F1
+                                   or recall drops by more than --max-drop, or
+                                   p95 grows past --max-slowdown × baseline
+                                   (default backend/bench/bench_matcher_baseline.json
+                                   when the default modules are benched; "" = off)
+
+Usage:
+  python -m backend.bench_matcher [module01 module02] [--save bench.json] [--baseline bench.json]
+  python -m backend.bench_matcher --save backend/bench/bench_matcher_baseline.json   # after an intended change
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from backend.concept_check import load_concept_spec, spec_matches
+    from backend.keyphrase_index import keyphrase_index
+except Exception:
+    from concept_check import load_concept_spec, spec_matches
+    from keyphrase_index import keyphrase_index
+
+DEFAULT_MODULES = ("module01", "module02")
+BASELINE = "backend/bench/bench_matcher_baseline.json"
+
+# floors / ceilings a little under the committed baseline (answers.json rows: F1 0.60,
+# recall 0.43; all rows: ~10k answers/s, p95 ~0.2 ms); raise them when the baseline is re-saved
+MIN_F1 = 0.58
+MIN_RECALL = 0.41
+MAX_P95_MS = 1.0
+MIN_RATE = 3000.0
+
+
+def load_corpus(module_id: str) -> List[dict]:
+    """Corpus rows with the tutor's spec for their key attached (rows without one are skipped).
+
+    "graded" is True when the spec is the hand-written answers.json one.
+    """
+    path = Path("modules") / module_id / f"{module_id}_corpus.jsonl"
+    specs = load_concept_spec(module_id)
+    rows = []
+    with path.open(encoding="utf-8") as fh:
+        for n, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            key = str(row["qkey"])
+            spec = specs.get(key)
+            graded = isinstance(spec, dict)
+            if not graded:
+                spec = keyphrase_index(module_id).get(key)  # what grounded_spec falls back to
+            if not isinstance(spec, dict):
+                print(f"⚠️ {path.name}:{n}: no spec for {key!r}, skipped")
+                continue
+            rows.append({**row, "module": module_id, "spec": spec, "graded": graded})
+    return rows
+
+
+def covered(spec: dict, answer: str) -> Tuple[List[str], float]:
+    """(concepts the matcher credits, seconds it took)."""
+    t0 = time.perf_counter()
+    missing_required, missing_optional, _matches = spec_matches(spec, answer)
+    elapsed = time.perf_counter() - t0
+    concepts = [*(spec.get("required_concepts") or []), *(spec.get("optional_concepts") or [])]
+    missing = set(missing_required) | set(missing_optional)
+    return [c for c in concepts if c not in missing], elapsed
+
+
+def _prf(tp: int, fp: int, fn: int) -> Tuple[float, float, float]:
+    p = tp / (tp + fp) if tp + fp else 1.0
+    r = tp / (tp + fn) if tp + fn else 1.0
+    f = 2 * p * r / (p + r) if p + r else 0.0
+    return p, r, f
+
+
+def score(rows: List[dict]) -> dict:
+    """Per-concept and overall accuracy of one pass over the corpus."""
+    counts: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0, 0])  # tp, fp, fn
+    errors = []
+    for row in rows:
+        got, _t = covered(row["spec"], row["answer"])
+        got_set, want = set(got), set(row["expected"])
+        concepts = [*(row["spec"].get("required_concepts") or []), *(row["spec"].get("optional_concepts") or [])]
+        for c in concepts:
+            k = (row["module"], c)
+            if c in got_set and c in want:
+                counts[k][0] += 1
+            elif c in got_set:
+                counts[k][1] += 1
+                errors.append(("FP", row, c))
+            elif c in want:
+                counts[k][2] += 1
+                errors.append(("FN", row, c))
+
+    per_concept = {}
+    for (module_id, c), (tp, fp, fn) in counts.items():
+        if tp + fp + fn == 0:
+            continue  # never expected, never matched: says nothing
+        p, r, f = _prf(tp, fp, fn)
+        per_concept[f"{module_id}:{c}"] = {"tp": tp, "fp": fp, "fn": fn, "precision": p, "recall": r, "f1": f}
+
+    tp = sum(v[0] for v in counts.values())
+    fp = sum(v[1] for v in counts.values())
+    fn = sum(v[2] for v in counts.values())
+    p, r, f = _prf(tp, fp, fn)
+    macro = sum(v["f1"] for v in per_concept.values()) / len(per_concept) if per_concept else 0.0
+    return {"precision": p, "recall": r, "f1": f, "macro_f1": macro, "tp": tp, "fp": fp, "fn": fn,
+            "per_concept": per_concept, "errors": errors}
+
+
+def _percentile(sorted_ms: List[float], p: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[min(len(sorted_ms) - 1, int(p / 100.0 * len(sorted_ms)))]
+
+
+def speed(rows: List[dict], repeat: int) -> dict:
+    for row in rows:  # warm concept_plan / index caches
+        covered(row["spec"], row["answer"])
+    lat = []
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            lat.append(covered(row["spec"], row["answer"])[1] * 1000.0)
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {"answers": len(lat), "rate": len(lat) / wall if wall else 0.0,
+            "p50_ms": _percentile(lat, 50), "p95_ms": _percentile(lat, 95), "p99_ms": _percentile(lat, 99),
+            "max_ms": lat[-1] if lat else 0.0}
+
+
+def _print_accuracy(title: str, acc: dict, show_all: bool) -> None:
+    print(title)
+    print(f"{'concept':<64}{'P':>6}{'R':>6}{'F1':>6}{'tp/fp/fn':>11}")
+    for name, v in sorted(acc["per_concept"].items(), key=lambda kv: (kv[1]["f1"], kv[0])):
+        if v["f1"] < 1.0 or show_all:
+            print(f"{name[:63]:<64}{v['precision']:>6.2f}{v['recall']:>6.2f}{v['f1']:>6.2f}"
+                  f"{v['tp']:>5}/{v['fp']}/{v['fn']}")
+    print(f"micro  P {acc['precision']:.3f}  R {acc['recall']:.3f}  F1 {acc['f1']:.3f}   macro F1 {acc['macro_f1']:.3f}"
+          f"   (tp {acc['tp']} fp {acc['fp']} fn {acc['fn']})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Concept-matcher accuracy + throughput on the labeled corpus.")
+    ap.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    ap.add_argument("--repeat", type=int, default=50, help="timing passes over the corpus")
+    ap.add_argument("--min-f1", type=float, default=MIN_F1)
+    ap.add_argument("--min-recall", type=float, default=MIN_RECALL)
+    ap.add_argument("--max-p95-ms", type=float, default=MAX_P95_MS)
+    ap.add_argument("--min-rate", type=float, default=MIN_RATE)
+    ap.add_argument("--baseline", default=None,
+                    help=f"earlier --save output to compare against (default {BASELINE} for the default modules)")
+    ap.add_argument("--max-drop", type=float, default=0.02, help="allowed F1 / recall drop vs baseline")
+    ap.add_argument("--max-slowdown", type=float, default=1.5, help="allowed p95 growth factor vs baseline")
+    ap.add_argument("--save", default="")
+    ap.add_argument("--errors", action="store_true", help="list every false hit / miss")
+    ap.add_argument("--all", action="store_true", help="show every concept, not just imperfect ones")
+    args = ap.parse_args(argv)
+    if args.baseline is None:
+        args.baseline = BASELINE if sorted(args.modules) == sorted(DEFAULT_MODULES) and Path(BASELINE).exists() else ""
+
+    rows = [row for m in args.modules for row in load_corpus(m)]
+    if not rows:
+        print("no corpus rows")
+        return 1
+    graded = [row for row in rows if row["graded"]]
+    keyphrase_rows = [row for row in rows if not row["graded"]]
+    acc = score(graded)
+    kp_acc = score(keyphrase_rows) if keyphrase_rows else None
+    spd = speed(rows, args.repeat)
+
+    print(f"{len(rows)} answers ({', '.join(args.modules)})")
+    _print_accuracy(f"answers.json specs: {len(graded)} answers, {len(acc['per_concept'])} concepts", acc, args.all)
+    if kp_acc is not None:
+        _print_accuracy(f"keyphrase specs (extraction regression, not gated): {len(keyphrase_rows)} answers, "
+                        f"{len(kp_acc['per_concept'])} concepts", kp_acc, args.all)
+    print(f"speed  {spd['rate']:.0f} answers/s   p50 {spd['p50_ms']:.3f} ms  p95 {spd['p95_ms']:.3f} ms  "
+          f"p99 {spd['p99_ms']:.3f} ms  max {spd['max_ms']:.3f} ms")
+
+    if args.errors:
+        for kind, row, c in [*acc["errors"], *(kp_acc["errors"] if kp_acc else [])]:
+            print(f"  {kind} {row['module']} q{row['qkey']} {c!r}: {row['answer'][:90]}")
+
+    failures = []
+    if not graded:
+        print("⚠️ no answers.json-labeled rows: accuracy not gated")
+    elif acc["f1"] < args.min_f1:
+        failures.append(f"micro F1 {acc['f1']:.3f} < {args.min_f1}")
+    if graded and acc["recall"] < args.min_recall:
+        failures.append(f"recall {acc['recall']:.3f} < {args.min_recall}")
+    if spd["p95_ms"] > args.max_p95_ms:
+        failures.append(f"p95 {spd['p95_ms']:.3f} ms > {args.max_p95_ms} ms")
+    if spd["rate"] < args.min_rate:
+        failures.append(f"{spd['rate']:.0f} answers/s < {args.min_rate}")
+    if args.baseline:
+        print(f"baseline {args.baseline}")
+        base = json.loads(Path(args.baseline).read_text())
+        for key in ("f1", "recall"):
+            if graded and acc[key] < base["accuracy"][key] - args.max_drop:
+                failures.append(f"{key} {acc[key]:.3f} dropped from {base['accuracy'][key]:.3f}")
+        if spd["p95_ms"] > base["speed"]["p95_ms"] * args.max_slowdown:
+            failures.append(f"p95 {spd['p95_ms']:.3f} ms vs baseline {base['speed']['p95_ms']:.3f} ms")
+        now = {**acc["per_concept"], **(kp_acc["per_concept"] if kp_acc else {})}
+        was = {**base["accuracy"]["per_concept"], **base.get("keyphrase_accuracy", {}).get("per_concept", {})}
+        lost = [c for c, v in was.items() if v["recall"] == 1.0 and now.get(c, {}).get("recall", 1.0) < 1.0]
+        if lost:
+            print(f"⚠️ no longer fully recognized: {', '.join(lost)}")
+
+    if args.save:
+        out = {"modules": args.modules, "accuracy": {k: v for k, v in acc.items() if k != "errors"}, "speed": spd}
+        if kp_acc is not None:
+            out["keyphrase_accuracy"] = {k: v for k, v in kp_acc.items() if k != "errors"}
+        Path(args.save).write_text(json.dumps(out, indent=1))
+        print(f"💾 saved to {args.save}")
+
+    for f in failures:
+        print(f"❌ {f}")
+    if not failures:
+        print("✅ accuracy and speed within thresholds")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,100 +1,302 @@
 # backend/concept_check.py
-from typing import List
+from typing import Dict, List, NamedTuple, Set, Tuple
 import re
+from bisect import bisect_right
 import json
 from pathlib import Path
 from functools import lru_cache
-from biochem_concepts import BIO_CONCEPTS
+# Robust imports (works whether you run as package or loose files)
+try:
+    from backend.concept_index import concept_index
+    from backend.numeric_match import NumericIndex, NumericRule, concept_numbers, index_numbers, numeric_rule, strip_numbers
+except Exception:
+    from concept_index import concept_index
+    from numeric_match import NumericIndex, NumericRule, concept_numbers, index_numbers, numeric_rule, strip_numbers
 
 print("✅ concept_check.py loaded (v2025-11-xx qid+1 fix)")
 
 def normalize(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "").lower().strip())
 
-def concept_hit(concept: str, student_answer: str, domain: str | None = None) -> bool:
+CHEM_TOKENS = {"cooh", "nh3", "nh2", "nterm", "cterm", "imidazole"}  # extend as needed
+
+class TextAnalysis(NamedTuple):
     """
-    Returns True if the student's answer matches a concept,
-    using the base phrase + any variants from BIO_CONCEPTS[domain].
+    The forms of a student's text that matching looks at. Built once per
+    answer (or answer segment) and reused for every concept.
+    """
+    lower: str   # answer.lower()                      -> stems (form "word": at a word start), formula digits
+    norm: str    # whitespace-collapsed lower          -> short phrases
+    alnum: str   # lower with non [a-z0-9] removed     -> chem tokens (NH3+ -> nh3)
+    numbers: NumericIndex  # tokenized numbers + units -> numeric targets
+    origin: Tuple[int, ...] | None = None  # lower index -> answer index, only when .lower() changed the length
+
+def _lower_origin(text: str) -> Tuple[int, ...]:
+    """For each char of text.lower(), the index of the char of `text` it came from (+ the end)."""
+    out: List[int] = []
+    for i, ch in enumerate(text):
+        out.extend([i] * len(ch.lower()))  # e.g. "İ" lowers to 2 chars
+    out.append(len(text))
+    return tuple(out)
+
+def analyze_text(student_answer: str) -> TextAnalysis:
+    text = student_answer or ""
+    lower = text.lower()
+    return TextAnalysis(
+        lower=lower,
+        norm=normalize(student_answer),
+        alnum=re.sub(r"[^a-z0-9]+", "", lower),
+        numbers=index_numbers(text),
+        # lower() never drops chars, so equal lengths mean offsets line up
+        origin=None if len(lower) == len(text) else _lower_origin(text),
+    )
+
+# A needle is (form, substring): "form" names the TextAnalysis field to search.
+# For form "numbers" the "substring" is a NumericTarget looked up in the index.
+Needle = Tuple[str, str]
+
+class ConceptPlan(NamedTuple):
+    """
+    concept_hit() as data: every needle in `gate` must be present, and then
+    at least one alternative must have all of its needles present.
+    labels[i] is the phrase / variant alternative i came from.
     """
-    student = student_answer.lower()
+    gate: Tuple[Needle, ...]
+    alts: Tuple[Tuple[Needle, ...], ...]
+    labels: Tuple[str, ...] = ()
+
+    def needles(self) -> Set[Needle]:
+        out = set(self.gate)
+        for alt in self.alts:
+            out.update(alt)
+        return out
+
+    def satisfied(self, found: Set[Needle]) -> bool:
+        return all(n in found for n in self.gate) and any(
+            all(n in found for n in alt) for alt in self.alts
+        )
+
+    def first_alt(self, found) -> int:
+        """Index of the first satisfied alternative, or -1."""
+        if not all(n in found for n in self.gate):
+            return -1
+        for i, alt in enumerate(self.alts):
+            if all(n in found for n in alt):
+                return i
+        return -1
+
+@lru_cache(maxsize=4096)
+def concept_plan(concept: str, domain: str | None = None, rule: NumericRule | None = None) -> ConceptPlan:
+    """
+    Precompute what concept_hit() looks for; cached per (concept, domain, rule).
+    `rule` is the spec's numeric tolerance/unit for this concept, if any.
+    """
+    gate: Tuple[Needle, ...] = ()
+    alts: List[Tuple[Needle, ...]] = []
+    labels: List[str] = []
 
-    # numeric concept support (e.g., "6.0", "9.2", "1.8")
+    # numeric concept support (e.g., "6.0", "9.2", "1.8e-5", "-30.5 kJ/mol")
     if any(ch.isdigit() for ch in (concept or "")):
-        nums = re.findall(r"\d+(?:\.\d+)?", concept)
-        if nums:
+        targets, glued = concept_numbers(concept, rule)
+        if targets or glued:
             # if any required number is missing, fail
-            if not all(n in student for n in nums):
-                return False
+            gate = tuple(("numbers", t) for t in targets) + tuple(("lower", n) for n in glued)
 
-            # ✅ if the concept is basically just a number (no letters), accept immediately
-            if not re.search(r"[a-zA-Z]", concept):
-                return True
+            # ✅ if the concept is basically just a number (no letters besides
+            # units / exponents), accept immediately
+            if not re.search(r"[a-zA-Z]", strip_numbers(concept)):
+                return ConceptPlan(gate, ((),), (concept,))
 
     # ✅ short-phrase support (e.g., "more than half", "net charge")
     norm_concept = normalize(concept)
-    norm_student = normalize(student_answer)
 
     # If the concept is short / has no long words, allow direct phrase match
     words = re.findall(r"[a-zA-Z]+", norm_concept)
     long_words = [w for w in words if len(w) > 4]
-
-    if norm_concept and (norm_concept in norm_student) and (len(long_words) == 0):
-        return True
+    if norm_concept and len(long_words) == 0:
+        alts.append((("norm", norm_concept),))
+        labels.append(concept)
 
     # collect all phrases to test: main concept + variants
     phrases = [concept]
-    if domain and domain in BIO_CONCEPTS:
-        phrases.extend(BIO_CONCEPTS[domain].get(concept, []))
-
-    phrases = [p for p in phrases if p]
-    if not phrases:
-        return False
-
-    CHEM_TOKENS = {"cooh", "nh3", "nh2", "nterm", "cterm", "imidazole"}  # extend as needed
+    # declared domain first; concepts from other domains still get their variants
+    phrases.extend(concept_index().variants(concept, domain))
 
     for phrase in phrases:
+        if not phrase:
+            continue
         pl = phrase.lower()
 
-        # 1) Original long-word stem match (unchanged behavior)
-        words = [w for w in re.findall(r"[a-z]+", pl) if len(w) > 4]
-        stems = [w[:5] for w in words]
-        long_ok = stems and all(stem in student for stem in stems)
+        # 1) Original long-word stem match, anchored at a word start
+        #    ("favor" matches "favorable", not "unfavorable")
+        stems = [w[:5] for w in re.findall(r"[a-z]+", pl) if len(w) > 4]
+        if stems:
+            alts.append(tuple(("word", stem) for stem in stems))
+            labels.append(phrase)
 
-        # 2) NEW: short chemistry token match (only if present in the phrase)
-        # Normalize student so NH3+ matches as 'nh3'
-        student_norm = re.sub(r"[^a-z0-9]+", "", student)
+        # 2) Short chemistry token match (only if present in the phrase)
         phrase_norm = re.sub(r"[^a-z0-9]+", "", pl)
+        tokens = sorted(tok for tok in CHEM_TOKENS if tok in phrase_norm)
+        if tokens:
+            alts.append(tuple(("alnum", tok) for tok in tokens))
+            labels.append(phrase)
+
+    return ConceptPlan(gate, tuple(alts), tuple(labels))
+
+def word_find(s: str, sub: str, start: int = 0, end: int | None = None) -> int:
+    """s.find(sub), but only hits that start a word (no letter / digit right before them)."""
+    end = len(s) if end is None else end
+    i = s.find(sub, start, end)
+    while i > 0 and s[i - 1].isalnum():
+        i = s.find(sub, i + 1, end)
+    return i
+
+def needles_in(analysis: TextAnalysis, needles) -> Set[Needle]:
+    """The subset of needles that occur in the analyzed text."""
+    return {n for n in needles
+            if (word_find(analysis.lower, n[1]) >= 0 if n[0] == "word" else n[1] in getattr(analysis, n[0]))}
+
+# ---------- match spans (for highlighting / logging which variant hit) ----------
+
+class ConceptMatch(NamedTuple):
+    start: int      # offsets into the answer text
+    end: int
+    concept: str
+    variant: str    # the phrase / variant whose needles matched
+
+Span = Tuple[int, int]
+
+# how "norm" / "alnum" positions map back: runs kept, and the separator length between runs
+_RUNS = {"norm": (re.compile(r"\S+"), 1), "alnum": (re.compile(r"[a-z0-9]+"), 0)}
+_WORD_TAIL = re.compile(r"[a-z0-9]*")
+
+def _offset_map(lower: str, form: str):
+    pattern, sep = _RUNS[form]
+    form_starts, lower_starts = [], []
+    pos = 0
+    for m in pattern.finditer(lower):
+        form_starts.append(pos)
+        lower_starts.append(m.start())
+        pos += m.end() - m.start() + sep
+    return form_starts, lower_starts
+
+def _to_lower(offsets, i: int) -> int:
+    form_starts, lower_starts = offsets
+    k = bisect_right(form_starts, i) - 1
+    return lower_starts[k] + (i - form_starts[k])
+
+def needle_spans(analysis: TextAnalysis, needles) -> Dict[Needle, Span]:
+    """
+    Like needles_in(), but keeps where each needle was first found, as
+    (start, end) in the answer. Same one find() per needle; the offset maps
+    for "norm"/"alnum" are only built when one of those needles hits.
+    Spans are found in the lowercased text and mapped back to the original
+    when lowercasing changed its length.
+    """
+    out: Dict[Needle, Span] = {}
+    maps = {}
+    lower = analysis.lower
+    for n in needles:
+        form, sub = n
+        if form == "numbers":
+            span = analysis.numbers.locate(sub)
+            if span is not None:
+                out[n] = span
+            continue
+        i = word_find(lower, sub) if form == "word" else getattr(analysis, form).find(sub)
+        if i < 0:
+            continue
+        if form in ("word", "lower"):
+            # stems highlight the whole word ("uncon" -> "uncontrolled")
+            start = i
+            while start > 0 and lower[start - 1].isalnum():
+                start -= 1
+            out[n] = (start, _WORD_TAIL.match(lower, i + len(sub)).end())
+        else:
+            offsets = maps.get(form)
+            if offsets is None:
+                offsets = maps[form] = _offset_map(lower, form)
+            out[n] = (_to_lower(offsets, i), _to_lower(offsets, i + len(sub) - 1) + 1)
+        origin = analysis.origin
+        if origin is not None:
+            start, end = out[n]
+            out[n] = (origin[start], origin[end - 1] + 1)
+    return out
+
+def plan_matches(concept: str, plan: ConceptPlan, found, spans: Dict[Needle, Span]) -> List[ConceptMatch]:
+    """
+    Spans for `concept`: the needles of its first satisfied alternative (and
+    its gate) that occur in `spans`. `found` decides coverage; it may be wider
+    than `spans` (e.g. needles seen in earlier answers).
+    """
+    i = plan.first_alt(found)
+    if i < 0:
+        return []
+    variant = plan.labels[i] if i < len(plan.labels) else concept
+    return [ConceptMatch(*spans[n], concept, variant) for n in (*plan.gate, *plan.alts[i]) if n in spans]
+
+def spec_plans(spec: dict) -> Dict[str, ConceptPlan]:
+    """{concept: plan} for every required + optional concept of a spec."""
+    domain = spec.get("concept_domain")
+    required = spec.get("required_concepts", []) or []
+    optional = spec.get("optional_concepts", []) or []
+    return {c: concept_plan(c, domain, numeric_rule(spec, c)) for c in (*required, *optional)}
 
-        token_hits = []
-        for tok in CHEM_TOKENS:
-            if tok in phrase_norm:
-                token_hits.append(tok in student_norm)
+def concept_hit_analyzed(concept: str, analysis: TextAnalysis, domain: str | None = None,
+                         rule: NumericRule | None = None) -> bool:
+    plan = concept_plan(concept, domain, rule)
+    found = needles_in(analysis, plan.needles())
+    return plan.satisfied(found)
 
-        short_ok = (len(token_hits) > 0) and all(token_hits)
+def concept_hit(concept: str, student_answer: str, domain: str | None = None) -> bool:
+    """
+    Returns True if the student's answer matches a concept,
+    using the base phrase + any variants from BIO_CONCEPTS (declared domain
+    first, then any other domain that defines the concept).
+    """
+    return concept_hit_analyzed(concept, analyze_text(student_answer), domain)
 
-        if long_ok or short_ok:
-            return True
+_SPEC_MTIMES: Dict[str, int] = {}  # module_id -> answers.json mtime when load_concept_spec() read it
 
-    return False
+def _spec_mtime(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
 
 @lru_cache(maxsize=16)
 def load_concept_spec(module_id: str):
     path = Path(f"modules/{module_id}/{module_id}_answers.json")
     print("📌 loading answers spec from:", path.resolve(), "exists:", path.exists())
+    _SPEC_MTIMES[module_id] = _spec_mtime(path)
     if not path.exists():
         return {}
     return json.loads(path.read_text(encoding="utf-8"))
 
-def evaluate_concepts(module_id: str, qid: int, student_answer: str, part_idx: int = 0, stem: str | None = None):
+def refresh_concept_spec(module_id: str) -> bool:
+    """
+    Drop the cached specs if this module's answers.json changed on disk since
+    it was loaded (one stat() call). Call once per app run instead of
+    clearing the cache, so edits still show up but every click doesn't
+    reload the file (and rebuild the matchers keyed by its spec dicts).
+    """
+    loaded = _SPEC_MTIMES.get(module_id)
+    if loaded is None or loaded == _spec_mtime(Path(f"modules/{module_id}/{module_id}_answers.json")):
+        return False
+    load_concept_spec.cache_clear()
+    _SPEC_MTIMES.clear()
+    return True
+
+def question_key(qid: int, part_idx: int = 0, stem: str | None = None) -> str:
     """
+    answers.json-style key for a pointer, e.g. "21a".
+
     qid is 0-based question index from pointer (0,1,2,...)
 
     If stem starts with an explicit question number like "21.", we use that number
     to find JSON keys like "21a", "21b", etc.
     Otherwise we fall back to qid+1.
     """
-    spec_all = load_concept_spec(module_id)
-
     # --- Prefer explicit question number from the stem ("21.", "21)", etc.) ---
     qnum_from_stem = None
     if stem:
@@ -110,78 +312,195 @@ def evaluate_concepts(module_id: str, qid: int, student_answer: str, part_idx: i
         pi = 0
     letter = chr(97 + pi)  # 0->a,1->b,...
 
-    part_key = f"{qnum_str}{letter}"
-    spec = spec_all.get(part_key)
-    if not isinstance(spec, dict):
-        spec = spec_all.get(qnum_str)
+    return f"{qnum_str}{letter}"
 
-    if not isinstance(spec, dict):
-        return [], [], {}
+def resolve_spec(module_id: str, qid: int, part_idx: int = 0, stem: str | None = None):
+    """
+    Find the answers.json entry for a pointer: the part key ("21a") if present,
+    else the whole-question key ("21"). Returns (spec_key, spec) or (None, {}).
+    """
+    spec_all = load_concept_spec(module_id)
 
-    domain = spec.get("concept_domain")
-    required = spec.get("required_concepts", []) or []
-    optional = spec.get("optional_concepts", []) or []
+    part_key = question_key(qid, part_idx, stem)
+    qnum_str = part_key[:-1]
+    spec = spec_all.get(part_key)
+    if isinstance(spec, dict):
+        return part_key, spec
+    spec = spec_all.get(qnum_str)
+    if isinstance(spec, dict):
+        return qnum_str, spec
+    return None, {}
 
-    missing_required = [c for c in required if not concept_hit(c, student_answer, domain)]
-    missing_optional = [c for c in optional if not concept_hit(c, student_answer, domain)]
-    print("🔎 looking for keys:", part_key, "or", qnum_str, "available:", list(spec_all.keys())[:15])
+def evaluate_concepts(module_id: str, qid: int, student_answer: str, part_idx: int = 0, stem: str | None = None):
+    """
+    Returns (missing_required, missing_optional, spec) for the spec that
+    resolve_spec() picks for this pointer.
+    """
+    _key, spec = resolve_spec(module_id, qid, part_idx, stem)
+    if not spec:
+        return [], [], {}
 
+    missing_required, missing_optional = missing_for_spec(spec, student_answer)
     return missing_required, missing_optional, spec
 
-def is_uncertain(text: str) -> bool:
+def missing_for_spec(spec: dict, student_answer: str):
+    """(missing_required, missing_optional) for an already-resolved spec."""
+    missing_required, missing_optional, _matches = spec_matches(spec, student_answer)
+    return missing_required, missing_optional
+
+def spec_matches(spec: dict, student_answer: str):
     """
-    Detects when a student expresses uncertainty.
+    (missing_required, missing_optional, matches) from one scan of the
+    answer: the needle positions that decide coverage are also the spans
+    returned for highlighting, sorted by start.
     """
-    t = text.strip().lower()
-    unsure = [
-        "i don't know",
-        "idk",
-        "not sure",
-        "i am not sure",
-        "no idea",
-        "i'm unsure",
-        "unsure",
-        "i'm confused",
-        "i am confused"
-    ]
-    return any(u in t for u in unsure)
-
+    required = spec.get("required_concepts", []) or []
+    optional = spec.get("optional_concepts", []) or []
+    plans = spec_plans(spec)
+
+    needles: Set[Needle] = set()
+    for plan in plans.values():
+        needles |= plan.needles()
+    spans = needle_spans(analyze_text(student_answer), needles)
+
+    missing_required = [c for c in required if not plans[c].satisfied(spans)]
+    missing_optional = [c for c in optional if not plans[c].satisfied(spans)]
+    matches: List[ConceptMatch] = []
+    for c, plan in plans.items():
+        matches.extend(plan_matches(c, plan, spans, spans))
+    matches.sort()
+    return missing_required, missing_optional, matches
+
+UNSURE_PHRASES = (
+    "i don't know",
+    "idk",
+    "not sure",
+    "i am not sure",
+    "no idea",
+    "i'm unsure",
+    "unsure",
+    "i'm confused",
+    "i am confused",
+)
+_UNSURE_RE = re.compile("|".join(re.escape(u) for u in UNSURE_PHRASES))
 _WORD = re.compile(r"[a-zA-Z]{2,}")
-
-def is_gibberish(text: str) -> bool:
+# ASCII text (the common case) counts letters with one C-level translate
+_DROP_ASCII_NONALPHA = str.maketrans("", "", "".join(chr(c) for c in range(128) if not chr(c).isalpha()))
+
+class TextSignals(NamedTuple):
+    """Everything the uncertainty / gibberish guardrails look at, computed once."""
+    uncertain: bool
+    gibberish: bool
+    length: int        # stripped length
+    letters: int       # alphabetic characters
+    vowels: int        # a/e/i/o/u (lowercased)
+    words: int         # runs of 2+ ASCII letters
+    longest_word: int
+
+def _signals(t: str, low: str):
+    """(uncertain, letters, vowels, words, longest_word) for stripped text / its lowercase."""
+    uncertain = _UNSURE_RE.search(low) is not None
+    if t.isascii():
+        letters = len(t.translate(_DROP_ASCII_NONALPHA))
+    else:
+        letters = sum(map(str.isalpha, t))
+    vowels = low.count("a") + low.count("e") + low.count("i") + low.count("o") + low.count("u")
+    words = _WORD.findall(low)
+    return uncertain, letters, vowels, len(words), max(map(len, words), default=0)
+
+def _gibberish_rule(length: int, uncertain: bool, letters: int, vowels: int, words: int, longest: int) -> bool:
     """
     Heuristic: catches keyboard mashing / random strings.
     Returns True for low-signal inputs like 'sljgf;lsdakjfg'.
     """
-    t = (text or "").strip()
-    if not t:
+    if not length:
         return True
 
     # very short answers aren't necessarily gibberish ("idk" is uncertainty)
-    if len(t) < 4:
+    if length < 4:
         return False
 
     # If it contains "idk"/"don't know" etc, let uncertainty logic handle it
-    if is_uncertain(t):
+    if uncertain:
         return False
 
     # Ratio of alphabetic characters
-    letters = sum(ch.isalpha() for ch in t)
-    if letters / max(1, len(t)) < 0.5:
+    if letters / max(1, length) < 0.5:
         return True
 
     # Tokenize into "words"
-    words = _WORD.findall(t.lower())
-    if len(words) == 0:
+    if words == 0:
         return True
 
     # Keyboard mash tends to be 1 long "word" with few vowels
-    vowels = sum(ch in "aeiou" for ch in t.lower())
-    if len(t) >= 10 and vowels / max(1, letters) < 0.25:
+    if length >= 10 and vowels / max(1, letters) < 0.25:
         return True
 
     # If the average "word" is extremely long and there are very few words
-    if len(words) <= 1 and max(len(w) for w in words) >= 12:
+    if words <= 1 and longest >= 12:
         return True
 
     return False
+
+def classify_text(text: str) -> TextSignals:
+    """
+    One call per submission: strips and lowercases once, then computes every
+    signal with a single scan each (C-level regex / translate / map rather
+    than Python per-character loops).
+    """
+    t = (text or "").strip()
+    low = t.lower()
+    uncertain, letters, vowels, words, longest = _signals(t, low)
+    gibberish = _gibberish_rule(len(t), uncertain, letters, vowels, words, longest)
+    return TextSignals(uncertain, gibberish, len(t), letters, vowels, words, longest)
+
+def classify_batch(texts):
+    """
+    Bulk form for re-grading / analytics. Features are extracted per text,
+    then the decision rules run vectorized over NumPy columns.
+    Returns a dict of arrays keyed like TextSignals' fields.
+    """
+    import numpy as np
+
+    n = len(texts)
+    length = np.empty(n, dtype=np.int64)
+    feats = np.empty((n, 5), dtype=np.int64)
+    for i, text in enumerate(texts):
+        t = (text or "").strip()
+        length[i] = len(t)
+        feats[i] = _signals(t, t.lower())
+
+    uncertain = feats[:, 0].astype(bool)
+    letters, vowels, words, longest = feats[:, 1], feats[:, 2], feats[:, 3], feats[:, 4]
+
+    judged = (length >= 4) & ~uncertain
+    rule = (
+        (letters / np.maximum(1, length) < 0.5)
+        | (words == 0)
+        | ((length >= 10) & (vowels / np.maximum(1, letters) < 0.25))
+        | ((words <= 1) & (longest >= 12))
+    )
+    gibberish = (length == 0) | (judged & rule)
+
+    return {
+        "uncertain": uncertain,
+        "gibberish": gibberish,
+        "length": length,
+        "letters": letters,
+        "vowels": vowels,
+        "words": words,
+        "longest_word": longest,
+    }
+
+def is_uncertain(text: str) -> bool:
+    """
+    Detects when a student expresses uncertainty.
+    """
+    return _UNSURE_RE.search(text.strip().lower()) is not None
+
+def is_gibberish(text: str) -> bool:
+    """
+    Heuristic: catches keyboard mashing / random strings.
+    Prefer classify_text() when you also need is_uncertain().
+    """
+    return classify_text(text).gibberish
@@ -0,0 +1,103 @@
+# backend/concept_index.py
+"""
+Cross-domain inverted index over BIO_CONCEPTS.
+
+BIO_CONCEPTS is grouped by domain, so a spec that names a concept from
+another domain (an amino_acids concept inside an acid_base question) used to
+get no variants at all. The index is built once from every domain:
+
+  phrase (normalized concept name or variant) -> ((canonical, domain), ...)
+  (domain, canonical)                          -> variants tuple
+
+Variant strings are interned and identical variant tuples are stored once,
+so synonyms repeated across domains cost one copy.
+"""
+from __future__ import annotations
+
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple
+
+try:
+    from backend.biochem_concepts import BIO_CONCEPTS
+except Exception:
+    from biochem_concepts import BIO_CONCEPTS
+
+
+def _key(phrase: str) -> str:
+    return re.sub(r"\s+", " ", (phrase or "").lower().strip())
+
+
+class ConceptEntry(NamedTuple):
+    canonical: str
+    domain: str
+
+
+class ConceptIndex:
+    __slots__ = ("_phrases", "_variants")
+
+    def __init__(self, concepts: Dict[str, Dict[str, List[str]]]):
+        phrases: Dict[str, List[ConceptEntry]] = {}
+        variants: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        shared: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+        for domain, table in concepts.items():
+            domain = sys.intern(domain)
+            for canonical, vs in table.items():
+                canonical = sys.intern(canonical)
+                vs = tuple(sys.intern(v) for v in (vs or []) if isinstance(v, str))
+                variants[(domain, canonical)] = shared.setdefault(vs, vs)
+
+                entry = ConceptEntry(canonical, domain)
+                for phrase in (canonical, *vs):
+                    bucket = phrases.setdefault(sys.intern(_key(phrase)), [])
+                    if entry not in bucket:
+                        bucket.append(entry)
+
+        self._phrases = {k: tuple(v) for k, v in phrases.items()}
+        self._variants = variants
+
+    def lookup(self, phrase: str) -> Tuple[ConceptEntry, ...]:
+        """Every (canonical, domain) the phrase names, as a concept or a variant."""
+        return self._phrases.get(_key(phrase), ())
+
+    def domains(self, concept: str) -> Tuple[str, ...]:
+        """Domains that define `concept` as a canonical name."""
+        return tuple(e.domain for e in self.lookup(concept) if e.canonical == concept)
+
+    def variants(self, concept: str, domain: str | None = None) -> Tuple[str, ...]:
+        """
+        Variants for `concept`. The declared domain wins when it has the
+        concept (exactly as before); otherwise the concept's entries in any
+        domain are merged, and a phrase that is itself a variant brings in its
+        canonical concept and that concept's variants.
+        """
+        own = self._variants.get((domain, concept))
+        if own is not None:
+            return own
+
+        entries = self.lookup(concept)
+        if not entries:
+            return ()
+        named = [e for e in entries if e.canonical == concept]
+        out: Dict[str, None] = {}
+        for e in named or entries:
+            if e.canonical != concept:
+                out[e.canonical] = None
+            for v in self._variants[(e.domain, e.canonical)]:
+                out[v] = None
+        out.pop(concept, None)
+        return tuple(out)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "phrases": len(self._phrases),
+            "concepts": len(self._variants),
+            "variant_tuples": len({id(v) for v in self._variants.values()}),
+        }
+
+
+@lru_cache(maxsize=1)
+def concept_index() -> ConceptIndex:
+    return ConceptIndex(BIO_CONCEPTS)
@@ -0,0 +1,395 @@
+# backend/eval_service.py
+"""
+Optional local evaluation service: concept matching in worker processes.
+
+Matching normally runs in the Streamlit script thread, competing with page
+rendering for the GIL. With this service running, the app sends each new
+answer segment over a Unix-domain socket to a pool of worker processes that
+have every module spec and concept plan preloaded. A worker scans only that
+segment for the needles of the question's spec; the app folds the spans
+into the question's AnswerHistory, whose running coverage decides what is
+still missing. On timeout or error the app scans the segment in-process
+(AnswerHistory.missing), so the result is the same either way.
+
+Protocol: frames of 4-byte big-endian length + UTF-8 JSON.
+  request   {"id": 7, "items": [[module_id, qid, part_idx, stem, segment], ...]}
+  response  {"id": 7, "results": [[spec_key, [[form, needle, start, end], ...]], ...]}
+            or {"id": 7, "error": "..."}
+            spans index into the segment; spec_key "" = no spec for that question;
+            for form "numbers" the needle is a NumericTarget as a list of its fields
+
+Requests from all connections are coalesced for `batch_window` seconds and
+split evenly across the workers, so many small evaluations cost a few IPC
+round trips rather than one each.
+
+Usage:
+  python -m backend.eval_service [--socket /tmp/bc351-eval.sock] [--workers 4] [module01 module02 …]
+  python -m backend.eval_service --check     # remote path vs in-process on sample answers
+App side:
+  BC351_EVAL_SOCKET=/tmp/bc351-eval.sock      (unset = always in-process)
+  BC351_EVAL_TIMEOUT_MS=50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+try:
+    from backend.answer_history import AnswerHistory
+    from backend.concept_check import Needle, analyze_text, load_concept_spec, needle_spans, spec_plans
+    from backend.keyphrase_index import grounded_spec, keyphrase_index
+    from backend.numeric_match import NumericTarget
+    from backend.question_loader import load_module_bundle
+except Exception:
+    from answer_history import AnswerHistory
+    from concept_check import Needle, analyze_text, load_concept_spec, needle_spans, spec_plans
+    from keyphrase_index import grounded_spec, keyphrase_index
+    from numeric_match import NumericTarget
+    from question_loader import load_module_bundle
+
+EVAL_SOCKET = os.environ.get("BC351_EVAL_SOCKET", "")
+EVAL_TIMEOUT_MS = float(os.environ.get("BC351_EVAL_TIMEOUT_MS", "50"))
+DEFAULT_SOCKET = "/tmp/bc351-eval.sock"
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME = 16 << 20
+
+
+class SegmentScan(NamedTuple):
+    spec_key: str                            # "" when the question has no spec
+    spans: Dict[Needle, Tuple[int, int]]     # every spec needle found in the segment
+
+
+# ---------- framing ----------
+
+def send_frame(sock: socket.socket, obj: Any):
+    body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("eval socket closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> Any:
+    (n,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if n > MAX_FRAME:
+        raise ValueError(f"frame too large: {n}")
+    return json.loads(_recv_exact(sock, n).decode("utf-8"))
+
+
+# ---------- evaluation (runs in workers, and in-process as the fallback) ----------
+
+def scan_segment(module_id: str, qid: int, part_idx: int, stem: str, segment: str) -> SegmentScan:
+    """Where each needle of the question's spec occurs in one answer segment."""
+    spec_key, spec = grounded_spec(module_id, qid, part_idx, stem)
+    if not spec:
+        return SegmentScan("", {})
+    needles: Set[Needle] = set()
+    for plan in spec_plans(spec).values():
+        needles |= plan.needles()
+    return SegmentScan(spec_key, needle_spans(analyze_text(segment), needles))
+
+
+def _needle(form: str, sub: Any) -> Needle:
+    """A needle back from JSON: numeric targets arrive as lists and must be hashable again."""
+    return (form, NumericTarget(*sub) if form == "numbers" else sub)
+
+
+def _eval_batch(items: Sequence[Sequence[Any]]) -> List[list]:
+    out = []
+    for module_id, qid, part_idx, stem, segment in items:
+        scan = scan_segment(module_id, int(qid), int(part_idx or 0), stem or "", segment or "")
+        out.append([scan.spec_key, [[form, sub, start, end] for (form, sub), (start, end) in scan.spans.items()]])
+    return out
+
+
+def _init_worker(module_ids: Sequence[str]):
+    """Preload specs and compile every concept plan once per worker."""
+    for module_id in module_ids:
+        for spec in (load_concept_spec(module_id) or keyphrase_index(module_id)).values():
+            if isinstance(spec, dict):
+                spec_plans(spec)
+
+
+# ---------- server ----------
+
+class EvalServer:
+    def __init__(self, path: str = DEFAULT_SOCKET, workers: int = os.cpu_count() or 2,
+                 module_ids: Sequence[str] = (), batch_window: float = 0.002, max_batch: int = 256):
+        self.path = path
+        self.workers = max(1, workers)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(tuple(module_ids),))
+        self._jobs: "queue.Queue[Tuple[list, Any]]" = queue.Queue()  # (items, reply callback)
+        self._closed = False
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        srv.bind(self.path)
+        os.chmod(self.path, 0o660)
+        srv.listen(128)
+        threading.Thread(target=self._dispatch_loop, name="eval-dispatch", daemon=True).start()
+        print(f"✅ eval service on {self.path} with {self.workers} workers")
+        try:
+            while not self._closed:
+                conn, _ = srv.accept()
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            srv.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.pool.shutdown(cancel_futures=True)
+
+    def _handle(self, conn: socket.socket):
+        write_lock = threading.Lock()
+
+        def reply(obj):
+            with write_lock:
+                try:
+                    send_frame(conn, obj)
+                except OSError:
+                    pass
+
+        with conn:
+            while True:
+                try:
+                    req = recv_frame(conn)
+                except (ConnectionError, OSError, ValueError):
+                    return
+                rid = req.get("id")
+                items = req.get("items") or []
+                if not items:
+                    reply({"id": rid, "results": []})
+                    continue
+                self._jobs.put((items, lambda results, rid=rid: reply(
+                    {"id": rid, "error": results} if isinstance(results, str) else {"id": rid, "results": results}
+                )))
+
+    def _dispatch_loop(self):
+        while not self._closed:
+            jobs = [self._jobs.get()]
+            count = len(jobs[0][0])
+            until = time.monotonic() + self.batch_window
+            while count < self.max_batch:
+                left = until - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    job = self._jobs.get(timeout=left)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                count += len(job[0])
+
+            items = [it for its, _cb in jobs for it in its]
+            step = max(1, -(-len(items) // self.workers))
+            chunks = [items[i:i + step] for i in range(0, len(items), step)]
+            futures = [self.pool.submit(_eval_batch, chunk) for chunk in chunks]
+            threading.Thread(target=self._collect, args=(jobs, futures), daemon=True).start()
+
+    @staticmethod
+    def _collect(jobs, futures):
+        try:
+            results = [r for f in futures for r in f.result()]
+        except Exception as e:
+            for _items, cb in jobs:
+                cb(repr(e))
+            return
+        pos = 0
+        for its, cb in jobs:
+            cb(results[pos:pos + len(its)])
+            pos += len(its)
+
+
+# ---------- client ----------
+
+class EvalClient:
+    """
+    One connection per calling thread. After a failure the service is
+    skipped for `retry_after` seconds, so a dead service costs one timeout,
+    not one per click. Only the newest segment of an answer history is ever
+    sent; earlier segments are already folded into its coverage.
+    """
+
+    def __init__(self, path: str, timeout: float = EVAL_TIMEOUT_MS / 1000.0, retry_after: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._local = threading.local()
+        self._down_until = 0.0
+        self._ids = 0
+        self.stats = {"remote": 0, "fallback": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _sock(self) -> socket.socket:
+        s = getattr(self._local, "sock", None)
+        if s is None:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            s.settimeout(self.timeout)
+            s.connect(self.path)
+            self._local.sock = s
+        return s
+
+    def _drop(self):
+        s = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if s is not None:
+            s.close()
+
+    def scan_many(self, items: List[Tuple[str, int, int, str, str]]) -> List[SegmentScan]:
+        """Remote segment scans; raises on timeout / error (no fallback here)."""
+        with self._stats_lock:
+            self._ids += 1
+            rid = self._ids
+        try:
+            sock = self._sock()
+            send_frame(sock, {"id": rid, "items": [list(it) for it in items]})
+            resp = recv_frame(sock)
+        except Exception:
+            self._drop()  # a late reply would desync the stream
+            raise
+        if resp.get("id") != rid or "error" in resp:
+            self._drop()
+            raise RuntimeError(resp.get("error") or "eval response out of order")
+        return [SegmentScan(key, {_needle(form, sub): (start, end) for form, sub, start, end in spans})
+                for key, spans in resp["results"]]
+
+    def scan_newest(self, history: AnswerHistory, module_id: str, qid: int, part_idx: int, stem: str,
+                    spec_key: str, spec: dict) -> bool:
+        """
+        Scan the newest segment of `history` remotely and fold the spans into
+        its coverage for `spec_key`. False when that didn't happen (service
+        down, nothing new, or the service resolved another spec); the
+        history's missing() / matches() then scan the segment in-process.
+        """
+        if not spec or not history.newest_unscanned(spec_key):
+            return False
+        if time.monotonic() >= self._down_until:
+            try:
+                scan = self.scan_many([(module_id, qid, part_idx or 0, stem or "", history.segments[-1])])[0]
+            except Exception:
+                self._down_until = time.monotonic() + self.retry_after
+            else:
+                if scan.spec_key == spec_key:
+                    history.absorb(spec_key, spec, scan.spans)
+                    self._count("remote")
+                    return True
+        self._count("fallback")
+        return False
+
+
+# ---------- self-check ----------
+
+# (module, question index, answer segments): word stems, a numeric target (module01 Q4, "80–90%"),
+# a multi-segment history, and a keyphrase spec (module02)
+CHECK_CASES = [
+    ("module01", 3, ["about 80-90%"]),
+    ("module01", 0, ["cells divide without control", "and they form a tumor"]),
+    ("module01", 13, ["water is polar and hydrogen bonds", "it has a high specific heat"]),
+    ("module02", 0, ["the reaction is favorable when free energy is decreasing"]),
+]
+
+
+def self_check(workers: int = 1) -> int:
+    """
+    Run CHECK_CASES through a throwaway service and in-process. Fails unless
+    every segment went the remote path and both give the same missing
+    concepts and spans.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="bc351-eval-"), "eval.sock")
+    server = EvalServer(path, workers, sorted({m for m, _qi, _segs in CHECK_CASES}))
+    threading.Thread(target=server.serve_forever, name="eval-check", daemon=True).start()
+    deadline = time.monotonic() + 10.0
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    client = EvalClient(path, timeout=10.0, retry_after=0.0)  # cold workers: generous timeout
+
+    failures = []
+    segments = numeric = 0
+    for module_id, qi, segs in CHECK_CASES:
+        stem = load_module_bundle(module_id).questions[qi].get("q") or ""
+        spec_key, spec = grounded_spec(module_id, qi, 0, stem)
+        if not spec:
+            failures.append(f"{module_id} Q{qi + 1}: no spec")
+            continue
+        remote, local = AnswerHistory(), AnswerHistory()
+        for seg in segs:
+            remote.append(seg)
+            local.append(seg)
+            segments += 1
+            if client.scan_newest(remote, module_id, qi, 0, stem, spec_key, spec):
+                numeric += any(n[0] == "numbers" for n in remote._coverage[spec_key].latest)
+            else:
+                failures.append(f"{module_id} Q{qi + 1}: {seg!r} fell back to in-process")
+            got = (remote.missing(spec_key, spec), remote.matches(spec_key, spec))
+            want = (local.missing(spec_key, spec), local.matches(spec_key, spec))
+            if got != want:
+                failures.append(f"{module_id} Q{qi + 1}: {seg!r}: remote {got} != in-process {want}")
+
+    print(f"{segments} segments, stats {client.stats}, {numeric} with numeric matches")
+    if client.stats["remote"] == 0:
+        failures.append("nothing went the remote path")
+    if numeric == 0:
+        failures.append("no numeric match came back from the service")
+    for f in failures:
+        print(f"❌ {f}")
+    if not failures:
+        print("✅ remote and in-process evaluation agree")
+    return 1 if failures else 0
+
+
+@lru_cache(maxsize=1)
+def eval_client() -> Optional[EvalClient]:
+    """Process-wide client for BC351_EVAL_SOCKET, or None when the service isn't configured."""
+    return EvalClient(EVAL_SOCKET) if EVAL_SOCKET else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Run the concept-evaluation service on a Unix socket.")
+    ap.add_argument("modules", nargs="*", help="modules to preload (default: every modules/* folder)")
+    ap.add_argument("--socket", default=EVAL_SOCKET or DEFAULT_SOCKET)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--window-ms", type=float, default=2.0)
+    ap.add_argument("--check", action="store_true",
+                    help="self-check: run sample answers (incl. a numeric one) through a throwaway service and in-process")
+    args = ap.parse_args(argv)
+    if args.check:
+        return self_check()
+
+    modules = args.modules or sorted(p.name for p in Path("modules").iterdir() if p.is_dir())
+    server = EvalServer(args.socket, args.workers, modules, batch_window=args.window_ms / 1000.0)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
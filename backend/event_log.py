@@ -0,0 +1,159 @@
+# backend/event_log.py
+"""
+Append-only log of tutoring turns.
+
+log() is the only call on the click path: it appends one tuple to an
+in-memory ring buffer (collections.deque — atomic under the GIL, no lock, no
+I/O). A background writer drains the buffer every `flush_interval` seconds
+and appends the batch to the current segment file as one gzip member of JSON
+lines. Segments rotate once they pass `segment_bytes`, so finished segments
+can be shipped or analyzed while the app keeps writing.
+
+Record fields:
+  ts, kind, session, cohort, module, qkey, missing, required, elapsed_ms, flags, matched
+kind is one of: submit, followup, advance, diagram, skip, bonus.
+flags is a bitmask of FLAG_UNCERTAIN / FLAG_GIBBERISH / FLAG_CORRECT.
+matched lists [concept, variant] pairs the submitted answer matched.
+
+If the buffer fills faster than the writer drains it, the oldest events are
+dropped (and counted in `dropped`) rather than slowing the app down.
+"""
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_DIR = os.environ.get("BC351_EVENT_DIR", "logs/events")
+COHORT = os.environ.get("BC351_COHORT", "")
+
+FLAG_UNCERTAIN = 1
+FLAG_GIBBERISH = 2
+FLAG_CORRECT = 4
+
+FIELDS = ("ts", "kind", "session", "cohort", "module", "qkey", "missing", "required", "elapsed_ms", "flags", "matched")
+
+
+class EventLog:
+    def __init__(
+        self,
+        directory: str = DEFAULT_DIR,
+        capacity: int = 65536,
+        flush_interval: float = 1.0,
+        segment_bytes: int = 8 << 20,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.dropped = 0
+
+        self._buf: deque = deque(maxlen=capacity)
+        self._segment: Path | None = None
+        self._closed = False
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # ---------- hot path ----------
+    def log(
+        self,
+        kind: str,
+        module_id: str,
+        qkey: str,
+        *,
+        session: str = "",
+        missing: Sequence[str] = (),
+        required: Sequence[str] = (),
+        elapsed_ms: float = 0.0,
+        flags: int = 0,
+        matched: Sequence[Tuple[str, str]] = (),
+    ):
+        if len(self._buf) >= self.capacity:
+            self.dropped += 1
+        self._buf.append((time.time(), kind, session, COHORT, module_id, qkey,
+                          missing, required, elapsed_ms, flags, matched))
+
+    # ---------- writer ----------
+    def _next_segment(self) -> Path:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return self.directory / f"events-{stamp}-{os.getpid()}.jsonl.gz"
+
+    def flush(self) -> int:
+        """Drain the buffer into the current segment. Returns events written."""
+        with self._flush_lock:
+            batch: List[tuple] = []
+            pop = self._buf.popleft
+            try:
+                while True:
+                    batch.append(pop())
+            except IndexError:
+                pass
+            if not batch:
+                return 0
+
+            lines = []
+            for rec in batch:
+                row = dict(zip(FIELDS, rec))
+                row["missing"] = list(row["missing"])
+                row["required"] = list(row["required"])
+                row["matched"] = [list(p) for p in row["matched"]]
+                lines.append(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+
+            if self._segment is None or (
+                self._segment.exists() and self._segment.stat().st_size >= self.segment_bytes
+            ):
+                self._segment = self._next_segment()
+
+            # one complete gzip member per batch: every segment stays readable mid-write
+            with gzip.open(self._segment, "ab", compresslevel=6) as fh:
+                fh.write(data)
+            return len(batch)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print("⚠️ event log flush failed:", e)
+
+
+# ---------- reading ----------
+
+def segment_files(directory: str = DEFAULT_DIR) -> List[Path]:
+    return sorted(Path(directory).glob("events-*.jsonl.gz"))
+
+
+def iter_events(directory: str = DEFAULT_DIR) -> Iterator[Dict[str, Any]]:
+    """Stream every logged event, oldest segment first."""
+    for path in segment_files(directory):
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+@lru_cache(maxsize=1)
+def default_log() -> EventLog:
+    """Process-wide event log shared by every Streamlit session."""
+    return EventLog(DEFAULT_DIR)
@@ -0,0 +1,229 @@
+# backend/export.py
+"""
+Columnar export of tutoring data for offline analysis (pandas / Polars).
+
+Writes three tables into an output folder:
+  turns           one row per logged event (event_log segments)
+  concept_checks  one row per (submit, required concept) with missed yes/no
+  messages        one row per transcript message, text materialized from the
+                  stored session snapshots (session_store); a question or
+                  follow-up whose reference no longer resolves (content
+                  edited since) is kept, with the raw reference as its text
+
+Formats: Parquet (default) or Arrow IPC stream (.arrows) when pyarrow is
+installed, CSV otherwise. pyarrow is in requirements.txt; without it every
+format falls back to CSV. Rows are streamed and written in chunks of
+`chunk_rows`, so memory stays bounded by one chunk regardless of term size.
+Repeated string columns (module, question key, concept, kind, role, …) are
+written dictionary-encoded.
+
+Usage:
+  python -m backend.export exports/ [--format parquet|arrow|csv]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV fallback
+    pa = None
+    pq = None
+
+try:
+    from backend.event_log import DEFAULT_DIR as EVENT_DIR, iter_events
+    from backend.session_store import DEFAULT_DB
+    from backend.transcript import Transcript
+    from backend.question_loader import load_module_bundle
+except Exception:
+    from event_log import DEFAULT_DIR as EVENT_DIR, iter_events
+    from session_store import DEFAULT_DB
+    from transcript import Transcript
+    from question_loader import load_module_bundle
+
+CHUNK_ROWS = 65536
+
+# column name -> type tag: "dict" (dictionary-encoded string), "str", "f64", "i32", "bool"
+TURNS = {
+    "ts": "f64", "kind": "dict", "session": "dict", "cohort": "dict", "module": "dict",
+    "qkey": "dict", "n_required": "i32", "n_missing": "i32", "elapsed_ms": "f64", "flags": "i32",
+}
+CONCEPT_CHECKS = {
+    "ts": "f64", "session": "dict", "module": "dict", "qkey": "dict", "concept": "dict", "missed": "bool",
+}
+MESSAGES = {
+    "student": "dict", "module": "dict", "updated_at": "f64", "seq": "i32",
+    "role": "dict", "kind": "dict", "text": "str",
+}
+
+
+# ---------- row sources ----------
+
+def turn_rows(events: Iterable[dict]) -> Iterator[Tuple[str, tuple]]:
+    """Split the event stream into ("turns", row) and ("concept_checks", row) tuples."""
+    for ev in events:
+        required = ev.get("required") or []
+        missing = ev.get("missing") or []
+        ts, session, module, qkey = ev.get("ts", 0.0), ev.get("session", ""), ev.get("module", ""), ev.get("qkey", "")
+        yield "turns", (ts, ev.get("kind", ""), session, ev.get("cohort", ""), module, qkey,
+                        len(required), len(missing), float(ev.get("elapsed_ms", 0.0)), int(ev.get("flags", 0)))
+        if required:
+            miss = set(missing)
+            for c in required:
+                yield "concept_checks", (ts, session, module, qkey, c, c in miss)
+
+
+def message_rows(db_path: str) -> Iterator[tuple]:
+    """Transcript messages from the session store, one SQLite row at a time."""
+    if not Path(db_path).exists():
+        return
+    conn = sqlite3.connect(db_path)
+    try:
+        for student, module_id, updated_at, payload in conn.execute(
+            "SELECT student, module_id, updated_at, payload FROM sessions ORDER BY module_id, student"
+        ):
+            try:
+                snap = json.loads(payload)
+                transcript = Transcript.from_dict(snap["messages"])
+                bundle = load_module_bundle(module_id)
+            except Exception:
+                continue
+            for seq, entry in enumerate(transcript.entries):
+                try:
+                    role, text = transcript.render_entry(bundle, entry)
+                except Exception:  # stale reference (answers.json / questions edited since): keep the row
+                    ref = list(entry[1]) if entry[0] == "f" else list(entry[1:])  # as to_dict stores it
+                    role, text = "tutor", f"[unresolved {json.dumps(ref)}]"
+                yield (student, module_id, updated_at, seq, role,
+                       {"q": "question", "f": "followup"}.get(entry[0], "text"), text)
+    finally:
+        conn.close()
+
+
+# ---------- chunked writers ----------
+
+class _TableWriter:
+    def __init__(self, path_stem: Path, columns: Dict[str, str], fmt: str, chunk_rows: int):
+        self.columns = columns
+        self.names = list(columns)
+        self.fmt = fmt
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._buf: List[tuple] = []
+        self._writer = None
+        self._fh = None
+
+        if fmt == "csv" or pa is None:
+            self.path = path_stem.with_suffix(".csv")
+            self._fh = self.path.open("w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._fh)
+            self._writer.writerow(self.names)
+            return
+
+        self.schema = pa.schema([(name, self._arrow_type(tag)) for name, tag in columns.items()])
+        if fmt == "arrow":
+            self.path = path_stem.with_suffix(".arrows")
+            self._fh = pa.OSFile(str(self.path), "wb")
+            self._writer = pa.ipc.new_stream(self._fh, self.schema)
+        else:
+            self.path = path_stem.with_suffix(".parquet")
+            self._writer = pq.ParquetWriter(str(self.path), self.schema, compression="zstd")
+
+    @staticmethod
+    def _arrow_type(tag: str):
+        return {
+            "dict": pa.dictionary(pa.int32(), pa.string()),
+            "str": pa.string(),
+            "f64": pa.float64(),
+            "i32": pa.int32(),
+            "bool": pa.bool_(),
+        }[tag]
+
+    def add(self, row: tuple):
+        self._buf.append(row)
+        if len(self._buf) >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._buf:
+            return
+        if self.path.suffix == ".csv":
+            self._writer.writerows(self._buf)
+        else:
+            arrays = []
+            for j, tag in enumerate(self.columns.values()):
+                col = [r[j] for r in self._buf]
+                if tag == "dict":
+                    arrays.append(pa.array(col, pa.string()).dictionary_encode())
+                else:
+                    arrays.append(pa.array(col, self._arrow_type(tag)))
+            batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+            if self.path.suffix == ".arrows":
+                self._writer.write_batch(batch)
+            else:
+                self._writer.write_table(pa.Table.from_batches([batch]))
+        self.rows_written += len(self._buf)
+        self._buf = []
+
+    def close(self):
+        self._flush()
+        if self.path.suffix == ".csv":
+            self._fh.close()
+        else:
+            self._writer.close()
+            if self._fh is not None:
+                self._fh.close()
+
+
+def export_all(out_dir: str, fmt: str = "parquet", events_dir: str = EVENT_DIR,
+               db_path: str = DEFAULT_DB, chunk_rows: int = CHUNK_ROWS) -> Dict[str, Tuple[Path, int]]:
+    """Export every table; returns {table: (path, rows)}."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    writers = {
+        "turns": _TableWriter(out / "turns", TURNS, fmt, chunk_rows),
+        "concept_checks": _TableWriter(out / "concept_checks", CONCEPT_CHECKS, fmt, chunk_rows),
+        "messages": _TableWriter(out / "messages", MESSAGES, fmt, chunk_rows),
+    }
+    try:
+        for table, row in turn_rows(iter_events(events_dir)):
+            writers[table].add(row)
+        for row in message_rows(db_path):
+            writers["messages"].add(row)
+    finally:
+        for w in writers.values():
+            w.close()
+
+    return {name: (w.path, w.rows_written) for name, w in writers.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Export tutoring sessions and turns for offline analysis.")
+    ap.add_argument("out_dir")
+    ap.add_argument("--format", choices=["parquet", "arrow", "csv"], default="parquet")
+    ap.add_argument("--events", default=EVENT_DIR, help="event log directory")
+    ap.add_argument("--db", default=DEFAULT_DB, help="session store SQLite file")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = ap.parse_args(argv)
+
+    if args.format != "csv" and pa is None:
+        print("⚠️ pyarrow not installed — falling back to CSV")
+
+    t0 = time.perf_counter()
+    results = export_all(args.out_dir, args.format, args.events, args.db, args.chunk_rows)
+    for name, (path, rows) in results.items():
+        print(f"✅ {name}: {rows} rows → {path} ({path.stat().st_size / 1024:.0f} KB)")
+    print(f"done in {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
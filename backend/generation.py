@@ -0,0 +1,339 @@
+# backend/generation.py
+"""
+Pluggable follow-up rephrasing, off the UI thread.
+
+The tutor's follow-ups come from answers.json templates. A generation
+backend may rephrase them (e.g. a small LLM), but a model call must never
+block a Streamlit run for long. So:
+
+  app thread ──rephrase()──▶ Scheduler queue
+                               │  collects requests from every session for up
+                               │  to `batch_window` s (or `max_batch` items)
+                               ▼
+                             worker process: backend.generate_batch(batch)
+                               │
+  app thread ◀── result ───────┘  or, past the request's deadline, the
+                                  template text unchanged (fallback)
+
+Backends implement GenerationBackend.generate_batch(). Only a deterministic
+stub ships here ("stub": no network / GPU, fixed per-batch + per-item
+latency) so throughput and latency can be measured locally.
+
+Config:
+  BC351_GEN_BACKEND         "" (off, default) or a backend name, e.g. "stub"
+  BC351_GEN_DEADLINE_MS     per-request deadline                 (default 300)
+  BC351_GEN_INTERACTIVE_MS  deadline for the app's follow-up turns, which
+                            hold up the student's script run     (default 60)
+  BC351_GEN_WINDOW_MS       micro-batch collection window        (default 10)
+  BC351_GEN_MAX_BATCH       largest batch sent to the model      (default 32)
+
+Usage (benchmark with the stub):
+  python -m backend.generation --sessions 200 --requests 2000
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+GEN_BACKEND = os.environ.get("BC351_GEN_BACKEND", "").strip().lower()
+DEADLINE_MS = float(os.environ.get("BC351_GEN_DEADLINE_MS", "300"))
+INTERACTIVE_MS = float(os.environ.get("BC351_GEN_INTERACTIVE_MS", "60"))
+WINDOW_MS = float(os.environ.get("BC351_GEN_WINDOW_MS", "10"))
+MAX_BATCH = int(os.environ.get("BC351_GEN_MAX_BATCH", "32"))
+
+
+class GenerationRequest(NamedTuple):
+    template: str        # the answers.json follow-up; also the fallback
+    concept: str = ""
+    question: str = ""
+    module_id: str = ""
+
+
+# ---------- backends ----------
+
+class GenerationBackend(ABC):
+    """Interface: turn a batch of requests into one rephrased text each."""
+    name = "base"
+
+    @abstractmethod
+    def generate_batch(self, batch: List[GenerationRequest]) -> List[str]:
+        """One text per request, in order."""
+
+
+class StubBackend(GenerationBackend):
+    """
+    Deterministic stand-in for a model: the same request always gives the
+    same text, and each call sleeps batch_ms + item_ms * len(batch), which
+    is roughly how a batched GPU model scales.
+    """
+    name = "stub"
+    OPENERS = (
+        "Let's dig a little deeper.",
+        "Here's something to think about.",
+        "Try looking at it another way.",
+        "Good — now one more step.",
+    )
+
+    def __init__(self, batch_ms: float = 20.0, item_ms: float = 1.0):
+        self.batch_ms = batch_ms
+        self.item_ms = item_ms
+
+    def generate_batch(self, batch: List[GenerationRequest]) -> List[str]:
+        time.sleep((self.batch_ms + self.item_ms * len(batch)) / 1000.0)
+        out = []
+        for req in batch:
+            opener = self.OPENERS[zlib.crc32(f"{req.concept}|{req.template}".encode("utf-8")) % len(self.OPENERS)]
+            out.append(f"{opener} {req.template}")
+        return out
+
+
+BACKENDS = {"stub": StubBackend}
+
+
+def load_backend(name: str, **kwargs) -> GenerationBackend:
+    try:
+        return BACKENDS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"unknown generation backend {name!r} (have: {', '.join(BACKENDS)})")
+
+
+# ---------- worker process ----------
+
+def _worker_main(name: str, kwargs: dict, inbox, outbox):
+    backend = load_backend(name, **kwargs)
+    while True:
+        job = inbox.get()
+        if job is None:
+            return
+        ids, batch = job
+        try:
+            texts = backend.generate_batch([GenerationRequest(*r) for r in batch])
+            outbox.put((ids, texts, None))
+        except Exception as e:  # the scheduler falls back to templates
+            outbox.put((ids, None, repr(e)))
+
+
+# ---------- scheduler ----------
+
+class Scheduler:
+    """
+    Micro-batching front end for one worker process. rephrase() is safe to
+    call from any number of Streamlit script threads.
+    """
+
+    def __init__(self, backend: str = "stub", *, backend_kwargs: Optional[dict] = None,
+                 batch_window: float = WINDOW_MS / 1000.0, max_batch: int = MAX_BATCH,
+                 deadline: float = DEADLINE_MS / 1000.0):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.deadline = deadline
+        # bumped from app threads, the batcher and the receiver: only via _count()
+        self.stats = {"requests": 0, "generated": 0, "fallback": 0, "expired": 0, "batches": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+        ctx = mp.get_context("spawn")
+        self._inbox = ctx.Queue()
+        self._outbox = ctx.Queue()
+        self._proc = ctx.Process(target=_worker_main, args=(backend, backend_kwargs or {}, self._inbox, self._outbox),
+                                 name=f"gen-{backend}", daemon=True)
+        self._proc.start()
+
+        self._pending: "queue.Queue[tuple]" = queue.Queue()
+        self._futures: Dict[int, Future] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        # one batch in flight: while the model is busy, new requests pile up
+        # into the next (bigger) batch instead of queueing as tiny ones
+        self._idle = threading.Semaphore(1)
+        self._closed = False
+        self._batcher = threading.Thread(target=self._batch_loop, name="gen-batcher", daemon=True)
+        self._receiver = threading.Thread(target=self._receive_loop, name="gen-receiver", daemon=True)
+        self._batcher.start()
+        self._receiver.start()
+        atexit.register(self.close)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for key in self.stats:
+                self.stats[key] = 0
+
+    # ---------- app side ----------
+    def submit(self, req: GenerationRequest, deadline: Optional[float] = None) -> Future:
+        fut: Future = Future()
+        rid = next(self._ids)
+        expires = time.monotonic() + (self.deadline if deadline is None else deadline)
+        with self._lock:
+            self._futures[rid] = fut
+        self._pending.put((rid, expires, req))
+        return fut
+
+    def rephrase(self, req: GenerationRequest, deadline: Optional[float] = None) -> str:
+        """Generated text, or req.template if the model misses the deadline or fails."""
+        self._count("requests")
+        budget = self.deadline if deadline is None else deadline
+        fut = self.submit(req, budget)
+        try:
+            text = fut.result(timeout=budget)
+        except Exception:
+            text = None
+        if not text:
+            self._count("fallback")
+            return req.template
+        self._count("generated")
+        return text
+
+    # ---------- batching ----------
+    def _batch_loop(self):
+        while not self._closed:
+            if not self._idle.acquire(timeout=0.5):
+                continue
+            try:
+                first = self._pending.get(timeout=0.5)
+            except queue.Empty:
+                self._idle.release()
+                continue
+            batch = [first]
+            until = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                left = until - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=left))
+                except queue.Empty:
+                    break
+
+            now = time.monotonic()
+            live = [(rid, req) for rid, expires, req in batch if expires > now]
+            for rid, expires, _req in batch:
+                if expires <= now:
+                    self._count("expired")
+                    self._resolve(rid, None)
+            if live:
+                self._count("batches")
+                self._inbox.put(([rid for rid, _ in live], [tuple(req) for _, req in live]))
+            else:
+                self._idle.release()
+
+    def _receive_loop(self):
+        while not self._closed:
+            try:
+                ids, texts, err = self._outbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            self._idle.release()
+            if err is not None:
+                self._count("errors")
+                print("⚠️ generation backend failed:", err)
+            for i, rid in enumerate(ids):
+                self._resolve(rid, texts[i] if texts else None)
+
+    def _resolve(self, rid: int, text: Optional[str]):
+        with self._lock:
+            fut = self._futures.pop(rid, None)
+        if fut is not None and not fut.done():
+            fut.set_result(text)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._inbox.put(None)
+            self._proc.join(timeout=2)
+        finally:
+            if self._proc.is_alive():
+                self._proc.terminate()
+
+
+@lru_cache(maxsize=1)
+def default_scheduler() -> Optional[Scheduler]:
+    """Process-wide scheduler for BC351_GEN_BACKEND, or None when generation is off."""
+    if not GEN_BACKEND:
+        return None
+    return Scheduler(GEN_BACKEND)
+
+
+def rephrase_followup(text: str, concept: str = "", question: str = "", module_id: str = "") -> str:
+    """
+    App entry point: rephrased follow-up, or `text` itself when generation is
+    off or misses INTERACTIVE_MS (the student's turn waits on this call).
+    """
+    scheduler = default_scheduler()
+    if scheduler is None:
+        return text
+    return scheduler.rephrase(GenerationRequest(text, concept, question, module_id), deadline=INTERACTIVE_MS / 1000.0)
+
+
+# ---------- benchmark ----------
+
+def _percentile(sorted_ms: List[float], p: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[min(len(sorted_ms) - 1, int(p / 100.0 * len(sorted_ms)))]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Load-test the follow-up generation scheduler with the stub model.")
+    ap.add_argument("--backend", default="stub")
+    ap.add_argument("--sessions", type=int, default=100, help="concurrent sessions (threads)")
+    ap.add_argument("--requests", type=int, default=1000, help="total requests")
+    ap.add_argument("--deadline-ms", type=float, default=DEADLINE_MS)
+    ap.add_argument("--window-ms", type=float, default=WINDOW_MS)
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    args = ap.parse_args(argv)
+
+    sched = Scheduler(args.backend, batch_window=args.window_ms / 1000.0, max_batch=args.max_batch,
+                      deadline=args.deadline_ms / 1000.0)
+    sched.rephrase(GenerationRequest("warm-up"), deadline=10.0)  # wait for the worker to boot
+    sched.reset_stats()
+
+    latencies: List[float] = []
+    lat_lock = threading.Lock()
+    per_session = max(1, args.requests // args.sessions)
+
+    def session(sid: int):
+        for i in range(per_session):
+            t0 = time.perf_counter()
+            sched.rephrase(GenerationRequest(f"What role does concept {i % 7} play?", f"c{i % 7}", f"q{sid}"))
+            with lat_lock:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(s,)) for s in range(args.sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    sched.close()
+
+    latencies.sort()
+    s = sched.stats
+    print(f"requests {s['requests']}  in {wall:.2f}s  → {s['requests'] / wall:.0f} req/s")
+    print(f"batches {s['batches']}  (avg {s['generated'] / max(1, s['batches']):.1f} per batch)")
+    print(f"generated {s['generated']}  fallback {s['fallback']}  expired {s['expired']}  errors {s['errors']}")
+    print(f"latency ms  p50 {_percentile(latencies, 50):.1f}  p95 {_percentile(latencies, 95):.1f}  "
+          f"p99 {_percentile(latencies, 99):.1f}  max {latencies[-1] if latencies else 0:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,41 +6,77 @@ Fast, model-light “Socratic” grounded engine.
 - hf_socratic(): produces ONE focused follow-up grounded in the official answer text
                  by using concept extraction (no hallucination)
 This keeps Streamlit Cloud fast and free.
+
+Grounding comes from the module's hand-written answers.json spec when there
+is one, else from keyphrases extracted once per module out of
+*_answers.txt (see keyphrase_index). Either way the student's answer is
+checked by the shared concept matcher, so a turn costs one scan.
+
+The app reaches this through socratic_engine: socratic_followup() resolves
+specs with grounded_spec() and phrases keyphrase follow-ups with
+FOLLOWUP_TEMPLATES, kept as references in the transcript.
 """
 
-from typing import Any
-from backend.concept_check import missing_concepts, make_followup
-from backend.question_loader import load_module_bundle
+import random
+from typing import Any, List
+
+try:
+    from backend.concept_check import missing_for_spec
+    from backend.keyphrase_index import grounded_spec
+    from backend.question_loader import QuestionPointer, load_module_bundle
+except Exception:
+    from concept_check import missing_for_spec
+    from keyphrase_index import grounded_spec
+    from question_loader import QuestionPointer, load_module_bundle
+
+FOLLOWUP_TEMPLATES = (
+    "Good start. How does **{concept}** fit into your answer?",
+    "You're on your way — can you say what role **{concept}** plays here?",
+    "Think about **{concept}**: how does it connect to what you wrote?",
+)
+
 
 def init_hf() -> Any:
     # placeholder for future true-HF client if you decide to add one
     return {"engine": "concept-grounded"}
 
-def hf_socratic(llm: Any, module_id: str, question_index: int, student_answer: str, notes_context: str = "") -> str:
+
+def missing_concepts(module_id: str, question_index: int, student_answer: str,
+                     part_idx: int = 0, stem: str = "") -> List[str]:
+    """Required concepts of the grounded spec that the answer doesn't cover yet."""
+    _key, spec = grounded_spec(module_id, question_index, part_idx, stem)
+    if not spec:
+        return []
+    missing_required, _missing_optional = missing_for_spec(spec, student_answer)
+    return missing_required
+
+
+def make_followup(question_text: str, concept: str, rng=None) -> str:
+    """One targeted follow-up about `concept` (question_text kept for richer engines)."""
+    return (rng or random).choice(FOLLOWUP_TEMPLATES).format(concept=concept)
+
+
+def hf_socratic(llm: Any, module_id: str, question_index: int, student_answer: str,
+                notes_context: str = "", part_idx: int = 0, rng=None) -> str:
     """
     Compute a grounded follow-up:
-      - pull the official answer text for this question
+      - pull the concept spec for this question (answers.json or extracted keyphrases)
       - detect missing concepts vs student's reply
       - if missing: ask a single targeted follow-up about the first missing concept
       - if none missing: return a gentle transition prompt (the app advances the pointer)
     """
     bundle = load_module_bundle(module_id)
-
-    # Get official answer text for this question
-    try:
-        ans_block_list = bundle.answers[question_index]  # list[str]
-        official_answer_text = " ".join(ans_block_list) if isinstance(ans_block_list, list) else str(ans_block_list or "")
-    except Exception:
-        official_answer_text = ""
-
-    q_text = bundle.question_text(bundle.questions and type("Ptr", (), {"qi": question_index, "si": 0}) or None) \
-             if hasattr(bundle, "question_text") else ""
+    if 0 <= question_index < len(bundle.questions):
+        stem = bundle.questions[question_index].get("q") or ""
+        q_text = bundle.question_text(QuestionPointer(question_index, part_idx))
+    else:
+        stem = q_text = ""
 
     # Determine missing concepts
-    misses = missing_concepts(official_answer_text, student_answer)
+    misses = missing_concepts(module_id, question_index, student_answer, part_idx, stem)
 
     if misses:
-        return make_followup(q_text or f"question {question_index+1}", misses[0])
+        return make_followup(q_text or f"question {question_index+1}", misses[0], rng)
 
     # No concepts missing — return a short transition notice; the app will advance pointer
     return "Nice — once you’re ready, continue to the next part."
@@ -0,0 +1,88 @@
+# backend/input_guard.py
+"""
+Size limits for student answers.
+
+Everything downstream (classify_text, concept matching, wrong-trigger regexes,
+transcript rendering) is linear in the answer length, so a cap on the answer
+gives a hard per-click bound. Oversized pastes are cut to head + tail on word
+boundaries — the start and end of an answer are where students usually put
+their actual claim — and flagged so the tutor can say so.
+
+Limits (characters) are configurable via environment:
+  BC351_MAX_ANSWER_CHARS   one submission          (default 4000)
+  BC351_MAX_HISTORY_CHARS  all kept text per question (default 20000)
+"""
+from __future__ import annotations
+
+import os
+from typing import NamedTuple
+
+MAX_ANSWER_CHARS = int(os.environ.get("BC351_MAX_ANSWER_CHARS", "4000"))
+MAX_HISTORY_CHARS = int(os.environ.get("BC351_MAX_HISTORY_CHARS", "20000"))
+
+ELLIPSIS = " … "
+# never look further than this for a word boundary, so cutting stays O(limit)
+_BOUNDARY_WINDOW = 40
+
+
+class GuardedText(NamedTuple):
+    text: str
+    truncated: bool
+    original_chars: int
+
+
+def _cut_head(s: str, n: int) -> str:
+    """First ~n chars of s, ending on whitespace when one is near the cut."""
+    head = s[:n]
+    if n < len(s) and not s[n].isspace():
+        i = head.rfind(" ", max(0, n - _BOUNDARY_WINDOW))
+        if i > 0:
+            head = head[:i]
+    return head.rstrip()
+
+
+def _cut_tail(s: str, n: int) -> str:
+    """Last ~n chars of s, starting on whitespace when one is near the cut."""
+    start = len(s) - n
+    tail = s[start:]
+    if start > 0 and not s[start - 1].isspace():
+        i = tail.find(" ", 0, _BOUNDARY_WINDOW)
+        if i >= 0:
+            tail = tail[i + 1:]
+    return tail.lstrip()
+
+
+def guard_answer(text: str, limit: int = MAX_ANSWER_CHARS) -> GuardedText:
+    """
+    Strip and cap one answer. A paste far over the limit is sliced to its two
+    ends before stripping, so only O(limit) characters are ever copied, not
+    O(len(text)). (original_chars then counts surrounding whitespace too.)
+    """
+    raw = text or ""
+    if 0 < limit and len(raw) > 4 * limit:
+        # only text near the two ends can survive the cut below
+        t = (raw[:2 * limit].lstrip() + " " + raw[-2 * limit:].rstrip()).strip()
+        n = len(raw) if t else 0
+    else:
+        t = raw.strip()
+        n = len(t)
+    if limit <= 0 or n <= limit:
+        return GuardedText(t, False, n)
+
+    if limit < 2 * _BOUNDARY_WINDOW:
+        return GuardedText(t[:limit], True, n)
+
+    budget = limit - len(ELLIPSIS)
+    head_n = (budget * 3) // 4
+    tail_n = budget - head_n
+    return GuardedText(_cut_head(t, head_n) + ELLIPSIS + _cut_tail(t, tail_n), True, n)
+
+
+def notice(g: GuardedText) -> str:
+    """Short tutor note for a truncated answer ('' when nothing was cut)."""
+    if not g.truncated:
+        return ""
+    return (
+        f"(Your answer was {g.original_chars:,} characters, so I only read the first and last parts. "
+        "Try answering in a few sentences of your own words.)"
+    )
@@ -0,0 +1,206 @@
+# backend/keyphrase_index.py
+"""
+Concept specs extracted from a module's official answer text.
+
+Modules without a hand-written moduleXX_answers.json still have
+moduleXX_answers.txt (grouped per question in bundle.answers). Once per
+module we pull keyphrases out of each question's answer block and store them
+as answers.json-shaped specs:
+
+  {"21": {"required_concepts": [...], "optional_concepts": [...],
+          "concept_domain": None, "source": "keyphrases"}}
+
+so every turn goes through the same matcher (concept_plan / missing_for_spec
+/ AnswerHistory) as hand-written specs — one scan of the answer, no model.
+
+Keyphrases are content words scored by tf-idf across the module's answer
+blocks, deduplicated by the 5-letter stem the matcher uses; words the
+question itself already contains are down-weighted, since students echo them,
+and longer words are favored over short generic ones. Page furniture from
+the PDF ("Page 2 of 6", the course-title header repeated on every page) is
+dropped first, and hedges / fillers ("quite", "potentially") are stopwords.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+try:
+    from backend.concept_check import question_key, resolve_spec
+    from backend.question_loader import ModuleBundle, load_module_bundle
+except Exception:
+    from concept_check import question_key, resolve_spec
+    from question_loader import ModuleBundle, load_module_bundle
+
+REQUIRED_K = 2
+OPTIONAL_K = 3
+STEM_LEN = 5   # concept_plan matches long words by their first 5 letters
+
+_HEADING = re.compile(r"^\s*(\d+)\s*[\.\)]\s*")
+_PART = re.compile(r"\(\s*([A-Za-z])\s*\)")
+_CONTENT_WORD = re.compile(r"[A-Za-z][a-z]{4,}")
+_PAGE_NO = re.compile(r"^page\s+\d+(\s+of\s+\d+)?$", re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+about above actual added adding after again against along already although among amount another
+answer answers because become becomes before being below between both cannot could creating
+describe determine different does doing during each either enough especially every example
+explain first following found further given great greater having higher however ignored include
+including indicate inside into itself large larger later least less likely little lower makes
+might more most much must neither never number other others otherwise over page please point
+points principles pulling question questions rather really relates right should similar since
+small smaller some something state states stays still study such tends than that their them then
+there therefore these they thing things this those though three through thus together toward
+under until upon used uses using value values very were what when where whether which while
+whole will with within without would written your yours
+actually approximately basically certain certainly contain containing contains equal equals
+essentially expect expected extent generally mainly mostly overall potentially quite rather
+require required requires significant significantly simply typically usually various
+""".split())
+
+
+def page_furniture(groups: List[List[str]]) -> Set[str]:
+    """
+    Lines that are page headers / footers rather than answer text: any line
+    of 3+ words repeated verbatim (a running header like the course title).
+    "Page N of M" lines are caught separately by _PAGE_NO.
+    """
+    seen = Counter(ln.strip() for group in groups for ln in group if len(ln.split()) >= 3)
+    return {ln for ln, n in seen.items() if n >= 2}
+
+
+def answer_blocks(bundle: ModuleBundle) -> Dict[str, str]:
+    """
+    {question number: answer text}. Blocks are keyed by their own "N." heading
+    rather than by position, so title lines and empty answers don't shift them.
+    """
+    furniture = page_furniture(bundle.answers)
+    blocks: Dict[str, List[str]] = {}
+    for group in bundle.answers:
+        group = [ln for ln in group if ln.strip() not in furniture and not _PAGE_NO.match(ln.strip())]
+        if not group:
+            continue
+        m = _HEADING.match(group[0])
+        if not m:
+            continue
+        first = group[0][m.end():]
+        blocks.setdefault(m.group(1), []).extend([first, *group[1:]])
+    return {num: " ".join(ln.strip() for ln in lines).strip() for num, lines in blocks.items()}
+
+
+def _split_parts(text: str) -> Dict[str, str]:
+    """{"a": text, "b": text, ...} for "(A) … (B) …" answers; {} when unlettered."""
+    marks = list(_PART.finditer(text))
+    if len(marks) < 2:
+        return {}
+    out: Dict[str, str] = {}
+    for i, m in enumerate(marks):
+        end = marks[i + 1].start() if i + 1 < len(marks) else len(text)
+        out[m.group(1).lower()] = text[m.end():end]
+    return out
+
+
+def _terms(text: str) -> Counter:
+    """Content words by stem -> count (surface forms tracked separately)."""
+    return Counter(w.lower()[:STEM_LEN] for w in _CONTENT_WORD.findall(text) if w.lower() not in STOPWORDS)
+
+
+def extract_keyphrases(text: str, idf: Dict[str, float], echo: str = "", k: int = REQUIRED_K + OPTIONAL_K) -> List[str]:
+    """Top-k keyphrases of `text` (one surface word per stem), best first."""
+    surface: Dict[str, Counter] = {}
+    for w in _CONTENT_WORD.findall(text):
+        lw = w.lower()
+        if lw not in STOPWORDS:
+            surface.setdefault(lw[:STEM_LEN], Counter())[lw] += 1
+    echoed = set(_terms(echo))
+    scored = []
+    for stem, forms in surface.items():
+        word = forms.most_common(1)[0][0]
+        # longer words are usually the technical terms ("calorimeter" vs "cells")
+        score = sum(forms.values()) * idf.get(stem, 1.0) * min(len(word), 12) / 8
+        if stem in echoed:
+            score *= 0.5
+        scored.append((-score, stem, word))
+    scored.sort()
+    return [word for _score, _stem, word in scored[:k]]
+
+
+def _spec(phrases: List[str]) -> dict:
+    return {
+        "required_concepts": phrases[:REQUIRED_K],
+        "optional_concepts": phrases[REQUIRED_K:],
+        "concept_domain": None,
+        "source": "keyphrases",
+    }
+
+
+@lru_cache(maxsize=16)
+def keyphrase_index(module_id: str) -> Dict[str, dict]:
+    """answers.json-shaped specs for every answered question of a module (built once)."""
+    bundle = load_module_bundle(module_id)
+    blocks = answer_blocks(bundle)
+    if not blocks:
+        return {}
+
+    # idf over answer blocks: stems shared by every answer say little about any one
+    docs = {num: _terms(text) for num, text in blocks.items()}
+    df = Counter(stem for terms in docs.values() for stem in terms)
+    n = len(docs)
+    idf = {stem: math.log((1 + n) / (1 + c)) + 1.0 for stem, c in df.items()}
+
+    stems_by_num = {}
+    for q in bundle.questions:
+        m = _HEADING.match(q.get("q") or "")
+        if m:
+            stems_by_num[m.group(1)] = q.get("q") or ""
+
+    index: Dict[str, dict] = {}
+    for num, text in blocks.items():
+        echo = stems_by_num.get(num, "")
+        phrases = extract_keyphrases(text, idf, echo)
+        if phrases:
+            index[num] = _spec(phrases)
+        for letter, part_text in _split_parts(text).items():
+            part_phrases = extract_keyphrases(part_text, idf, echo)
+            if part_phrases:
+                index[f"{num}{letter}"] = _spec(part_phrases)
+    return index
+
+
+def keyphrase_spec(module_id: str, qid: int, part_idx: int = 0, stem: str | None = None) -> Tuple[str | None, dict]:
+    """
+    (spec_key, spec) from the keyphrase index. Part keys ("3a") are only used
+    when the question really has subparts; otherwise the whole answer counts.
+    """
+    try:
+        index = keyphrase_index(module_id)
+    except Exception:
+        return None, {}
+    part_key = question_key(qid, part_idx, stem)
+    bundle = load_module_bundle(module_id)
+    has_parts = 0 <= qid < len(bundle.questions) and bool(bundle.questions[qid].get("parts"))
+    if has_parts and part_key in index:
+        return part_key, index[part_key]
+    num = part_key[:-1]
+    if num in index:
+        return num, index[num]
+    return None, {}
+
+
+def grounded_spec(module_id: str, qid: int, part_idx: int = 0, stem: str | None = None) -> Tuple[str | None, dict]:
+    """Hand-written answers.json spec when there is one, else the extracted keyphrases."""
+    spec_key, spec = resolve_spec(module_id, qid, part_idx, stem)
+    if spec:
+        return spec_key, spec
+    return keyphrase_spec(module_id, qid, part_idx, stem)
+
+
+def grounded_key(module_id: str, qid: int, part_idx: int = 0, stem: str | None = None) -> str:
+    """
+    The key events and live stats file a position under: the grounded spec's
+    key ("1" for 1a when only "1" exists), else the part key.
+    """
+    return grounded_spec(module_id, qid, part_idx, stem)[0] or question_key(qid, part_idx, stem)
@@ -0,0 +1,134 @@
+# backend/live_hints.py
+"""
+Incremental concept coverage for a draft answer (live-hint mode).
+
+A LiveMatcher keeps, for every needle of one spec, how many times it occurs
+in the current draft. On update() only the edited window is rescanned: the
+common prefix/suffix of the old and new text is skipped, and each needle's
+count changes by (occurrences overlapping the window in the new text) minus
+(the same in the old text). Editing one word in a long answer costs
+O(edit + needle length) per needle instead of a full concept_hit pass.
+
+The text forms themselves (lower / norm / alnum) are rebuilt with C-level
+str/re calls; numeric needles, when a spec has any, re-index the numbers.
+
+Config:
+  BC351_LIVE_HINTS   "1" turns live hints on by default in the sidebar toggle
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, List, Set, Tuple
+
+try:
+    from backend.concept_check import ConceptPlan, Needle, normalize, spec_plans
+    from backend.numeric_match import EMPTY_INDEX, index_numbers
+except Exception:
+    from concept_check import ConceptPlan, Needle, normalize, spec_plans
+    from numeric_match import EMPTY_INDEX, index_numbers
+
+LIVE_HINTS_DEFAULT = os.environ.get("BC351_LIVE_HINTS", "0") == "1"
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def _forms(text: str) -> Dict[str, str]:
+    lower = text.lower()
+    return {"lower": lower, "word": lower, "norm": normalize(text), "alnum": _NON_ALNUM.sub("", lower)}
+
+
+def edit_window(old: str, new: str) -> Tuple[int, int, int]:
+    """
+    (start, old_end, new_end): old[start:old_end] was replaced by
+    new[start:new_end]. Prefix/suffix are found by bisecting on slice
+    equality, so the comparison runs at memcmp speed.
+    """
+    n = min(len(old), len(new))
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[:mid] == new[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    start = lo
+
+    lo, hi = 0, n - start
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[len(old) - mid:] == new[len(new) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return start, len(old) - lo, len(new) - lo
+
+
+def _occurrences(s: str, sub: str, start: int, end: int, word: bool = False) -> int:
+    """
+    Occurrences of sub (overlapping ones too) lying entirely in s[start:end];
+    with word=True only those at a word start.
+    """
+    count = 0
+    i = s.find(sub, start, end)
+    while i >= 0:
+        if not (word and i > 0 and s[i - 1].isalnum()):
+            count += 1
+        i = s.find(sub, i + 1, end)
+    return count
+
+
+class LiveMatcher:
+    __slots__ = ("required", "plans", "by_form", "numeric", "forms", "counts", "numbers")
+
+    def __init__(self, spec: dict):
+        self.required: List[str] = list(spec.get("required_concepts", []) or [])
+        self.plans: Dict[str, ConceptPlan] = spec_plans(spec)
+
+        needles: Set[Needle] = set()
+        for plan in self.plans.values():
+            needles |= plan.needles()
+        self.by_form: Dict[str, List[Needle]] = {}
+        self.numeric: List[Needle] = []
+        for n in needles:
+            if n[0] == "numbers":
+                self.numeric.append(n)
+            else:
+                self.by_form.setdefault(n[0], []).append(n)
+
+        self.forms = _forms("")
+        self.counts: Dict[Needle, int] = {n: 0 for n in needles if n[0] != "numbers"}
+        self.numbers = EMPTY_INDEX
+
+    def update(self, text: str) -> List[str]:
+        """Move the draft to `text`; returns the required concepts it covers."""
+        new_forms = _forms(text or "")
+        for form, needles in self.by_form.items():
+            old, new = self.forms[form], new_forms[form]
+            if old == new:
+                continue
+            start, old_end, new_end = edit_window(old, new)
+            # a word-start hit also depends on the char before it, so it may begin right after the window
+            word = form == "word"
+            for n in needles:
+                sub = n[1]
+                lo = max(0, start - len(sub) + 1)
+                reach = len(sub) - 1 + word
+                self.counts[n] += (
+                    _occurrences(new, sub, lo, new_end + reach, word)
+                    - _occurrences(old, sub, lo, old_end + reach, word)
+                )
+        self.forms = new_forms
+        if self.numeric:
+            self.numbers = index_numbers(text or "")
+        return self.covered()
+
+    def found(self) -> Set[Needle]:
+        out = {n for n, c in self.counts.items() if c > 0}
+        out.update(n for n in self.numeric if n[1] in self.numbers)
+        return out
+
+    def covered(self, already: Set[str] = frozenset()) -> List[str]:
+        """Required concepts covered by the draft (or listed in `already`), in spec order."""
+        found = self.found()
+        return [c for c in self.required if c in already or self.plans[c].satisfied(found)]
@@ -0,0 +1,195 @@
+# backend/live_stats.py
+"""
+Live, in-process class aggregates for the instructor dashboard.
+
+Every Streamlit session in this server process shares one LiveStats object.
+Student clicks update counters in place:
+  set_position()  student moved to a question        -> O(1)
+  set_missing()   concepts still missing after submit -> O(#concepts in the spec)
+The dashboard reads per-question rows with question_rows(), which walks the
+counters (O(number of questions · blocking concepts)), never the event history.
+
+Both updates must use the same question key (keyphrase_index.grounded_key),
+or a question's blocking concepts never show up on its row.
+
+Check:
+  python -m backend.live_stats --check
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+QKey = Tuple[str, str]  # (module_id, question key like "21a", see keyphrase_index.grounded_key)
+
+
+class LiveStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # session -> (student, module_id, qkey, last_seen)
+        self._where: Dict[str, Tuple[str, str, str, float]] = {}
+        # session -> (module_id, qkey, concepts it is currently missing there)
+        self._missing: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}
+        self._on_question: Counter = Counter()   # QKey -> students there now
+        self._blocked: Counter = Counter()       # (module, qkey, concept) -> students missing it
+        self.submits = 0
+
+    # ---------- updates (student clicks) ----------
+    def _clear_missing(self, session: str):
+        module_id, qkey, concepts = self._missing.pop(session, ("", "", ()))
+        for c in concepts:
+            k = (module_id, qkey, c)
+            self._blocked[k] -= 1
+            if self._blocked[k] <= 0:
+                del self._blocked[k]
+
+    def set_position(self, session: str, student: str, module_id: str, qkey: str):
+        with self._lock:
+            prev = self._where.get(session)
+            if prev is not None:
+                _s, pm, pq, _t = prev
+                if (pm, pq) != (module_id, qkey):
+                    self._clear_missing(session)
+                    self._on_question[(pm, pq)] -= 1
+                    if self._on_question[(pm, pq)] <= 0:
+                        del self._on_question[(pm, pq)]
+                    self._on_question[(module_id, qkey)] += 1
+            else:
+                self._on_question[(module_id, qkey)] += 1
+            self._where[session] = (student, module_id, qkey, time.time())
+
+    def set_missing(self, session: str, module_id: str, qkey: str, missing):
+        with self._lock:
+            self.submits += 1
+            self._clear_missing(session)
+            missing = tuple(missing)
+            if missing:
+                self._missing[session] = (module_id, qkey, missing)
+                for c in missing:
+                    self._blocked[(module_id, qkey, c)] += 1
+            where = self._where.get(session)
+            if where is not None:
+                self._where[session] = (*where[:3], time.time())
+
+    def drop(self, session: str):
+        with self._lock:
+            where = self._where.pop(session, None)
+            if where is None:
+                return
+            _s, module_id, qkey, _t = where
+            self._clear_missing(session)
+            self._on_question[(module_id, qkey)] -= 1
+            if self._on_question[(module_id, qkey)] <= 0:
+                del self._on_question[(module_id, qkey)]
+
+    def expire_idle(self, idle_seconds: float = 1800.0) -> int:
+        """Forget sessions with no activity for `idle_seconds` (closed tabs)."""
+        cutoff = time.time() - idle_seconds
+        stale = [s for s, w in list(self._where.items()) if w[3] < cutoff]
+        for s in stale:
+            self.drop(s)
+        return len(stale)
+
+    # ---------- reads (dashboard) ----------
+    def question_rows(self, module_id: str | None = None, top: int = 3) -> List[dict]:
+        """One row per question with students on it and its most common blocking concepts."""
+        with self._lock:
+            on_q = dict(self._on_question)
+            blocked = dict(self._blocked)
+
+        blockers: Dict[QKey, List[Tuple[int, str]]] = {}
+        for (m, q, c), n in blocked.items():
+            blockers.setdefault((m, q), []).append((n, c))
+
+        rows = []
+        for (m, q), n in on_q.items():
+            if module_id and m != module_id:
+                continue
+            top_blockers = sorted(blockers.get((m, q), []), reverse=True)[:top]
+            rows.append({
+                "module": m,
+                "question": q,
+                "students": n,
+                "blocking": ", ".join(f"{c} ({k})" for k, c in top_blockers),
+            })
+        rows.sort(key=lambda r: (r["module"], _qsort(r["question"])))
+        return rows
+
+    def roster(self, module_id: str | None = None) -> List[dict]:
+        """Which question each active student is on."""
+        with self._lock:
+            items = list(self._where.items())
+            missing = dict(self._missing)
+        return [
+            {"student": s, "module": m, "question": q, "missing": len(missing.get(sid, ("", "", ()))[2])}
+            for sid, (s, m, q, _t) in items
+            if not module_id or m == module_id
+        ]
+
+    def active_sessions(self) -> int:
+        return len(self._where)
+
+
+def _qsort(qkey: str):
+    digits = "".join(ch for ch in qkey if ch.isdigit())
+    return (int(digits) if digits else 0, qkey)
+
+
+@lru_cache(maxsize=1)
+def live_stats() -> LiveStats:
+    """Process-wide aggregates shared by every session and the dashboard page."""
+    return LiveStats()
+
+
+def self_check() -> int:
+    """
+    One turn the way the app reports it (set_position on render, set_missing
+    after the submit, both keyed by grounded_key) must show its blocking
+    concepts on the question's row, and moving on must clear them.
+    """
+    try:
+        from backend.keyphrase_index import grounded_key
+        from backend.question_loader import load_module_bundle
+    except Exception:
+        from keyphrase_index import grounded_key
+        from question_loader import load_module_bundle
+
+    failures = []
+    stats = LiveStats()
+    bundle = load_module_bundle("module01")
+    keys = [grounded_key("module01", qi, 0, bundle.questions[qi].get("q") or "") for qi in (0, 1)]
+    stats.set_position("s1", "Ada", "module01", keys[0])
+    stats.set_missing("s1", "module01", keys[0], ["tumor formation", "clonal expansion"])
+    rows = stats.question_rows("module01")
+    want = [{"module": "module01", "question": keys[0], "students": 1,
+             "blocking": "tumor formation (1), clonal expansion (1)"}]
+    if rows != want:
+        failures.append(f"after submit: {rows} != {want}")
+    stats.set_position("s1", "Ada", "module01", keys[1])
+    rows = stats.question_rows("module01")
+    if [r["blocking"] for r in rows] != [""]:
+        failures.append(f"after moving on: {rows}")
+
+    for f in failures:
+        print(f"❌ {f}")
+    if not failures:
+        print(f"✅ blocking concepts follow the student (keys {keys[0]!r} → {keys[1]!r})")
+    return 1 if failures else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Live class aggregates (served by the app; this only self-checks).")
+    ap.add_argument("--check", action="store_true", help="run the set_position / set_missing self-check")
+    args = ap.parse_args(argv)
+    if args.check:
+        return self_check()
+    ap.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
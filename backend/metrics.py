@@ -0,0 +1,357 @@
+# backend/metrics.py
+"""
+Process-local metrics: counters, gauges and fixed-bucket histograms,
+exported in the Prometheus text format.
+
+Recording is cheap: every labeled series is created once (labels() returns a
+cached child you can keep), and a histogram observation is one bisect into
+pre-allocated bucket counts under a small lock. Nothing is formatted until
+someone scrapes.
+
+Export (either or both):
+  BC351_METRICS_PORT=9351      GET http://127.0.0.1:9351/metrics
+  BC351_METRICS_FILE=path      rewritten every BC351_METRICS_INTERVAL s (default 10), for
+                               node_exporter's textfile collector; "{pid}" in the
+                               path is replaced, so pre-forked workers don't collide
+
+Tutoring metrics defined here:
+  bc351_turns_total{kind}                 submit / followup / advance / diagram / skip / bonus
+  bc351_diagram_answers_total{result}     correct / incorrect
+  bc351_stage_seconds{stage}              histogram: submit (whole handler) and its stages
+                                          guard, classify, evaluate, log, respond, save;
+                                          diagram (whole handler)
+  bc351_cache_{hits,misses,size}{cache}   lru_cache stats of the loaders / matchers (load_concept_spec
+                                          is only cleared when answers.json changes on disk)
+
+Example SLO alert (p95 submit latency over 250 ms):
+  histogram_quantile(0.95, sum by (le) (rate(bc351_stage_seconds_bucket{stage="submit"}[5m]))) > 0.25
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_PORT = int(os.environ.get("BC351_METRICS_PORT", "0"))
+METRICS_FILE = os.environ.get("BC351_METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("BC351_METRICS_INTERVAL", "10"))
+
+# seconds; the app's turns are ms-scale, generation / eval fallbacks up to ~1 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# ---------- metric types ----------
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """The child series for these label values (created once, then reused)."""
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh child series (one per label-value combination)."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, names, key):
+        return [f"{name}{_labels(names, key)} {_fmt(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, fn: Callable[[], float]):
+        """Read the value from fn() at scrape time instead."""
+        self.fn = fn
+
+    def render(self, name, names, key):
+        try:
+            value = self.fn() if self.fn is not None else self.value
+        except Exception:
+            return []
+        return [f"{name}{_labels(names, key)} {_fmt(value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above the largest bound
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def render(self, name, names, key):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, n in zip((*self.bounds, float("inf")), counts):
+            cumulative += n
+            le = 'le="' + _fmt(bound) + '"'
+            lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(names, key)} {_fmt(total)}")
+        lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.t0)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+
+# ---------- registry + export ----------
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Atomically replace `path` with the current exposition."""
+        path = path.replace("{pid}", str(os.getpid()))
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """GET /metrics on a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def write_every(self, path: str, interval: float = METRICS_INTERVAL):
+        def loop():
+            while True:
+                try:
+                    self.write(path)
+                except OSError as e:
+                    print("⚠️ metrics file not written:", e)
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+
+
+REGISTRY = Registry()
+
+TURNS = REGISTRY.counter("bc351_turns_total", "Tutoring turns by kind.", ["kind"])
+DIAGRAM_ANSWERS = REGISTRY.counter("bc351_diagram_answers_total", "Graded diagram answers.", ["result"])
+STAGE_SECONDS = REGISTRY.histogram("bc351_stage_seconds", "Time spent per tutoring stage.", ["stage"])
+CACHE_HITS = REGISTRY.gauge("bc351_cache_hits", "lru_cache hits since the cache was last cleared.", ["cache"])
+CACHE_MISSES = REGISTRY.gauge("bc351_cache_misses", "lru_cache misses since the cache was last cleared.", ["cache"])
+CACHE_SIZE = REGISTRY.gauge("bc351_cache_size", "Entries currently in the lru_cache.", ["cache"])
+
+
+def watch_cache(name: str, cached_fn) -> None:
+    """Export an lru_cache'd function's cache_info() as bc351_cache_* gauges."""
+    CACHE_HITS.labels(cache=name).set_function(lambda: cached_fn.cache_info().hits)
+    CACHE_MISSES.labels(cache=name).set_function(lambda: cached_fn.cache_info().misses)
+    CACHE_SIZE.labels(cache=name).set_function(lambda: cached_fn.cache_info().currsize)
+
+
+def stage(name: str) -> _HistogramChild:
+    """bc351_stage_seconds child for `name` (observe(seconds) or `with stage(x).time():`)."""
+    return STAGE_SECONDS.labels(stage=name)
+
+
+class Stopwatch:
+    """Consecutive stage timings: lap("guard") observes the time since the previous lap."""
+    __slots__ = ("t0", "last")
+
+    def __init__(self):
+        self.t0 = self.last = time.perf_counter()
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        stage(name).observe(now - self.last)
+        self.last = now
+
+    def total(self, name: str):
+        """Observe the time since the stopwatch started."""
+        stage(name).observe(time.perf_counter() - self.t0)
+
+
+@lru_cache(maxsize=1)
+def metrics_exporter() -> Registry:
+    """
+    Start the configured exporters once per process (no-op when neither
+    BC351_METRICS_PORT nor BC351_METRICS_FILE is set) and watch the caches.
+    """
+    try:
+        from backend.question_loader import load_module_bundle
+        from backend.concept_check import concept_plan, load_concept_spec
+        from backend.keyphrase_index import keyphrase_index
+    except Exception:
+        from question_loader import load_module_bundle
+        from concept_check import concept_plan, load_concept_spec
+        from keyphrase_index import keyphrase_index
+    for name, fn in (("load_module_bundle", load_module_bundle), ("load_concept_spec", load_concept_spec),
+                     ("concept_plan", concept_plan), ("keyphrase_index", keyphrase_index)):
+        watch_cache(name, fn)
+
+    if METRICS_PORT:
+        try:
+            REGISTRY.serve(METRICS_PORT)
+            print(f"📈 metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as e:  # e.g. another pre-forked worker already has the port
+            print(f"⚠️ metrics port {METRICS_PORT} unavailable: {e}")
+    if METRICS_FILE:
+        REGISTRY.write_every(METRICS_FILE)
+    return REGISTRY
@@ -0,0 +1,256 @@
+# backend/module_builder.py
+"""
+Incremental module build: PDFs -> the text/chunk files the tutor loads.
+
+For each modules/<id>/ folder:
+  <id>_questions.pdf  -> <id>_questions.txt
+  <id>_answers.pdf    -> <id>_answers.txt
+  any other *.pdf     -> <id>_chunks.json   (reading material, ~5k char chunks)
+
+Every input PDF is content-hashed (sha256) and recorded in
+modules/<id>/.build_manifest.json; unchanged inputs are skipped, so a rebuild
+after one edit only re-extracts that one file. Modules are built in parallel
+across a process pool.
+
+The manifest also records the hash of every .txt the builder wrote. A .txt
+it did not write (hand-maintained, or edited since the last build) is never
+overwritten: the extraction goes to <id>_questions_extracted.txt /
+<id>_answers_extracted.txt next to it instead, unless --force is given.
+Running page headers / footers ("BC 351: ...", "Page 1 of 3") are dropped
+from extracted text.
+
+Usage:
+  python -m backend.module_builder                 # all modules
+  python -m backend.module_builder module02 -f     # force one module (overwrites hand-made .txt)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MODULES_DIR = Path("modules")
+MANIFEST_NAME = ".build_manifest.json"
+CHUNK_CHARS = 5000
+_HASH_BLOCK = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ---------- PDF text extraction ----------
+
+_PAGE_NO = re.compile(r"^(page\s+)?\d+(\s*(of|/)\s*\d+)?$", re.IGNORECASE)
+_EDGE_LINES = 3  # lines at the top / bottom of a page that may be header / footer
+
+
+def strip_page_furniture(pages: List[List[str]]) -> List[List[str]]:
+    """
+    Drop page numbers ("Page 1 of 3", "2") and running headers / footers
+    (a line repeated at the top or bottom of at least half the pages) from
+    the edges of each page.
+    """
+    def edges(lines: List[str]) -> List[str]:
+        body = [ln.strip() for ln in lines if ln.strip()]
+        return body[:_EDGE_LINES] + body[-_EDGE_LINES:]
+
+    seen: Dict[str, int] = {}
+    for lines in pages:
+        for ln in set(edges(lines)):
+            seen[ln] = seen.get(ln, 0) + 1
+    running = {ln for ln, n in seen.items() if len(pages) > 1 and n * 2 >= len(pages)}
+
+    out: List[List[str]] = []
+    for lines in pages:
+        edge = set(edges(lines))
+        out.append([ln for ln in lines
+                    if not (ln.strip() in edge and (ln.strip() in running or _PAGE_NO.match(ln.strip())))])
+    return out
+
+
+def extract_pdf_text(path: Path) -> str:
+    """
+    Extract text page by page, minus page headers / footers. Pages are
+    separated by a blank line so text from consecutive pages never runs
+    together.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("PDF extraction needs pypdf: pip install pypdf") from e
+
+    pages: List[List[str]] = []
+    for page in PdfReader(str(path)).pages:
+        text = page.extract_text() or ""
+        pages.append([ln.rstrip() for ln in text.splitlines()])
+    texts = ("\n".join(lines).strip() for lines in strip_page_furniture(pages))
+    return "\n\n".join(t for t in texts if t) + "\n"
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS) -> List[str]:
+    """
+    Pack paragraphs into chunks of roughly `size` characters. Paragraphs are
+    joined with a blank line; a single oversized paragraph is split on
+    sentence boundaries.
+    """
+    chunks: List[str] = []
+    cur: List[str] = []
+    cur_len = 0
+
+    def flush():
+        nonlocal cur, cur_len
+        if cur:
+            chunks.append("\n\n".join(cur))
+        cur, cur_len = [], 0
+
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        pieces = [para] if len(para) <= size else re.split(r"(?<=[.!?])\s+", para)
+        for piece in pieces:
+            if cur_len and cur_len + len(piece) + 2 > size:
+                flush()
+            cur.append(piece)
+            cur_len += len(piece) + 2
+    flush()
+    return chunks
+
+
+# ---------- Per-module build ----------
+
+def _load_manifest(mdir: Path) -> Dict[str, Dict[str, str]]:
+    """{"inputs": {pdf name: sha256}, "outputs": {txt name: sha256 as written}}."""
+    path = mdir / MANIFEST_NAME
+    data = {}
+    if path.exists():
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            data = {}
+    if not isinstance(data, dict):
+        data = {}
+    if "inputs" not in data:  # first format: a flat {pdf name: sha256}
+        data = {"inputs": {k: v for k, v in data.items() if isinstance(v, str)}, "outputs": {}}
+    return {"inputs": dict(data.get("inputs") or {}), "outputs": dict(data.get("outputs") or {})}
+
+
+def _text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_module(module_id: str, modules_dir: str = str(MODULES_DIR), force: bool = False) -> Dict[str, List[str]]:
+    """
+    Build one module folder. Returns {"built": [...], "skipped": [...],
+    "kept": [...]}: the PDF names that were (re)extracted or left alone, and
+    the hand-made .txt files that were not overwritten.
+    Runs in a worker process, so it only takes/returns plain data.
+    """
+    mdir = Path(modules_dir) / module_id
+    manifest = _load_manifest(mdir)
+    inputs, outputs = manifest["inputs"], manifest["outputs"]
+    new_inputs: Dict[str, str] = {}
+    new_outputs: Dict[str, str] = {}
+    built: List[str] = []
+    skipped: List[str] = []
+    kept: List[str] = []
+
+    q_pdf = mdir / f"{module_id}_questions.pdf"
+    a_pdf = mdir / f"{module_id}_answers.pdf"
+    readings = sorted(p for p in mdir.glob("*.pdf") if p not in (q_pdf, a_pdf))
+
+    # questions / answers: one PDF -> one txt (or *_extracted.txt beside a hand-made one)
+    for pdf, out in ((q_pdf, mdir / f"{module_id}_questions.txt"),
+                     (a_pdf, mdir / f"{module_id}_answers.txt")):
+        if not pdf.exists():
+            continue
+        digest = file_sha256(pdf)
+        new_inputs[pdf.name] = digest
+        ours = out.exists() and outputs.get(out.name) == file_sha256(out)
+        if out.exists() and not ours and not force:
+            kept.append(out.name)
+            out = out.with_name(f"{out.stem}_extracted.txt")
+            ours = out.exists() and outputs.get(out.name) == file_sha256(out)
+        if not force and ours and inputs.get(pdf.name) == digest:
+            new_outputs[out.name] = outputs[out.name]
+            skipped.append(pdf.name)
+            continue
+        text = extract_pdf_text(pdf)
+        out.write_text(text, encoding="utf-8")
+        new_outputs[out.name] = _text_sha256(text)
+        built.append(pdf.name)
+
+    # readings: all other PDFs -> one chunks file (rebuilt if any input changed)
+    if readings:
+        chunks_file = mdir / f"{module_id}_chunks.json"
+        digests = {p.name: file_sha256(p) for p in readings}
+        new_inputs.update(digests)
+        unchanged = all(inputs.get(name) == d for name, d in digests.items())
+        if not force and chunks_file.exists() and unchanged:
+            skipped.extend(digests)
+        else:
+            chunks: List[str] = []
+            for pdf in readings:
+                chunks.extend(chunk_text(extract_pdf_text(pdf)))
+            chunks_file.write_text(json.dumps(chunks, ensure_ascii=False), encoding="utf-8")
+            built.extend(digests)
+
+    new_manifest = {"inputs": new_inputs, "outputs": new_outputs}
+    if new_manifest != manifest:
+        (mdir / MANIFEST_NAME).write_text(json.dumps(new_manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+    return {"built": built, "skipped": skipped, "kept": kept}
+
+
+def build_all(module_ids: Optional[List[str]] = None, force: bool = False, jobs: Optional[int] = None) -> Dict[str, Dict[str, List[str]]]:
+    """Build the given modules (default: every folder under modules/) in parallel."""
+    if not module_ids:
+        module_ids = sorted(p.name for p in MODULES_DIR.iterdir() if p.is_dir())
+
+    results: Dict[str, Dict[str, List[str]]] = {}
+    workers = max(1, min(jobs or os.cpu_count() or 1, len(module_ids)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(build_module, mid, str(MODULES_DIR), force): mid for mid in module_ids}
+        for fut in as_completed(futures):
+            mid = futures[fut]
+            try:
+                results[mid] = fut.result()
+            except Exception as e:
+                results[mid] = {"built": [], "skipped": [], "kept": [], "error": [str(e)]}
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Extract module PDFs into questions/answers/chunks files.")
+    ap.add_argument("modules", nargs="*", help="module ids (default: all)")
+    ap.add_argument("-f", "--force", action="store_true",
+                    help="ignore the content-hash manifest and overwrite hand-made .txt files")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = ap.parse_args(argv)
+
+    results = build_all(args.modules, force=args.force, jobs=args.jobs)
+    failed = False
+    for mid in sorted(results):
+        r = results[mid]
+        if r.get("error"):
+            failed = True
+            print(f"❌ {mid}: {r['error'][0]}")
+        else:
+            print(f"✅ {mid}: built {len(r['built'])}, skipped {len(r['skipped'])}")
+            for name in r.get("kept") or []:
+                print(f"   ✋ kept hand-made {name} (extraction in {Path(name).stem}_extracted.txt; -f to overwrite)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
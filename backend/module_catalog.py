@@ -0,0 +1,234 @@
+# backend/module_catalog.py
+"""
+Module catalog: what modules exist, and a little about each, built once.
+
+The sidebar used to list modules with Path("modules").iterdir() on every
+rerun and never read modules.json. The catalog merges the two:
+
+  modules.json       module id → title (the course plan, incl. modules
+                     that don't have a folder yet)
+  modules/<id>/      on-disk presence + metadata computed once per scan:
+                     question / subpart counts, diagram count, how many
+                     question positions the tutor checks against a
+                     hand-written answers.json spec and how many against
+                     keyphrases of the answer text (the rest get generic
+                     follow-ups), and total asset bytes
+
+and is only rebuilt when modules.json or one of the module directories
+changes (mtime check, at most once every `check_interval` seconds), so a
+click costs no filesystem calls at all in between. (Editing a file in
+place doesn't touch its folder's mtime; catalog.refresh(force=True) picks
+that up.)
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from backend.question_loader import iter_question_records
+    from backend.concept_check import question_key
+    from backend.keyphrase_index import keyphrase_spec
+except Exception:
+    from question_loader import iter_question_records
+    from concept_check import question_key
+    from keyphrase_index import keyphrase_spec
+
+MODULES_DIR = Path("modules")
+MANIFEST = Path("modules.json")
+
+
+@dataclass(frozen=True)
+class ModuleInfo:
+    module_id: str
+    title: str
+    available: bool = False    # folder with a parseable questions file
+    questions: int = 0
+    subparts: int = 0          # answerable positions: parts, or 1 per question without parts
+    diagrams: int = 0
+    spec_positions: int = 0    # positions covered by answers.json
+    keyphrase_positions: int = 0   # positions covered only by keyphrases of the answer text
+    asset_bytes: int = 0
+
+    @property
+    def spec_coverage(self) -> float:
+        return self.spec_positions / self.subparts if self.subparts else 0.0
+
+    @property
+    def keyphrase_coverage(self) -> float:
+        return self.keyphrase_positions / self.subparts if self.subparts else 0.0
+
+    def summary(self) -> str:
+        """One-line description for the sidebar."""
+        if not self.available:
+            return "Not available yet."
+        bits = [_count(self.questions, "question"), _count(self.subparts, "part")]
+        if self.diagrams:
+            bits.append(_count(self.diagrams, "diagram"))
+        checks = []
+        if self.spec_positions:
+            checks.append(f"answer key {self.spec_coverage:.0%}")
+        if self.keyphrase_positions:
+            checks.append(f"key phrases {self.keyphrase_coverage:.0%}")
+        bits.append(" + ".join(checks) or "generic follow-ups")
+        bits.append(f"{self.asset_bytes / 1_000_000:.1f} MB")
+        return " · ".join(bits)
+
+
+def _count(n: int, noun: str) -> str:
+    return f"{n} {noun}" + ("" if n == 1 else "s")
+
+
+# ---------- scanning ----------
+
+def _read_manifest(path: Path) -> Dict[str, str]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+
+def _asset_bytes(mdir: Path) -> int:
+    total = 0
+    for dirpath, _dirs, files in os.walk(mdir):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def scan_module(mdir: Path, title: str) -> ModuleInfo:
+    """Metadata for one module folder (no lru caches involved, so always fresh)."""
+    module_id = mdir.name
+    records = list(iter_question_records(mdir / f"{module_id}_questions.txt"))
+    if not records:
+        return ModuleInfo(module_id, title)
+
+    specs: dict = {}
+    a_json = mdir / f"{module_id}_answers.json"
+    if a_json.exists():
+        try:
+            specs = json.loads(a_json.read_text(encoding="utf-8"))
+        except Exception:
+            specs = {}
+
+    # the same lookup the tutor does (keyphrase_index.grounded_spec): answers.json, else keyphrases
+    positions = covered = keyphrased = 0
+    for qi, rec in enumerate(records):
+        for pi in range(max(1, len(rec.parts))):
+            positions += 1
+            part_key = question_key(qi, pi, rec.q)
+            if isinstance(specs.get(part_key), dict) or isinstance(specs.get(part_key[:-1]), dict):
+                covered += 1
+            elif keyphrase_spec(module_id, qi, pi, rec.q)[1]:
+                keyphrased += 1
+
+    diagrams = 0
+    d_json = mdir / f"{module_id}_diagrams.json"
+    if d_json.exists():
+        try:
+            data = json.loads(d_json.read_text(encoding="utf-8"))
+            diagrams = sum(1 for v in data.values() if isinstance(v, dict)) if isinstance(data, dict) else 0
+        except Exception:
+            pass
+
+    return ModuleInfo(
+        module_id=module_id,
+        title=title,
+        available=True,
+        questions=len(records),
+        subparts=positions,
+        diagrams=diagrams,
+        spec_positions=covered,
+        keyphrase_positions=keyphrased,
+        asset_bytes=_asset_bytes(mdir),
+    )
+
+
+# ---------- catalog ----------
+
+class ModuleCatalog:
+    """
+    Cached list of ModuleInfo, in modules.json order followed by any extra
+    folders. Safe to share between Streamlit sessions.
+    """
+
+    def __init__(self, root: Path = MODULES_DIR, manifest: Path = MANIFEST, check_interval: float = 2.0):
+        self.root = Path(root)
+        self.manifest = Path(manifest)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple] = None
+        self._checked = 0.0
+        self._modules: Dict[str, ModuleInfo] = {}
+
+    def _fingerprint(self) -> Tuple:
+        """mtimes of modules.json, modules/ and each module folder (adds / renames / removals)."""
+        def mtime(p: Path) -> int:
+            try:
+                return p.stat().st_mtime_ns
+            except OSError:
+                return 0
+
+        dirs = []
+        if self.root.is_dir():
+            with os.scandir(self.root) as it:
+                dirs = sorted((e.name, e.stat().st_mtime_ns) for e in it if e.is_dir())
+        return (mtime(self.manifest), mtime(self.root), tuple(dirs))
+
+    def _rebuild(self):
+        titles = _read_manifest(self.manifest)
+        on_disk = sorted(p.name for p in self.root.iterdir() if p.is_dir()) if self.root.is_dir() else []
+        modules: Dict[str, ModuleInfo] = {}
+        for module_id in [*titles, *(m for m in on_disk if m not in titles)]:
+            title = titles.get(module_id, module_id)
+            if module_id in on_disk:
+                try:
+                    modules[module_id] = scan_module(self.root / module_id, title)
+                except Exception as e:
+                    print(f"⚠️ module catalog: skipping {module_id}: {e}")
+                    modules[module_id] = ModuleInfo(module_id, title)
+            else:
+                modules[module_id] = ModuleInfo(module_id, title)
+        self._modules = modules
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rescan if anything changed (checked at most every check_interval s). True if rebuilt."""
+        now = time.monotonic()
+        if not force and self._stamp is not None and now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            stamp = self._fingerprint()
+            if not force and stamp == self._stamp:
+                return False
+            self._rebuild()
+            self._stamp = stamp
+            return True
+
+    # ---------- queries ----------
+    def all(self) -> List[ModuleInfo]:
+        self.refresh()
+        return list(self._modules.values())
+
+    def available(self) -> List[ModuleInfo]:
+        return [m for m in self.all() if m.available]
+
+    def get(self, module_id: str) -> Optional[ModuleInfo]:
+        self.refresh()
+        return self._modules.get(module_id)
+
+
+@lru_cache(maxsize=1)
+def module_catalog() -> ModuleCatalog:
+    """Process-wide catalog for ./modules and ./modules.json."""
+    return ModuleCatalog()
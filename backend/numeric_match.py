@@ -0,0 +1,247 @@
+# backend/numeric_match.py
+"""
+Numeric matching for concepts that contain numbers ("6.0", "-30.5 kJ/mol",
+"avoidability estimate (80–90%)").
+
+The old check was `"6.0" in answer.lower()`, so 6.0 matched inside 16.05 and
+a student writing "6" or "6.00" missed. Here the numbers in an answer are
+tokenized once — sign, decimals, scientific notation (1.8e-5, 1.8 x 10^-5)
+and a unit when one follows — into a NumericIndex: sorted value lists per
+canonical unit. Each numeric target is then one bisect.
+
+Matching rules:
+  - values compare numerically (6 == 6.0 == 6.00), exact unless the spec
+    declares a tolerance
+  - a target with a unit accepts the same quantity in a convertible unit
+    (kcal/mol -> kJ/mol, mM -> M, kDa -> Da) or a bare number, unless
+    require_unit is set; a conflicting unit never matches
+  - a target without a unit accepts any number with that value
+
+Spec declarations (moduleXX_answers.json), keyed by concept:
+  "numeric": {
+    "-30.5 kJ/mol": {"tolerance": 0.5, "unit": "kJ/mol", "require_unit": true},
+    "1.8e-5":       {"rel_tolerance": 0.05}
+  }
+"""
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# canonical unit + multiplier into it. Keys are lowercased with spaces removed,
+# except molar concentrations, where case matters (mM vs MM).
+UNITS: Dict[str, Tuple[str, float]] = {
+    "kj/mol": ("kJ/mol", 1.0),
+    "kjmol-1": ("kJ/mol", 1.0),
+    "j/mol": ("kJ/mol", 1e-3),
+    "jmol-1": ("kJ/mol", 1e-3),
+    "kcal/mol": ("kJ/mol", 4.184),
+    "kcalmol-1": ("kJ/mol", 4.184),
+    "cal/mol": ("kJ/mol", 4.184e-3),
+    "M": ("M", 1.0),
+    "mM": ("M", 1e-3),
+    "µM": ("M", 1e-6),
+    "uM": ("M", 1e-6),
+    "nM": ("M", 1e-9),
+    "pM": ("M", 1e-12),
+    "%": ("%", 1.0),
+    "percent": ("%", 1.0),
+    "da": ("Da", 1.0),
+    "kda": ("Da", 1e3),
+    "°c": ("°C", 1.0),
+}
+
+_UNIT_RE = (
+    r"(?i:k?j\s*/\s*mol|k?j\s*mol\s*[-−]1|k?cal\s*/\s*mol|k?cal\s*mol\s*[-−]1|k?da|percent|°\s*c)"
+    r"|%|[mµunp]?M"
+)
+_NUMBER = re.compile(
+    r"(?<![\d.])"
+    r"(?P<sign>[-+−])?"
+    r"(?P<mant>\d+(?:\.\d+)?|\.\d+)"
+    r"(?:[eE](?P<e>[-+−]?\d+)|\s*[x×*]\s*10\s*\^?\s*(?P<p>[-+−]?\d+))?"
+    r"(?!\d)"
+    rf"(?:\s*(?P<unit>{_UNIT_RE})(?![A-Za-z0-9]))?"
+)
+
+
+class NumberToken(NamedTuple):
+    value: float          # as written (sign and exponent applied)
+    unit: Optional[str]   # canonical unit, None when bare
+    canonical: float      # value converted into `unit`
+    start: int
+    end: int
+    glued: bool           # digits attached to a word ("PO4", "NH3", "pKa1")
+
+
+class NumericTarget(NamedTuple):
+    """One number a concept asks for; hashable, so it can be a plan needle."""
+    value: float
+    unit: Optional[str] = None
+    tolerance: float = 0.0
+    rel_tolerance: float = 0.0
+    require_unit: bool = False
+
+    def window(self) -> Tuple[float, float]:
+        slack = max(self.tolerance, abs(self.value) * self.rel_tolerance)
+        slack += 1e-9 * max(1.0, abs(self.value))  # float noise only
+        return self.value - slack, self.value + slack
+
+
+class NumericRule(NamedTuple):
+    """A spec's "numeric" entry for one concept."""
+    tolerance: float = 0.0
+    rel_tolerance: float = 0.0
+    unit: Optional[str] = None
+    require_unit: bool = False
+
+
+def _unit_key(raw: str) -> str:
+    raw = re.sub(r"\s+", "", raw).replace("−", "-")
+    return raw if raw in UNITS else raw.lower()
+
+
+def canonical_unit(raw: Optional[str]) -> Tuple[Optional[str], float]:
+    """(canonical unit, factor) for a unit as written; unknown units -> (None, 1.0)."""
+    if not raw:
+        return None, 1.0
+    return UNITS.get(_unit_key(raw), (None, 1.0))
+
+
+def tokenize_numbers(text: str) -> List[NumberToken]:
+    """Every number in `text`, left to right."""
+    out: List[NumberToken] = []
+    if not text or not any(ch.isdigit() for ch in text):
+        return out
+    for m in _NUMBER.finditer(text):
+        start = m.start()
+        sign = m.group("sign")
+        # "-" is a sign only when it isn't joining words/numbers ("post-1975", "6.0-9.2")
+        if sign and start > 0 and text[start - 1].isalnum():
+            sign = None
+            start += 1
+        value = float(m.group("mant"))
+        exp = m.group("e") or m.group("p")
+        if exp:
+            value *= 10.0 ** int(exp.replace("−", "-"))
+        if sign in ("-", "−"):
+            value = -value
+        unit, factor = canonical_unit(m.group("unit"))
+        glued = start > 0 and text[start - 1].isalpha()
+        out.append(NumberToken(value, unit, value * factor, start, m.end(), glued))
+    return out
+
+
+class NumericIndex:
+    """Sorted numbers of one answer: bare values, plus canonical values per unit."""
+    __slots__ = ("bare", "by_unit", "raw", "tokens")
+
+    def __init__(self, tokens: List[NumberToken] = ()):
+        self.tokens = tuple(tokens)
+        bare: List[float] = []
+        raw: List[float] = []
+        by_unit: Dict[str, List[float]] = {}
+        for tok in tokens:
+            raw.append(tok.value)
+            if tok.unit is None:
+                bare.append(tok.value)
+            else:
+                by_unit.setdefault(tok.unit, []).append(tok.canonical)
+        bare.sort()
+        raw.sort()
+        for values in by_unit.values():
+            values.sort()
+        self.bare = bare
+        self.raw = raw
+        self.by_unit = by_unit
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    @staticmethod
+    def _any_in(values: List[float], lo: float, hi: float) -> bool:
+        i = bisect_left(values, lo)
+        return i < len(values) and values[i] <= hi
+
+    def __contains__(self, target: NumericTarget) -> bool:
+        lo, hi = target.window()
+        if target.unit is None:
+            return self._any_in(self.raw, lo, hi)
+        if self._any_in(self.by_unit.get(target.unit, ()), lo, hi):
+            return True
+        return not target.require_unit and self._any_in(self.bare, lo, hi)
+
+    def locate(self, target: NumericTarget) -> Optional[Tuple[int, int]]:
+        """(start, end) of the first number matching `target`, for highlighting."""
+        lo, hi = target.window()
+        for tok in self.tokens:
+            if target.unit is None:
+                ok = lo <= tok.value <= hi
+            elif tok.unit is None:
+                ok = not target.require_unit and lo <= tok.value <= hi
+            else:
+                ok = tok.unit == target.unit and lo <= tok.canonical <= hi
+            if ok:
+                return tok.start, tok.end
+        return None
+
+
+EMPTY_INDEX = NumericIndex()
+
+
+def index_numbers(text: str) -> NumericIndex:
+    tokens = tokenize_numbers(text)
+    return NumericIndex(tokens) if tokens else EMPTY_INDEX
+
+
+def strip_numbers(text: str) -> str:
+    """`text` with its standalone numbers (and their units) removed."""
+    parts, pos = [], 0
+    for tok in tokenize_numbers(text):
+        if not tok.glued:
+            parts.append(text[pos:tok.start])
+            pos = tok.end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def numeric_rule(spec: dict, concept: str) -> Optional[NumericRule]:
+    """The spec's declared tolerance/unit for `concept`, or None."""
+    entry = ((spec or {}).get("numeric") or {}).get(concept)
+    if not isinstance(entry, dict):
+        return None
+    return NumericRule(
+        tolerance=float(entry.get("tolerance", 0.0) or 0.0),
+        rel_tolerance=float(entry.get("rel_tolerance", 0.0) or 0.0),
+        unit=entry.get("unit"),
+        require_unit=bool(entry.get("require_unit", False)),
+    )
+
+
+def concept_numbers(concept: str, rule: Optional[NumericRule] = None) -> Tuple[Tuple[NumericTarget, ...], Tuple[str, ...]]:
+    """
+    Split a concept's numbers into (targets, glued): standalone numbers become
+    NumericTargets; digits glued to a word ("PO4") stay plain substrings, as
+    they are part of a formula rather than a quantity.
+    """
+    rule = rule or NumericRule()
+    rule_unit, rule_factor = canonical_unit(rule.unit)
+    targets: List[NumericTarget] = []
+    glued: List[str] = []
+    for tok in tokenize_numbers(concept):
+        if tok.glued:
+            glued.append(re.match(r"[\d.]+", concept[tok.start:]).group(0))
+            continue
+        unit, value = tok.unit, tok.canonical
+        if unit is None and rule_unit is not None:
+            unit, value = rule_unit, tok.value * rule_factor
+        scale = rule_factor if rule_unit is not None and unit == rule_unit else 1.0
+        targets.append(NumericTarget(
+            value=value,
+            unit=unit,
+            tolerance=rule.tolerance * scale,
+            rel_tolerance=rule.rel_tolerance,
+            require_unit=rule.require_unit and unit is not None,
+        ))
+    return tuple(targets), tuple(glued)
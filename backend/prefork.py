@@ -0,0 +1,251 @@
+# backend/prefork.py
+"""
+Pre-fork launcher: load everything once, then fork workers that share it.
+
+Without this, every Streamlit (or eval) process imports biochem_concepts,
+parses every module and compiles its own concept plans, so resident memory
+grows linearly with the worker count. Here the parent:
+
+  1. imports the backend and warms every cache: module bundles, answers.json
+     specs, concept plans (incl. the cross-domain index), wrong-trigger
+     matchers and keyphrase specs for modules without answers.json
+  2. gc.collect() + gc.freeze(), so those objects move to the permanent
+     generation and later collections don't write to their pages (which
+     would break copy-on-write sharing)
+  3. forks N workers; each serves on base_port + i
+
+and then reports each worker's unique memory (USS = Private_Clean +
+Private_Dirty from /proc/<pid>/smaps_rollup) next to its RSS/PSS.
+
+Nothing here may start threads before the fork (no default_log() /
+default_store()); workers create those lazily on first use.
+
+Usage:
+  python -m backend.prefork --workers 4 --port 8501          # Streamlit servers
+  python -m backend.prefork --workers 4 --serve hold          # just hold the memory, for measuring
+  python -m backend.prefork --workers 4 --serve hold --no-preload   # baseline: each worker loads its own
+  python -m backend.prefork --workers 4 --serve hold --exercise 20  # hold after 20 real app reruns per module
+
+--exercise N drives streamlit_app.py through N submit / skip turns per
+module in every worker (streamlit's AppTest: the real script and the real
+caches, against a throwaway session DB and event dir) before the report,
+so the numbers include what app reruns un-share or reload.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def preload(module_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """Warm every shared cache in this process; returns counts for the log line."""
+    for p in (str(ROOT), str(ROOT / "backend")):
+        if p not in sys.path:
+            sys.path.append(p)
+    os.chdir(ROOT)  # module data is read relative to the repo root
+
+    from backend import biochem_concepts  # noqa: F401
+    from backend.concept_check import load_concept_spec, spec_plans
+    from backend.concept_index import concept_index
+    from backend.keyphrase_index import keyphrase_index
+    from backend.question_loader import load_module_bundle
+    from backend.socratic_engine import wrong_trigger_matcher
+    import backend.answer_history, backend.transcript, backend.session_store, backend.event_log  # noqa: F401,E401
+    import backend.live_stats, backend.live_hints, backend.eval_service, backend.generation  # noqa: F401,E401
+
+    if module_ids is None:
+        module_ids = sorted(p.name for p in Path("modules").iterdir() if p.is_dir())
+
+    counts = {"modules": 0, "specs": 0, "plans": 0}
+    concept_index()
+    for module_id in module_ids:
+        try:
+            load_module_bundle(module_id)
+        except Exception as e:
+            print(f"⚠️ skipping {module_id}: {e}")
+            continue
+        counts["modules"] += 1
+        specs = load_concept_spec(module_id)
+        if not specs:
+            specs = keyphrase_index(module_id)
+        for spec_key, spec in specs.items():
+            if isinstance(spec, dict):
+                counts["specs"] += 1
+                counts["plans"] += len(spec_plans(spec))
+                wrong_trigger_matcher(module_id, spec_key, spec)
+    return counts
+
+
+def memory(pid: int) -> Dict[str, int]:
+    """RSS / PSS / USS / shared in KB from /proc/<pid>/smaps_rollup ({} if unavailable)."""
+    fields: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) >= 3 and parts[0].endswith(":"):
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def report(pids: List[int]) -> None:
+    print(f"{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}{'shared MB':>11}")
+    total_uss = 0
+    for pid in [os.getpid(), *pids]:
+        m = memory(pid)
+        if not m:
+            print(f"{pid:>8}  (no smaps_rollup)")
+            continue
+        total_uss += m["uss"] if pid != os.getpid() else 0
+        tag = " parent" if pid == os.getpid() else ""
+        print(f"{pid:>8}{m['rss'] / 1024:>10.1f}{m['pss'] / 1024:>10.1f}{m['uss'] / 1024:>10.1f}{m['shared'] / 1024:>11.1f}{tag}")
+    if pids:
+        print(f"workers' unique memory: {total_uss / 1024:.1f} MB total, {total_uss / 1024 / len(pids):.1f} MB each")
+
+
+# ---------- worker bodies ----------
+
+def _serve_streamlit(port: int, script: str):
+    from streamlit.web import bootstrap
+    flags = {"server_port": port, "server_headless": True}
+    bootstrap.load_config_options(flag_options=flags)
+    bootstrap.run(script, False, [], flags)
+
+
+_EXERCISE_ANSWERS = (
+    "cells divide without control and ignore the signals that normally stop growth",
+    "it is favorable because delta G is negative and the products are more stable",
+    "idk",
+    "mutations in DNA accumulate, and a single cell gives rise to the tumor",
+)
+
+
+def _exercise(script: str, module_ids: Optional[List[str]], turns: int):
+    """Run the app script through `turns` submit / skip reruns per module, like a student would."""
+    from streamlit.testing.v1 import AppTest
+
+    if module_ids is None:
+        module_ids = sorted(p.name for p in Path("modules").iterdir() if p.is_dir())
+    for module_id in module_ids:
+        at = AppTest.from_file(script, default_timeout=60)
+        at.run()
+        if module_id not in at.sidebar.selectbox[0].options:
+            continue
+        at.sidebar.selectbox[0].set_value(module_id)
+        at.sidebar.text_input[0].input(f"prefork-{os.getpid()}")
+        at.run()
+        for i in range(turns):
+            boxes = [t for t in at.text_area if t.key == "answer_box"]
+            if boxes and i % 4 != 3:
+                boxes[0].input(_EXERCISE_ANSWERS[i % len(_EXERCISE_ANSWERS)])
+                label = "Submit answer"
+            else:
+                label = "Skip"
+            button = next((b for b in at.button if (b.label or "").startswith(label)), None)
+            if button is None:
+                break
+            button.click()
+            at.run()
+            if at.exception:
+                print(f"⚠️ worker {os.getpid()}: {module_id} turn {i}: {at.exception[0].message}")
+                break
+
+
+def _serve_hold(preloaded: bool, module_ids: Optional[List[str]], script: str = "", exercise: int = 0):
+    if not preloaded:
+        preload(module_ids)
+    if exercise:
+        _exercise(script, module_ids, exercise)
+        print(f"🏃 worker {os.getpid()}: {exercise} turns per module done")
+    signal.pause()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Preload BC351 data once and fork workers that share it.")
+    ap.add_argument("modules", nargs="*", help="modules to preload (default: every modules/* folder)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--serve", choices=["streamlit", "hold"], default="streamlit")
+    ap.add_argument("--port", type=int, default=8501, help="first worker's port (streamlit)")
+    ap.add_argument("--script", default=str(ROOT / "streamlit_app.py"))
+    ap.add_argument("--no-preload", action="store_true", help="baseline: every worker loads its own copy")
+    ap.add_argument("--report-after", type=float, default=5.0, help="seconds before printing memory (0 = never)")
+    ap.add_argument("--exercise", type=int, default=0,
+                    help="with --serve hold: app reruns (submit / skip turns) per module in each worker first")
+    args = ap.parse_args(argv)
+
+    if args.exercise:
+        # read at import time (preload below); exercising must not touch the real session DB / event log
+        tmp = tempfile.mkdtemp(prefix="bc351-prefork-")
+        os.environ["BC351_SESSION_DB"] = os.path.join(tmp, "sessions.sqlite3")
+        os.environ["BC351_EVENT_DIR"] = os.path.join(tmp, "events")
+        os.environ.pop("BC351_RECORD_DIR", None)
+
+    module_ids = args.modules or None
+    preloaded = not args.no_preload
+    if preloaded:
+        t0 = time.perf_counter()
+        if args.serve == "streamlit":
+            import streamlit.web.bootstrap  # noqa: F401  (server code shared too; starts no threads)
+        elif args.exercise:
+            import streamlit.testing.v1  # noqa: F401  (same for the exercising harness)
+        counts = preload(module_ids)
+        gc.collect()
+        gc.freeze()  # keep the GC from touching (and un-sharing) preloaded pages
+        print(f"✅ preloaded {counts['modules']} modules, {counts['specs']} specs, "
+              f"{counts['plans']} concept plans in {time.perf_counter() - t0:.2f}s; "
+              f"{gc.get_freeze_count()} objects frozen")
+
+    pids: List[int] = []
+    for i in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                if args.serve == "streamlit":
+                    _serve_streamlit(args.port + i, args.script)
+                else:
+                    _serve_hold(preloaded, module_ids, args.script, args.exercise)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    print(f"🚀 forked {len(pids)} workers: {', '.join(map(str, pids))}")
+
+    def stop(_sig, _frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if args.report_after > 0:
+        time.sleep(args.report_after)
+        report(pids)
+    while pids:
+        pid, _status = os.wait()
+        if pid in pids:
+            pids.remove(pid)
+            print(f"⚠️ worker {pid} exited")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
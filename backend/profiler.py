@@ -0,0 +1,211 @@
+# backend/profiler.py
+"""
+Opt-in sampled profiling of app reruns, for "the tutor is slow" reports.
+
+With BC351_PROFILE_RATE > 0, that fraction of script runs is recorded with
+cProfile, from the top of streamlit_app.py to the end of the run (the app
+stops the capture in a `finally`, so st.rerun() / st.stop() / errors close it
+too). When the run ends, the capture is labeled by what the run did
+(render, submit, diagram, skip, bonus, error). It is kept only if it is among the
+`keep` slowest captures so far, so the directory holds a rolling window of
+the worst runs and never grows past `keep` files:
+
+  logs/profiles/<elapsed ms>_<timestamp>_<kind>.prof    pstats dump
+  logs/profiles/<same name>.json                        session, module, qkey, kind, elapsed_ms, ts
+
+Aggregate them into one hot-function report:
+  python -m backend.profiler [--kind submit] [--module module01] [--top 25] [--sort cumulative]
+
+Only one capture runs at a time per process (Python 3.12+ profilers are
+process-wide), and a sampled run that overlaps another is simply not
+captured. Runs that are not sampled cost one random() call and a counter
+update.
+
+Config:
+  BC351_PROFILE_RATE   fraction of runs to profile   (default 0 = off)
+  BC351_PROFILE_DIR    capture directory             (default logs/profiles)
+  BC351_PROFILE_KEEP   slowest captures kept on disk (default 50)
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import heapq
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+PROFILE_RATE = float(os.environ.get("BC351_PROFILE_RATE", "0"))
+PROFILE_DIR = os.environ.get("BC351_PROFILE_DIR", "logs/profiles")
+PROFILE_KEEP = int(os.environ.get("BC351_PROFILE_KEEP", "50"))
+
+STALE_AFTER = 60.0  # a capture whose run never ended (crash) is dropped after this
+
+
+class Capture:
+    """One in-progress profile; stop() exactly once (extra calls are no-ops)."""
+    __slots__ = ("owner", "prof", "meta", "t0", "done")
+
+    def __init__(self, owner: "Profiler", meta: dict):
+        self.owner = owner
+        self.meta = meta
+        self.done = False
+        self.prof = cProfile.Profile()
+        self.t0 = time.perf_counter()
+        self.prof.enable()
+
+    def stop(self, kind: str = "render"):
+        if self.done:
+            return
+        self.done = True
+        self.prof.disable()
+        elapsed_ms = (time.perf_counter() - self.t0) * 1000.0
+        self.owner._finish(self, kind, elapsed_ms)
+
+
+class Profiler:
+    def __init__(self, directory: str = PROFILE_DIR, rate: float = PROFILE_RATE, keep: int = PROFILE_KEEP):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.rate = rate
+        self.keep = max(1, keep)
+        self.stats = {"runs": 0, "sampled": 0, "kept": 0, "busy": 0}
+        self._stats_lock = threading.Lock()
+        self._rng = random.Random()  # own stream: sampling never perturbs the tutor's choices
+        self._lock = threading.Lock()
+        self._active: Optional[Capture] = None
+        # min-heap of (elapsed_ms, stem) over the captures on disk
+        self._kept: List[Tuple[float, str]] = []
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                self._kept.append((float(json.loads(meta_path.read_text())["elapsed_ms"]), meta_path.stem))
+            except Exception:
+                continue
+        heapq.heapify(self._kept)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def start(self, **meta) -> Optional[Capture]:
+        """Begin a capture for this run if it is sampled, else None. `meta` may be filled in later."""
+        self._count("runs")
+        if self._rng.random() >= self.rate:
+            return None
+        with self._lock:
+            active = self._active
+            if active is not None and not active.done:
+                if time.perf_counter() - active.t0 < STALE_AFTER:
+                    self._count("busy")
+                    return None
+                active.done = True
+                active.prof.disable()
+            try:
+                cap = Capture(self, meta)
+            except ValueError:  # some other profiler / debugger is active
+                self._active = None
+                self._count("busy")
+                return None
+            self._active = cap
+        self._count("sampled")
+        return cap
+
+    def _finish(self, cap: Capture, kind: str, elapsed_ms: float):
+        with self._lock:
+            if self._active is cap:
+                self._active = None
+            if len(self._kept) >= self.keep and elapsed_ms <= self._kept[0][0]:
+                return  # faster than everything we keep
+            stem = f"{elapsed_ms:09.1f}ms_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{kind}"
+            meta = {**cap.meta, "kind": kind, "elapsed_ms": round(elapsed_ms, 2), "ts": time.time()}
+            try:
+                cap.prof.dump_stats(str(self.directory / f"{stem}.prof"))
+                (self.directory / f"{stem}.json").write_text(json.dumps(meta, ensure_ascii=False))
+            except OSError as e:
+                print("⚠️ profile capture not saved:", e)
+                return
+            heapq.heappush(self._kept, (elapsed_ms, stem))
+            self._count("kept")
+            while len(self._kept) > self.keep:
+                _ms, old = heapq.heappop(self._kept)
+                for suffix in (".prof", ".json"):
+                    try:
+                        (self.directory / f"{old}{suffix}").unlink()
+                    except OSError:
+                        pass
+
+
+@lru_cache(maxsize=1)
+def default_profiler() -> Optional[Profiler]:
+    """Process-wide profiler, or None when BC351_PROFILE_RATE is 0."""
+    return Profiler() if PROFILE_RATE > 0 else None
+
+
+# ---------- report ----------
+
+def load_captures(directory: str = PROFILE_DIR, kind: str = "", module: str = "") -> List[Tuple[dict, Path]]:
+    """(meta, .prof path) for every kept capture matching the filters, slowest first."""
+    out = []
+    for meta_path in Path(directory).glob("*.json"):
+        prof = meta_path.with_suffix(".prof")
+        try:
+            meta = json.loads(meta_path.read_text())
+        except Exception:
+            continue
+        if not prof.exists() or (kind and meta.get("kind") != kind) or (module and meta.get("module") != module):
+            continue
+        out.append((meta, prof))
+    out.sort(key=lambda mp: -float(mp[0].get("elapsed_ms", 0)))
+    return out
+
+
+def merged_report(captures: List[Tuple[dict, Path]], sort: str = "cumulative", top: int = 25) -> str:
+    stats = pstats.Stats(str(captures[0][1]), stream=io.StringIO())
+    for _meta, prof in captures[1:]:
+        stats.add(str(prof))
+    buf = io.StringIO()
+    stats.stream = buf
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+    return buf.getvalue()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Merge sampled profile captures into a hot-function report.")
+    ap.add_argument("--dir", default=PROFILE_DIR)
+    ap.add_argument("--kind", default="", help="only runs of this kind (render, submit, diagram, skip, bonus, error)")
+    ap.add_argument("--module", default="")
+    ap.add_argument("--sort", default="cumulative", help="pstats sort key, e.g. cumulative, tottime, ncalls")
+    ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--out", default="", help="also write the merged stats here (.prof, for snakeviz etc.)")
+    args = ap.parse_args(argv)
+
+    captures = load_captures(args.dir, args.kind, args.module)
+    if not captures:
+        print(f"no captures in {args.dir}")
+        return 1
+
+    print(f"{len(captures)} captures (slowest first):")
+    for meta, _prof in captures[:10]:
+        print(f"  {meta.get('elapsed_ms', 0):>9.1f} ms  {meta.get('kind', ''):<8} {meta.get('module', ''):<10} "
+              f"{meta.get('qkey', ''):<6} session {str(meta.get('session', ''))[:8]}")
+    if len(captures) > 10:
+        print(f"  … {len(captures) - 10} more")
+    print()
+    print(merged_report(captures, args.sort, args.top))
+
+    if args.out:
+        stats = pstats.Stats(*(str(p) for _m, p in captures), stream=io.StringIO())
+        stats.dump_stats(args.out)
+        print(f"✅ merged stats written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,7 +2,7 @@
 from dataclasses import dataclass
 from pathlib import Path
 from functools import lru_cache
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple
 import json
 import re
 
@@ -116,7 +116,8 @@ def _split_inline_parts(text: str):
     """
     Split a single line that contains inline parts like:
       '... a. ... b. ... c. ...'
-    Returns: (stem_text, parts_list) where parts_list is [{"id":"a","text":"..."}, ...]
+    Returns: (stem_text, parts_list) where each part is stored in the same
+    style as a normal subpart line, e.g. "a) ...".
     If no inline parts found, returns (text, []).
     """
     s = (text or "").strip()
@@ -125,105 +126,131 @@ def _split_inline_parts(text: str):
         return s, []
 
     # stem is everything before first 'a.' / 'b.' marker
-    first = matches[0]
-    stem = s[: first.start()].strip()
+    stem = s[: matches[0].start()].strip()
 
-    parts = []
+    parts: List[str] = []
     for i, m in enumerate(matches):
         letter = m.group(1).lower()
         start = m.end()
         end = matches[i + 1].start() if i + 1 < len(matches) else len(s)
-        part_text = s[start:end].strip(" \t-:;")
-        if part_text:
-            parts.append({"id": letter, "text": part_text})
+        body = s[start:end].strip(" \t-:;")
+        if body:
+            parts.append(f"{letter}) {body}")
 
     return stem, parts
 
-def _parse_qa_lines(lines: List[str]) -> List[Dict[str, Any]]:
+
+@dataclass
+class QuestionRecord:
+    """One parsed question plus where it came from in the source file."""
+    q: str
+    parts: List[str]
+    line: int                 # 1-based line of the "N." heading
+    offset: int               # byte offset of that line in the file
+    part_lines: List[int]     # 1-based line where each part starts
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"q": self.q, "parts": self.parts, "line": self.line, "offset": self.offset}
+
+
+class _RecordBuilder:
+    """Collects pieces of the current question; text is joined once on emit."""
+
+    def __init__(self, stem: str, line: int, offset: int):
+        self.line = line
+        self.offset = offset
+        self.stem: List[str] = [stem] if stem else []
+        self.parts: List[List[str]] = []
+        self.part_lines: List[int] = []
+
+    def add_part(self, text: str, line: int):
+        self.parts.append([text])
+        self.part_lines.append(line)
+
+    def add_continuation(self, text: str):
+        if self.parts:
+            self.parts[-1].append(text)
+        else:
+            self.stem.append(text)
+
+    def build(self) -> QuestionRecord:
+        return QuestionRecord(
+            q=" ".join(self.stem),
+            parts=[" ".join(p) for p in self.parts],
+            line=self.line,
+            offset=self.offset,
+            part_lines=self.part_lines,
+        )
+
+
+def _iter_records(numbered_lines: Iterable[Tuple[int, int, str]]) -> Iterator[QuestionRecord]:
     """
-    Convert text into [{"q": stem, "parts": [subparts...]}].
+    Core single-pass parser over (line_no, byte_offset, text) tuples.
     - New question when line starts with "1." or "1)" etc
     - Subpart when line starts with "a)"..."f)" or "a."..."f."
     - Continuation lines are appended to the previous segment
-
-    NEW: If the question stem line contains inline parts like "a. ... b. ... c. ...",
-         we split those into cur["parts"] immediately so parts advance one-at-a-time.
+    - Inline "a. ... b. ..." on the question line become separate parts
+    Lines before the first numbered question (course headers etc.) are skipped.
     """
-    out: List[Dict[str, Any]] = []
-    cur: Optional[Dict[str, Any]] = None
-
-    # Inline-part splitter: finds "a." / "b)" etc *inside* a line
-    _INLINE_PART_RE = re.compile(r"(?<!\w)([a-z])[\.\)]\s+", re.IGNORECASE)
-
-    def _split_inline_parts(text: str):
-        """
-        If text contains inline 'a. ... b. ...', return (stem, [part1, part2, ...])
-        where each part is stored as a normal subpart line like "a) ...".
-        If none found, return (text, []).
-        """
-        s = (text or "").strip()
-        matches = list(_INLINE_PART_RE.finditer(s))
-        if not matches:
-            return s, []
-
-        stem = s[: matches[0].start()].strip()
-
-        parts: List[str] = []
-        for i, m in enumerate(matches):
-            letter = m.group(1).lower()
-            start = m.end()
-            end = matches[i + 1].start() if i + 1 < len(matches) else len(s)
-            body = s[start:end].strip(" \t-:;")
-            if body:
-                # store in the same style your parser already expects for subparts
-                parts.append(f"{letter}) {body}")
-
-        return stem, parts
-
-    def is_q(line: str) -> bool:
-        return bool(_Q_LINE.match(line))
-
-    def is_sub(line: str) -> bool:
-        return bool(_SUB_LINE.match(line))
-
-    started = False
-
-    for raw in lines:
+    cur: Optional[_RecordBuilder] = None
+
+    for line_no, offset, raw in numbered_lines:
         line = raw.strip()
         if not line:
             continue
 
-        if is_q(line):
-            started = True
+        if _Q_LINE.match(line):
             if cur:
-                out.append(cur)
-
-            # ✅ NEW: split inline a/b/c... if they exist in the question line
+                yield cur.build()
             stem, inline_parts = _split_inline_parts(line)
-            cur = {"q": stem, "parts": []}
-            if inline_parts:
-                cur["parts"].extend(inline_parts)
-
+            cur = _RecordBuilder(stem, line_no, offset)
+            for part in inline_parts:
+                cur.add_part(part, line_no)
             continue
 
-        if not started:
+        if cur is None:
             continue
 
-        if cur and is_sub(line):
-            cur["parts"].append(line)
-        elif cur:
-            # continuation
-            if cur["parts"]:
-                cur["parts"][-1] = (cur["parts"][-1] + " " + line).strip()
-            else:
-                cur["q"] = (cur["q"] + " " + line).strip()
+        if _SUB_LINE.match(line):
+            cur.add_part(line, line_no)
         else:
-            cur = {"q": line, "parts": []}
+            cur.add_continuation(line)
 
     if cur:
-        out.append(cur)
+        yield cur.build()
+
+
+def iter_question_records(path: Path) -> Iterator[QuestionRecord]:
+    """
+    Stream a questions file once, yielding QuestionRecord objects as soon as
+    each question is complete. Only the current question is held in memory.
+    """
+    if not path.exists():
+        return
+
+    def numbered():
+        offset = 0
+        with path.open("rb") as fh:
+            for i, raw in enumerate(fh, start=1):
+                yield i, offset, raw.decode("utf-8")
+                offset += len(raw)
+
+    yield from _iter_records(numbered())
+
+
+def _parse_qa_lines(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Convert text lines into [{"q": stem, "parts": [subparts...], "line": n, "offset": b}].
+    Offsets are character offsets here since the lines are already decoded;
+    use iter_question_records() for byte offsets into a file.
+    """
+    def numbered():
+        offset = 0
+        for i, ln in enumerate(lines, start=1):
+            yield i, offset, ln
+            offset += len(ln) + 1
 
-    return out
+    return [rec.as_dict() for rec in _iter_records(numbered())]
 
 def _group_answers(answer_lines: List[str], q_count: int) -> List[List[str]]:
     """
@@ -271,10 +298,9 @@ def load_module_bundle(module_id: str) -> ModuleBundle:
     d_file = mdir / f"{module_id}_diagrams.json"
     t_file = mdir / "title.txt"  # optional nice title
 
-    q_lines = [ln for ln in _read_lines(q_file) if ln.strip()]
-    if not q_lines:
+    questions = [rec.as_dict() for rec in iter_question_records(q_file)]
+    if not questions:
         raise ValueError(f"No questions found in {q_file.name}")
-    questions = _parse_qa_lines(q_lines)
 
     a_lines = [ln for ln in _read_lines(a_file) if ln.strip()]
     answers = _group_answers(a_lines, len(questions))
@@ -0,0 +1,254 @@
+# backend/session_replay.py
+"""
+Record tutoring sessions and replay them headlessly, for performance
+regression testing.
+
+Recording (opt-in, BC351_RECORD_DIR set): every Start / Restart of a
+tutoring session gets a fresh per-session random.Random with a logged seed.
+socratic_followup() draws its encouragement / follow-up choices from that
+RNG, not the global one. Each turn appends one JSON line to
+<dir>/<session>-<n>.jsonl:
+
+  {"type": "session", "seed": 123, "student": "Ada", "module": "module01", "restored": false, ...}
+  {"type": "turn", "t": 4.2, "action": "submit", "ptr": [0, 0], "answer": "...",
+   "choice": null, "output": [["student", "..."], ["tutor", "..."]], "elapsed_ms": 3.1}
+
+  action   submit / diagram / skip / bonus
+  t        seconds since the session started (for paced replay)
+  output   every transcript message the turn added, rendered
+  elapsed  server time from the start of the turn's tutor logic to record_turn()
+           (the handler only; not comparable with replay times, see below)
+
+Replaying drives streamlit_app.py with streamlit's AppTest: same name,
+module, seed and inputs, against a throwaway session DB and event dir. It
+checks that every turn produces the recorded output and reports per-turn
+timing: one AppTest run per turn, i.e. the handling script run plus the
+st.rerun() it triggers, plus AppTest overhead. Only replay timings are
+compared with each other (--save / --baseline between builds); the recorded
+elapsed_ms covers a different span and is kept in the --save JSON only:
+
+  python -m backend.session_replay logs/recordings/*.jsonl --save before.json
+  (check out the new build)
+  python -m backend.session_replay logs/recordings/*.jsonl --baseline before.json
+  python -m backend.session_replay rec.jsonl --pace recorded --speed 4   # recorded think time, 4× faster
+
+Not reproducible, and skipped unless --force: sessions restored from the
+session store (their earlier history isn't in the recording). Rephrased
+follow-ups (BC351_GEN_BACKEND) can also differ when a request misses its
+deadline.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+RECORD_DIR = os.environ.get("BC351_RECORD_DIR", "")
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# ---------- recording ----------
+
+class SessionRecorder:
+    """Appends one session's turns to a JSONL file (one small append per click)."""
+
+    def __init__(self, path: Path, header: Dict[str, Any]):
+        self.path = path
+        self.t0 = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._write({"type": "session", "started": self.t0, **header})
+
+    def _write(self, row: Dict[str, Any]):
+        try:
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print("⚠️ session recording failed:", e)
+
+    def turn(self, action: str, ptr, output, *, answer: Optional[str] = None,
+             choice: Optional[str] = None, elapsed_ms: Optional[float] = None):
+        self._write({
+            "type": "turn",
+            "t": round(time.time() - self.t0, 3),
+            "action": action,
+            "ptr": [ptr.qi, ptr.si],
+            "answer": answer,
+            "choice": choice,
+            "output": [list(m) for m in output],
+            "elapsed_ms": None if elapsed_ms is None else round(elapsed_ms, 2),
+        })
+
+
+def start_session(session_state, session_id: str, student: str, module_id: str, restored: bool):
+    """
+    Give a (re)started tutoring session its own seeded RNG and, when
+    BC351_RECORD_DIR is set, a recorder. A replay pre-sets `replay_seed`.
+    """
+    seed = session_state.get("replay_seed")
+    if seed is None:
+        seed = random.SystemRandom().randrange(1 << 32)
+    session_state.rng = random.Random(seed)
+
+    session_state.recorder = None
+    if RECORD_DIR:
+        n = session_state.get("recording_no", 0) + 1
+        session_state.recording_no = n
+        session_state.recorder = SessionRecorder(
+            Path(RECORD_DIR) / f"{session_id}-{n}.jsonl",
+            {"session": session_id, "seed": seed, "student": student, "module": module_id, "restored": restored},
+        )
+
+
+def load_recording(path: Path):
+    """(header, turns) of one recording file."""
+    header: Dict[str, Any] = {}
+    turns: List[Dict[str, Any]] = []
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("type") == "session":
+                header = row
+            elif row.get("type") == "turn":
+                turns.append(row)
+    return header, turns
+
+
+# ---------- replay ----------
+
+def _button(at, label_prefix: str):
+    for b in at.button:
+        if (b.label or "").startswith(label_prefix):
+            return b
+    raise LookupError(f"no button starting with {label_prefix!r}")
+
+
+def _apply(at, turn: Dict[str, Any]):
+    action = turn["action"]
+    if action == "submit":
+        at.text_area(key="answer_box").input(turn.get("answer") or "")
+        _button(at, "Submit answer").click()
+    elif action == "diagram":
+        at.radio[0].set_value(turn.get("choice"))
+        _button(at, "Submit diagram answer").click()
+    elif action == "skip":
+        _button(at, "Skip").click()
+    elif action == "bonus":
+        _button(at, "Bonus").click()
+    else:
+        raise ValueError(f"unknown action {action!r}")
+
+
+def replay(path: Path, pace: str = "fast", speed: float = 1.0, timeout: float = 30.0) -> Dict[str, Any]:
+    """Re-run one recording. Returns {"file", "turns": [...], "mismatches", "error"}."""
+    from streamlit.testing.v1 import AppTest
+
+    header, turns = load_recording(path)
+    result: Dict[str, Any] = {"file": str(path), "turns": [], "mismatches": 0, "error": None}
+
+    at = AppTest.from_file(str(ROOT / "streamlit_app.py"), default_timeout=timeout)
+    at.session_state["replay_seed"] = header["seed"]
+    at.run()
+    at.sidebar.selectbox[0].set_value(header["module"])
+    at.sidebar.text_input[0].input(header["student"])
+    at.run()
+
+    prev_t = 0.0
+    for i, turn in enumerate(turns):
+        if pace == "recorded":
+            time.sleep(max(0.0, (turn["t"] - prev_t) / speed))
+        prev_t = turn["t"]
+
+        if at.exception:
+            result["error"] = f"turn {i}: {at.exception[0].message}"
+            break
+        state = at.session_state["state"]
+        if [state.ptr.qi, state.ptr.si] != turn["ptr"]:
+            result["error"] = f"turn {i}: at {[state.ptr.qi, state.ptr.si]}, recording at {turn['ptr']}"
+            break
+        n_before = len(at.session_state["messages"])
+        try:
+            _apply(at, turn)
+        except (LookupError, ValueError, IndexError) as e:
+            result["error"] = f"turn {i}: {e}"
+            break
+        t0 = time.perf_counter()
+        at.run()
+        ms = (time.perf_counter() - t0) * 1000.0
+
+        output = [list(m) for m in at.session_state["messages"].render(at.session_state["state"].bundle, start=n_before)]
+        same = output == turn["output"]
+        result["mismatches"] += not same
+        result["turns"].append({"action": turn["action"], "ok": same, "replay_ms": round(ms, 2),
+                                "recorded_ms": turn.get("elapsed_ms"),
+                                "expected": None if same else turn["output"], "got": None if same else output})
+    return result
+
+
+def _fmt_ms(v) -> str:
+    return f"{v:8.1f}" if isinstance(v, (int, float)) else f"{'-':>8}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Replay recorded tutoring sessions headlessly and compare outputs and timing.")
+    ap.add_argument("recordings", nargs="+")
+    ap.add_argument("--pace", choices=["fast", "recorded"], default="fast")
+    ap.add_argument("--speed", type=float, default=1.0, help="with --pace recorded: think-time divisor")
+    ap.add_argument("--save", default="", help="write per-turn timings here (JSON)")
+    ap.add_argument("--baseline", default="", help="earlier --save output to diff timings against")
+    ap.add_argument("--force", action="store_true", help="also replay sessions that were restored from the store")
+    args = ap.parse_args(argv)
+
+    # throwaway state, and never record the replay itself (read at import time)
+    tmp = tempfile.mkdtemp(prefix="bc351-replay-")
+    os.environ["BC351_SESSION_DB"] = os.path.join(tmp, "sessions.sqlite3")
+    os.environ["BC351_EVENT_DIR"] = os.path.join(tmp, "events")
+    os.environ.pop("BC351_RECORD_DIR", None)
+    os.chdir(ROOT)
+
+    baseline = {}
+    if args.baseline:
+        baseline = {r["file"]: r for r in json.loads(Path(args.baseline).read_text())}
+
+    results = []
+    failed = False
+    for rec in args.recordings:
+        path = Path(rec)
+        header, _turns = load_recording(path)
+        if header.get("restored") and not args.force:
+            print(f"⏭️  {path.name}: restored session, not reproducible (use --force)")
+            continue
+        res = replay(path, args.pace, args.speed)
+        results.append(res)
+        base_turns = (baseline.get(res["file"]) or {}).get("turns") or []
+
+        status = "✅" if not res["mismatches"] and not res["error"] else "❌"
+        failed |= status == "❌"
+        total = sum(t["replay_ms"] for t in res["turns"])
+        base_total = sum(t["replay_ms"] for t in base_turns[:len(res["turns"])])
+        delta = f"  Δ {total - base_total:+.1f} ms vs baseline" if base_turns else ""
+        print(f"{status} {path.name}: {len(res['turns'])} turns, {res['mismatches']} mismatches, {total:.1f} ms{delta}")
+        if res["error"]:
+            print(f"   error: {res['error']}")
+        print(f"   {'#':>3} {'action':<8} {'replay':>8} {'baseline':>8}")
+        for i, t in enumerate(res["turns"]):
+            base = base_turns[i]["replay_ms"] if i < len(base_turns) else None
+            print(f"   {i:>3} {t['action']:<8} {_fmt_ms(t['replay_ms'])} {_fmt_ms(base)}"
+                  + ("" if t["ok"] else "   ⚠️ output differs"))
+            if not t["ok"]:
+                print(f"       expected {t['expected']}\n       got      {t['got']}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, ensure_ascii=False, indent=1))
+        print(f"💾 timings saved to {args.save}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+# backend/session_store.py
+"""
+SQLite-backed session persistence with write-behind batching.
+
+save() only drops a snapshot into an in-memory dict keyed by
+(student, module_id) and returns; a background thread wakes every
+`flush_interval` seconds, takes everything pending (so ten clicks by the same
+student between flushes become one row write), and writes it in a single
+transaction. The database runs in WAL mode so restores (reads) never wait on
+the writer.
+
+    store = default_store()
+    store.save("Ada", "module01", snapshot_dict)
+    snap = store.load("Ada", "module01")   # dict or None
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_DB = os.environ.get("BC351_SESSION_DB", "data/sessions.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    student    TEXT NOT NULL,
+    module_id  TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    payload    TEXT NOT NULL,
+    PRIMARY KEY (student, module_id)
+) WITHOUT ROWID;
+"""
+
+
+class SessionStore:
+    def __init__(self, path: str = DEFAULT_DB, flush_interval: float = 0.5):
+        self.path = path
+        self.flush_interval = flush_interval
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._pending: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+        self._writer = threading.Thread(target=self._run, name="session-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # ---------- connections ----------
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections aren't shareable)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- public API ----------
+    def save(self, student: str, module_id: str, payload: Dict[str, Any]):
+        """Queue a snapshot; never touches disk. Later saves replace earlier ones."""
+        with self._lock:
+            self._pending[(student, module_id)] = (time.time(), payload)
+
+    def load(self, student: str, module_id: str) -> Optional[Dict[str, Any]]:
+        """Latest snapshot for this student/module (pending writes win), or None."""
+        with self._lock:
+            queued = self._pending.get((student, module_id))
+        if queued is not None:
+            return queued[1]
+
+        row = self._conn().execute(
+            "SELECT payload FROM sessions WHERE student = ? AND module_id = ?",
+            (student, module_id),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def flush(self) -> int:
+        """Write everything pending now. Returns the number of rows written."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        rows = [
+            (student, module_id, ts, json.dumps(payload, ensure_ascii=False, separators=(",", ":")))
+            for (student, module_id), (ts, payload) in batch.items()
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (student, module_id, updated_at, payload) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            # put the batch back unless newer snapshots arrived meanwhile
+            with self._lock:
+                for key, val in batch.items():
+                    self._pending.setdefault(key, val)
+            raise
+        return len(rows)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+    # ---------- background writer ----------
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print("⚠️ session store flush failed:", e)
+
+
+# ---------- Streamlit session snapshot helpers ----------
+
+def snapshot_session(session_state) -> Dict[str, Any]:
+    """Plain-JSON snapshot of one student's tutoring state (pointer, history, transcript)."""
+    state = session_state.state
+    mid = state.module_id
+
+    def per_question(d):
+        return {str(qi): v for (m, qi), v in (d or {}).items() if m == mid}
+
+    return {
+        "state": state.to_dict(),
+        "messages": session_state.messages.to_dict(),
+        "answer_history": {qi: list(h.segments) for qi, h in per_question(session_state.get("answer_history")).items()},
+        "uncertain_counts": per_question(session_state.get("uncertain_counts")),
+        "gibberish_counts": per_question(session_state.get("gibberish_counts")),
+    }
+
+
+def restore_session(session_state, snap: Dict[str, Any], bundle) -> bool:
+    """Rebuild session_state from a snapshot. Returns False if it doesn't fit the bundle."""
+    try:
+        from backend.tutor_state import TutorState
+        from backend.transcript import Transcript
+        from backend.answer_history import AnswerHistory
+    except Exception:
+        from tutor_state import TutorState
+        from transcript import Transcript
+        from answer_history import AnswerHistory
+
+    try:
+        state = TutorState.from_dict(snap["state"], bundle)
+        if not (0 <= state.ptr.qi < len(bundle.questions)):
+            return False
+        messages = Transcript.from_dict(snap["messages"])
+    except (KeyError, TypeError, ValueError):
+        return False
+
+    mid = state.module_id
+    session_state.state = state
+    session_state.messages = messages
+    session_state.answer_history = {
+        (mid, int(qi)): AnswerHistory(segs) for qi, segs in snap.get("answer_history", {}).items()
+    }
+    session_state.uncertain_counts = {(mid, int(qi)): n for qi, n in snap.get("uncertain_counts", {}).items()}
+    session_state.gibberish_counts = {(mid, int(qi)): n for qi, n in snap.get("gibberish_counts", {}).items()}
+    return True
+
+
+@lru_cache(maxsize=1)
+def default_store() -> SessionStore:
+    """Process-wide store shared by every Streamlit session."""
+    return SessionStore(DEFAULT_DB)
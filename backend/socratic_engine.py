@@ -2,18 +2,26 @@
 """
 This version keeps a minimal interface so your app stays fast.
 We DON’T generate new concepts; we only rephrase a focused question if needed.
-Concept-grounded Socratic followups driven by moduleXX_answers.json.
+Concept-grounded Socratic followups driven by moduleXX_answers.json (or,
+for questions it doesn't cover, keyphrases of the official answer text;
+see keyphrase_index.grounded_spec).
 
 Returns:
   - str follow-up message, or
   - None if all required concepts are covered (so UI can advance)
 """
-from typing import List
+from typing import List, NamedTuple
 import re
 import random
-import streamlit as st
-from concept_check import evaluate_concepts, is_uncertain, is_gibberish
-from biochem_concepts import BIO_CONCEPTS
+# Robust imports (works whether you run as package or loose files)
+try:
+    from backend.concept_check import missing_for_spec, load_concept_spec
+    from backend.keyphrase_index import grounded_spec
+    from backend.hf_model import FOLLOWUP_TEMPLATES
+except Exception:
+    from concept_check import missing_for_spec, load_concept_spec
+    from keyphrase_index import grounded_spec
+    from hf_model import FOLLOWUP_TEMPLATES
 
 # ---------------------------------------------------------
 # 🔍Smart semantic matching for key concepts
@@ -36,6 +44,127 @@ def gibberish_message() -> str:
         "Try again using a short sentence (a few real words), or click **Skip / Next Question ⏭️**."
     )
 
+class FollowupRef(NamedTuple):
+    """
+    Compact pointer to a templated follow-up in moduleXX_answers.json.
+    kind is "followups" or "wrong_triggers"; name is the concept / wrong value.
+    Index -1 means "the default text" (no list in the spec), -2 means the
+    entry was a plain string rather than a list. kind "keyphrases" is a
+    keyphrase-spec concept; text_idx then indexes hf_model.FOLLOWUP_TEMPLATES.
+    """
+    spec_key: str
+    kind: str
+    name: str
+    enc_idx: int
+    text_idx: int
+
+
+DEFAULT_ENCOURAGEMENT = "Keep going — you're on the right track."
+DEFAULT_FOLLOWUP = "What part of the mechanism is still unclear?"
+
+
+def _pick(options, rng=None) -> int:
+    """
+    Index of a random entry, or -1 when there is nothing to pick from.
+    Pass a seeded random.Random as `rng` to make the choice reproducible.
+    """
+    return (rng or random).randrange(len(options)) if options else -1
+
+
+def render_followup(module_id: str, ref: FollowupRef) -> str:
+    """Materialize a FollowupRef back into the text socratic_followup returns."""
+    if ref.kind == "keyphrases":
+        return FOLLOWUP_TEMPLATES[ref.text_idx].format(concept=ref.name)
+    spec = load_concept_spec(module_id).get(ref.spec_key) or {}
+
+    encouragement_list = spec.get("encouragement", []) or []
+    encouragement = encouragement_list[ref.enc_idx] if ref.enc_idx >= 0 else DEFAULT_ENCOURAGEMENT
+
+    entry = (spec.get(ref.kind, {}) or {}).get(ref.name)
+    if ref.text_idx >= 0:
+        follow_text = entry[ref.text_idx]
+    elif ref.text_idx == -2:
+        follow_text = entry.strip() if ref.kind == "wrong_triggers" else entry
+    else:
+        follow_text = DEFAULT_FOLLOWUP
+
+    return f"{encouragement} {follow_text}"
+
+
+class WrongTriggerMatcher:
+    """
+    All of a spec's wrong_triggers compiled into one regex, scanned once.
+
+    Each trigger is a zero-width lookahead alternative, so every start
+    position is tried once and reports the earliest-listed trigger matching
+    there; the minimum over the scan is exactly the first trigger (in
+    answers.json order) that occurs anywhere in the answer.
+      numeric triggers ("6.0"): digit-boundary guard, so 6.0 ≠ 16.05
+      text triggers:            plain substring of the lowercased answer
+    Triggers without a usable prompt are left out at compile time.
+    """
+    __slots__ = ("triggers", "pattern")
+
+    def __init__(self, wrong_triggers: dict):
+        self.triggers = []
+        alts = []
+        for wrong_val, prompts in wrong_triggers.items():
+            wrong_s = str(wrong_val).strip()
+            usable = (isinstance(prompts, list) and prompts) or (isinstance(prompts, str) and prompts.strip())
+            if not wrong_s or not usable:
+                continue
+            if re.search(r"\d", wrong_s):
+                alt = rf"(?<!\d){re.escape(wrong_s)}(?!\d)"
+            else:
+                alt = re.escape(wrong_s.lower())
+            alts.append(f"(?P<t{len(self.triggers)}>{alt})")
+            self.triggers.append((wrong_val, prompts))
+        self.pattern = re.compile("(?=" + "|".join(alts) + ")") if alts else None
+
+    def hits(self, latest_answer: str) -> List[str]:
+        """
+        Wrong values found in one scan, in answers.json order. Where two
+        triggers start at the same position only the earlier-listed one counts.
+        """
+        if self.pattern is None:
+            return []
+        latest = (latest_answer or "").lower().strip()
+        found = {int(m.lastgroup[1:]) for m in self.pattern.finditer(latest)}
+        return [self.triggers[i][0] for i in sorted(found)]
+
+    def first_hit(self, latest_answer: str):
+        """(wrong_val, prompts) of the first listed trigger found, or None."""
+        if self.pattern is None:
+            return None
+        latest = (latest_answer or "").lower().strip()
+        best = None
+        for m in self.pattern.finditer(latest):
+            idx = int(m.lastgroup[1:])
+            if best is None or idx < best:
+                best = idx
+                if best == 0:
+                    break
+        return None if best is None else self.triggers[best]
+
+
+_MATCHER_CACHE: dict = {}
+
+def wrong_trigger_matcher(module_id: str, spec_key: str, spec: dict):
+    """
+    Compiled matcher for one spec, built the first time the spec is used and
+    reused until load_concept_spec() hands out a freshly loaded spec dict
+    (only after refresh_concept_spec() saw answers.json change).
+    """
+    key = (module_id, spec_key)
+    cached = _MATCHER_CACHE.get(key)
+    if cached is not None and cached[0] is spec:
+        return cached[1]
+    wrong_triggers = spec.get("wrong_triggers", {}) or {}
+    matcher = WrongTriggerMatcher(wrong_triggers) if isinstance(wrong_triggers, dict) and wrong_triggers else None
+    _MATCHER_CACHE[key] = (spec, matcher)
+    return matcher
+
+
 def socratic_followup(
     module_id: str,
     qid: int,                 # 0-based
@@ -48,23 +177,37 @@ def socratic_followup(
     uncertain_count: int = 0,
     gibberish_now: bool = False,
     gibberish_count: int = 0,
+    as_ref: bool = False,
+    history=None,
+    missing=None,
+    rng=None,
+    resolved=None,
 ):
+    """
+    Returns the follow-up text, or None when all required concepts are covered.
+    With as_ref=True, templated follow-ups come back as a FollowupRef instead
+    of text (fixed guardrail messages are still returned as strings).
+    If an AnswerHistory is passed as `history`, concepts are evaluated
+    incrementally from it and `student_answer` is ignored. If `missing`
+    (required concepts still missing) is passed, no matching happens
+    here at all. `rng` (a random.Random)
+    drives the encouragement / follow-up choice; with the same seed, the
+    same answers get the same follow-ups (session replay). `resolved` is a
+    (spec_key, spec) pair the caller already got from grounded_spec().
+    """
     text = (student_answer or "").strip()
 
     # 1) Pull concept spec + missing concepts
     # ✅ qid stays 0-based here.
-    # ✅ part_idx is passed if concept_check supports it; otherwise we fall back cleanly.
-    try:
-        missing_required, _missing_optional, spec = evaluate_concepts(
-            module_id,
-            qid,
-            text,
-            part_idx=part_idx,
-            stem=stem,
-        )
-    except TypeError:
-        # Older concept_check.evaluate_concepts signature (no part_idx)
-        missing_required, _missing_optional, spec = evaluate_concepts(module_id, qid, text)
+    spec_key, spec = resolved if resolved is not None else grounded_spec(module_id, qid, part_idx, stem)
+    if not spec:
+        missing_required = []
+    elif missing is not None:
+        missing_required = list(missing)
+    elif history is not None:
+        missing_required, _missing_optional = history.missing(spec_key, spec)
+    else:
+        missing_required, _missing_optional = missing_for_spec(spec, text)
 
     # 2) ✅ Gibberish guardrail (ONLY based on latest submission)
     if gibberish_now:
@@ -88,59 +231,45 @@ def socratic_followup(
     if not spec:
         return "Nice start — can you add one more molecular detail?"
 
+    ref = None
+
     # If they used a known wrong numeric answer, ask the targeted follow-up.
     # Only run this if we *still* have missing required concepts.
-    latest = (latest_answer or "").lower().strip()
-    wrong_triggers = spec.get("wrong_triggers", {}) or {}
-    if missing_required and isinstance(wrong_triggers, dict):
-        for wrong_val, prompts in wrong_triggers.items():
-            wrong_s = str(wrong_val).strip()
-            if not wrong_s:
-                continue
+    if missing_required:
+        matcher = wrong_trigger_matcher(module_id, spec_key, spec)
+        hit = matcher.first_hit(latest_answer) if matcher else None
+        if hit is not None:
+            wrong_val, prompts = hit
+            # pick a follow-up prompt tied to that wrong value
+            text_idx = _pick(prompts, rng) if isinstance(prompts, list) else -2
+            encouragement_list = spec.get("encouragement", []) or []
+            ref = FollowupRef(spec_key, "wrong_triggers", wrong_val, _pick(encouragement_list, rng), text_idx)
 
-            # numeric triggers: keep the digit-boundary guard
-            if re.search(r"\d", wrong_s):
-                hit = re.search(rf"(?<!\d){re.escape(wrong_s)}(?!\d)", latest)
-            else:
-                # text triggers: simple substring is best
-                hit = wrong_s.lower() in latest
-
-            if hit:
-                # pick a follow-up prompt tied to that wrong value
-                if isinstance(prompts, list) and prompts:
-                    follow_text = random.choice(prompts)
-                elif isinstance(prompts, str) and prompts.strip():
-                    follow_text = prompts.strip()
-                else:
-                    follow_text = ""
-
-                if follow_text:
-                    encouragement_list = spec.get("encouragement", []) or []
-                    encouragement = (
-                        random.choice(encouragement_list)
-                        if encouragement_list
-                        else "Keep going — you're on the right track."
-                    )
-                    return f"{encouragement} {follow_text}"
-
-    # 5) If all REQUIRED concepts covered → advance
-    if not missing_required:
-        return None
-
-    # 6) Ask targeted followup
-    concept = missing_required[0]
-    encouragement_list = spec.get("encouragement", []) or []
-    encouragement = random.choice(encouragement_list) if encouragement_list else "Keep going — you're on the right track."
+    if ref is None:
+        # 5) If all REQUIRED concepts covered → advance
+        if not missing_required:
+            return None
 
-    followups_map = spec.get("followups", {}) or {}
-    follow_entry = followups_map.get(concept)
+        # 6) Ask targeted followup
+        concept = missing_required[0]
+        if spec.get("source") == "keyphrases":
+            # extracted from the answer text: no hand-written follow-ups to point at
+            ref = FollowupRef(spec_key, "keyphrases", concept, -1, _pick(FOLLOWUP_TEMPLATES, rng))
+            return ref if as_ref else render_followup(module_id, ref)
 
-    if isinstance(follow_entry, list):
-        follow_text = random.choice(follow_entry) if follow_entry else ""
-    else:
-        follow_text = follow_entry or ""
+        encouragement_list = spec.get("encouragement", []) or []
+        enc_idx = _pick(encouragement_list, rng)
 
-    if not follow_text:
-        follow_text = "What part of the mechanism is still unclear?"
+        followups_map = spec.get("followups", {}) or {}
+        follow_entry = followups_map.get(concept)
 
-    return f"{encouragement} {follow_text}"
+        if isinstance(follow_entry, list):
+            text_idx = _pick(follow_entry, rng)
+        elif follow_entry:
+            text_idx = -2
+        else:
+            text_idx = -1
+
+        ref = FollowupRef(spec_key, "followups", concept, enc_idx, text_idx)
+
+    return ref if as_ref else render_followup(module_id, ref)
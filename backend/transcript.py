@@ -0,0 +1,140 @@
+# backend/transcript.py
+"""
+Compact chat transcript.
+
+Instead of keeping every rendered message, entries are small tuples:
+  ("q", qi, si)                               question text → rebuilt from the bundle
+  ("f", FollowupRef)                          templated follow-up → rebuilt from answers.json
+  ("t", role, text)                           everything else (student answers, fixed lines)
+  ("t", role, text, marks)                    answer with concept spans to highlight,
+                                              marks = ((start, end, concept), ...)
+
+Question stems and follow-up templates live once in the cached module bundle /
+concept spec, so a long session only pays for what the student typed.
+Text is materialized in render().
+"""
+from __future__ import annotations
+
+import html
+import sys
+from typing import Iterable, Iterator, List, Tuple
+
+try:
+    from backend.question_loader import ModuleBundle, QuestionPointer
+    from backend.socratic_engine import FollowupRef, render_followup
+except Exception:
+    from question_loader import ModuleBundle, QuestionPointer
+    from socratic_engine import FollowupRef, render_followup
+
+
+class Transcript:
+    __slots__ = ("module_id", "entries")
+
+    def __init__(self, module_id: str):
+        self.module_id = module_id
+        self.entries: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ---------- appending ----------
+    def add_text(self, role: str, text: str):
+        self.entries.append(("t", role, text))
+
+    def mark(self, index: int, marks: Iterable[Tuple[int, int, str]]):
+        """Attach concept spans to the text entry at `index` (no-op if there are none)."""
+        marks = tuple((int(a), int(b), c) for a, b, c in marks)
+        entry = self.entries[index]
+        if marks and entry[0] == "t":
+            self.entries[index] = ("t", entry[1], entry[2], marks)
+
+    def add_question(self, ptr: QuestionPointer):
+        self.entries.append(("q", ptr.qi, ptr.si))
+
+    def add_tutor(self, follow):
+        """Add a socratic_followup(as_ref=True) result: FollowupRef or plain str."""
+        if isinstance(follow, str):
+            self.entries.append(("t", "tutor", follow))
+        else:
+            self.entries.append(("f", FollowupRef(*follow)))
+
+    # ---------- rendering ----------
+    def render(self, bundle: ModuleBundle, highlight: bool = False, start: int = 0) -> Iterator[Tuple[str, str]]:
+        """
+        Yield (role, text) pairs, building referenced text on the fly.
+        With highlight=True (output goes into HTML), student text is always
+        HTML-escaped, and marked answers get <mark> spans.
+        `start` skips the first entries (e.g. only what the last turn added).
+        """
+        for entry in self.entries[start:]:
+            yield self.render_entry(bundle, entry, highlight)
+
+    def render_entry(self, bundle: ModuleBundle, entry: tuple, highlight: bool = False) -> Tuple[str, str]:
+        """(role, text) for one entry; raises if a question / follow-up reference no longer resolves."""
+        kind = entry[0]
+        if kind == "q":
+            return "tutor", bundle.question_text(QuestionPointer(entry[1], entry[2]))
+        if kind == "f":
+            return "tutor", render_followup(self.module_id, entry[1])
+        if highlight and len(entry) > 3:
+            return entry[1], highlight_html(entry[2], entry[3])
+        if highlight and entry[1] == "student":
+            return entry[1], html.escape(entry[2])
+        return entry[1], entry[2]
+
+    # ---------- persistence ----------
+    def to_dict(self) -> dict:
+        rows = []
+        for entry in self.entries:
+            if entry[0] == "f":
+                rows.append(["f", *entry[1]])
+            elif len(entry) > 3:
+                rows.append([*entry[:3], [list(m) for m in entry[3]]])
+            else:
+                rows.append(list(entry))
+        return {"module_id": self.module_id, "entries": rows}
+
+    @staticmethod
+    def from_dict(d: dict) -> "Transcript":
+        t = Transcript(d["module_id"])
+        for row in d.get("entries", []):
+            if row[0] == "f":
+                t.entries.append(("f", FollowupRef(*row[1:])))
+            elif len(row) > 3:
+                t.entries.append((*row[:3], tuple(tuple(m) for m in row[3])))
+            else:
+                t.entries.append(tuple(row))
+        return t
+
+    # ---------- accounting ----------
+    def nbytes(self) -> int:
+        """
+        Approximate per-session memory: the entry list, each tuple, and the
+        text stored in it. Question/follow-up text referenced from the shared
+        bundle and spec is not counted, since every session shares it.
+        """
+        total = sys.getsizeof(self.entries)
+        for entry in self.entries:
+            total += sys.getsizeof(entry)
+            if entry[0] == "t":
+                total += sys.getsizeof(entry[2])
+                if len(entry) > 3:
+                    total += sys.getsizeof(entry[3]) + sum(sys.getsizeof(m) for m in entry[3])
+            elif entry[0] == "f":
+                total += sys.getsizeof(entry[1])
+        return total
+
+
+def highlight_html(text: str, marks) -> str:
+    """`text` HTML-escaped, with each (start, end, concept) span wrapped in <mark>."""
+    out: List[str] = []
+    pos = 0
+    for start, end, concept in sorted(marks):
+        start = max(start, pos)
+        if start >= end:
+            continue  # overlaps a span already marked
+        out.append(html.escape(text[pos:start]))
+        out.append(f"<mark title=\"{html.escape(concept)}\">{html.escape(text[start:end])}</mark>")
+        pos = end
+    out.append(html.escape(text[pos:]))
+    return "".join(out)
@@ -0,0 +1,52 @@
+import os
+import sys
+from pathlib import Path
+
+import streamlit as st
+
+# ✅ Ensure backend is importable (same as the main app)
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "backend"))
+
+from backend.live_stats import live_stats
+
+st.set_page_config(page_title="📡 Instructor Dashboard", page_icon="📡", layout="wide")
+st.title("📡 Live class dashboard")
+
+# ---------- access key (required: this page is listed in every student's sidebar) ----------
+INSTRUCTOR_KEY = os.environ.get("BC351_INSTRUCTOR_KEY", "")
+if not INSTRUCTOR_KEY:
+    st.info("The live dashboard is turned off. Set BC351_INSTRUCTOR_KEY on the server to enable it.")
+    st.stop()
+if st.sidebar.text_input("Instructor key", type="password") != INSTRUCTOR_KEY:
+    st.info("Enter the instructor key in the sidebar to view live class activity.")
+    st.stop()
+
+module_filter = st.sidebar.text_input("Module filter (e.g. module01)", "").strip() or None
+refresh_s = st.sidebar.slider("Refresh every (seconds)", 2, 30, 5)
+show_roster = st.sidebar.checkbox("Show student roster", value=False)
+
+
+@st.fragment(run_every=refresh_s)
+def live_panel():
+    stats = live_stats()
+    stats.expire_idle()
+
+    c1, c2 = st.columns(2)
+    c1.metric("Active students", stats.active_sessions())
+    c2.metric("Submits (this server)", stats.submits)
+
+    st.subheader("Where students are")
+    rows = stats.question_rows(module_filter)
+    if rows:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    else:
+        st.caption("No active sessions yet.")
+
+    if show_roster:
+        st.subheader("Roster")
+        st.dataframe(stats.roster(module_filter), use_container_width=True, hide_index=True)
+
+
+live_panel()
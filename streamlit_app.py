@@ -1,6 +1,9 @@
 import streamlit as st
 from pathlib import Path
+import html
 import sys
+import time
+import uuid
 
 # ✅ Ensure backend is importable in Streamlit Cloud
 sys.path.append(str(Path(__file__).parent))
@@ -8,37 +11,58 @@ sys.path.append(str(Path(__file__).parent / "backend"))
 
 # backend imports
 from backend.tutor_state import TutorState
-from backend.question_loader import load_module_bundle, next_pointer, QuestionPointer
+from backend.question_loader import load_module_bundle, next_pointer
 from backend.diagram_loader import diagram_for_pointer, diagram_image_path
 
-from backend.socratic_engine import socratic_followup
-from backend.concept_check import is_uncertain, is_gibberish, load_concept_spec
-load_concept_spec.cache_clear()
-
-#from backend.hf_model import init_hf, hf_socratic
-
-
-# ---------- PAGE CONFIG ----------
-st.set_page_config(
-    page_title="🧬 BC351 Learning Assistant",
-    page_icon="🧬",
-    layout="wide"
-)
+from backend.socratic_engine import socratic_followup, render_followup
+from backend.generation import default_scheduler, rephrase_followup
+from backend.transcript import Transcript
+from backend.answer_history import AnswerHistory
+from backend.input_guard import guard_answer, notice as truncation_notice
+from backend.session_store import default_store, snapshot_session, restore_session
+from backend.concept_check import classify_text, refresh_concept_spec, question_key
+from backend.keyphrase_index import grounded_key, grounded_spec
+from backend.event_log import default_log, FLAG_UNCERTAIN, FLAG_GIBBERISH, FLAG_CORRECT
+from backend.live_stats import live_stats
+from backend.live_hints import LIVE_HINTS_DEFAULT, LiveMatcher
+from backend.eval_service import eval_client
+from backend.module_catalog import module_catalog
+from backend.profiler import default_profiler
+from backend.metrics import metrics_exporter, Stopwatch, TURNS, DIAGRAM_ANSWERS
+from backend.session_replay import start_session
+
+#from backend.hf_model import init_hf, hf_socratic  (grounding: keyphrase_index.grounded_spec; generation: backend.generation)
+
+
+# 🔬 opt-in sampled profiling (BC351_PROFILE_RATE): the capture covers the whole script run and is
+# closed in the `finally` at the bottom, also when the run ends in st.rerun() / st.stop() / an error.
+# Fragment reruns don't execute this module-level code, so they never open one.
+profiler = default_profiler()
+run_capture = profiler.start(session=st.session_state.get("session_id")) if profiler else None
+run_kind = "render"  # handlers relabel the run (submit, diagram, skip, bonus) before st.rerun()
+
+try:
+    # ---------- PAGE CONFIG ----------
+    st.set_page_config(
+        page_title="🧬 BC351 Learning Assistant",
+        page_icon="🧬",
+        layout="wide"
+    )
 
-st.warning("🚧 Development Build — features may change")
+    st.warning("🚧 Development Build — features may change")
 
-# -------------------------------------------------------
-# Safe reset of the answer box BEFORE rendering widgets
-# -------------------------------------------------------
-if "clear_box" not in st.session_state:
-    st.session_state.clear_box = False
+    # -------------------------------------------------------
+    # Safe reset of the answer box BEFORE rendering widgets
+    # -------------------------------------------------------
+    if "clear_box" not in st.session_state:
+        st.session_state.clear_box = False
 
-if st.session_state.clear_box:
-    st.session_state.answer_box = ""
-    st.session_state.clear_box = False
+    if st.session_state.clear_box:
+        st.session_state.answer_box = ""
+        st.session_state.clear_box = False
 
-# minimalist CSS
-st.markdown("""
+    # minimalist CSS
+    st.markdown("""
 <style>
 .chat-bubble {
     padding: .7rem .9rem;
@@ -54,280 +78,468 @@ st.markdown("""
     background: #e8e8ff;
     margin-right: auto;
 }
+.student mark {
+    background: #fff2a8;
+    padding: 0 .1rem;
+    border-radius: .2rem;
+}
 </style>
 """, unsafe_allow_html=True)
 
-# ✅ global model init (loaded once per session, not each turn)
-#if "llm" not in st.session_state:
-    #st.session_state.llm = init_hf()
+    # ✅ global model init (loaded once per session, not each turn)
+    #if "llm" not in st.session_state:
+        #st.session_state.llm = init_hf()
 
 
-# ---------- SIDEBAR: name + module ----------
-st.sidebar.title("🧬 BC351 Learning Assistant")
+    # ---------- SIDEBAR: name + module ----------
+    st.sidebar.title("🧬 BC351 Learning Assistant")
 
-student_name = st.sidebar.text_input("Your name")
-modules_dir = Path("modules")
-module_ids = sorted([p.name for p in modules_dir.iterdir() if p.is_dir()])
-module_id = st.sidebar.selectbox("Module", module_ids or ["(no modules)"])
+    student_name = st.sidebar.text_input("Your name")
+    catalog = module_catalog()  # 📚 cached; rescanned only when modules/ or modules.json change
+    module_infos = {m.module_id: m for m in catalog.available()}
+    module_ids = list(module_infos)
+    module_id = st.sidebar.selectbox(
+        "Module", module_ids or ["(no modules)"],
+        format_func=lambda m: f"{m} — {module_infos[m].title}" if m in module_infos else m,
+    )
+    if module_id in module_infos:
+        st.sidebar.caption(module_infos[module_id].summary())
+    upcoming = [m for m in catalog.all() if not m.available]
+    if upcoming:
+        st.sidebar.caption(f"🗓️ {len(upcoming)} more modules coming: " + ", ".join(m.module_id for m in upcoming))
 
-start_clicked = st.sidebar.button("Start / Restart", type="primary")
+    start_clicked = st.sidebar.button("Start / Restart", type="primary")
 
-st.sidebar.markdown("---")
-st.sidebar.info("Tip: Your answers aren’t graded — the tutor helps you think deeper.")
+    live_mode = st.sidebar.toggle(
+        "💡 Live concept hints", value=LIVE_HINTS_DEFAULT,
+        help="Shows which key ideas your draft already covers (updates when you click outside the box or press Ctrl+Enter)."
+    )
 
+    st.sidebar.markdown("---")
+    st.sidebar.info("Tip: Your answers aren’t graded — the tutor helps you think deeper.")
 
-# ---------- Require name + module before running tutor ----------
-if not student_name or module_id not in module_ids:
-    st.info("👋 Enter your name and pick a module to begin.")
-    st.stop()
 
+    # ---------- Require name + module before running tutor ----------
+    if not student_name or module_id not in module_ids:
+        st.info("👋 Enter your name and pick a module to begin.")
+        st.stop()
 
-# ---------- START FLOW ----------
-if "state" not in st.session_state or start_clicked:
-    st.session_state.state = TutorState.empty(student_name, module_id)
+    refresh_concept_spec(module_id)  # 📌 reload answers.json only when it changed on disk
+
+
+    # ---------- START FLOW ----------
+    session_store = default_store()
+    event_log = default_log()
+    default_scheduler()  # 🤖 boots the generation worker early (no-op unless BC351_GEN_BACKEND is set)
+    metrics_exporter()   # 📈 /metrics endpoint or textfile (no-op unless BC351_METRICS_PORT / _FILE is set)
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    t_run = time.perf_counter()
+
+    if "state" not in st.session_state or start_clicked:
+        st.session_state.state = TutorState.empty(student_name, module_id)
+
+        try:
+            bundle = load_module_bundle(module_id)
+            st.session_state.state.bundle = bundle
+
+            # ✅ reconnect / reload: pick up where this student left off (Restart starts fresh)
+            snap = None if start_clicked else session_store.load(student_name, module_id)
+            restored = bool(snap) and restore_session(st.session_state, snap, bundle)
+            if not restored:
+                transcript = Transcript(module_id)
+                transcript.add_text("tutor", f"Welcome, {html.escape(student_name)}! 👋 You selected **{module_id}**.")
+                transcript.add_text("tutor", "First question:")
+                transcript.add_question(st.session_state.state.ptr)
+                st.session_state.messages = transcript
+                session_store.save(student_name, module_id, snapshot_session(st.session_state))
+            # 🎲 seeded RNG for follow-up choices (+ optional recording, BC351_RECORD_DIR)
+            start_session(st.session_state, session_id, student_name, module_id, restored)
+        except Exception as e:
+            st.error(f"Error loading module: {e}")
+            st.stop()
+
+        st.session_state.clear_box = True
+        st.rerun()
 
-    try:
-        bundle = load_module_bundle(module_id)
-        st.session_state.state.bundle = bundle
-        st.session_state.messages = [
-            ("tutor", f"Welcome, {student_name}! 👋 You selected **{module_id}**."),
-            ("tutor", "First question:"),
-            ("tutor", st.session_state.state.current_question_text())
-        ]
-    except Exception as e:
-        st.error(f"Error loading module: {e}")
-        st.stop()
+    state: TutorState = st.session_state.state
+    turn_ptr = state.ptr                           # where this run's click happened
+    turn_start = len(st.session_state.messages)    # messages it adds start here
 
-    st.session_state.clear_box = True
-    st.rerun()
 
-state: TutorState = st.session_state.state
+    def current_qkey() -> str:
+        return question_key(state.ptr.qi, state.ptr.si, state.bundle.questions[state.ptr.qi].get("q") or "")
 
-# ---------- LAYOUT ----------
-left, right = st.columns([1.5, 1])
 
-# ----- get diagram spec for this question (if any) -----
-diag = diagram_for_pointer(state.bundle, state.ptr)
-is_diag_mcq = (
-    isinstance(diag, dict)
-    and isinstance(diag.get("images"), dict)
-    and len(diag["images"]) > 0
-    and (diag.get("type") in (None, "mcq"))   # allow missing type
-)
+    def event_qkey() -> str:
+        """
+        The one key events, live stats and profiles use for this position: the
+        spec key its concepts belong to ("1" for 1a when only "1" exists), else
+        the part key. The submit handler's log_key is the same value.
+        """
+        return grounded_key(module_id, state.ptr.qi, state.ptr.si, state.bundle.questions[state.ptr.qi].get("q") or "")
 
-with left:
-    st.subheader("Session")
 
-    # ---------- Answer Input ----------
-    if is_diag_mcq:
-        st.markdown("**Diagram question**")
-        prompt = (diag.get("prompt") or "").strip()
-        if prompt:
-            st.write(prompt)
+    if run_capture is not None:
+        run_capture.meta.update(session=session_id, module=module_id, qkey=event_qkey())
 
-        # unique per question *and subpart*
-        # (qi = question index, si = subpart index; si can be None)
-        si = state.ptr.si if state.ptr.si is not None else 0
-        qkey = f"{module_id}_{state.ptr.qi}_{si}"
-        choice_key = f"diag_choice_{qkey}"
-        form_key = f"diag_form_{qkey}"
 
-        images_dict = diag.get("images") or {}
-        options = list(images_dict.keys())  # ["A","B","C"]
+    def record_turn(action: str, **fields):
+        """Append this run's turn (inputs + the messages it added) to the session recording, if any."""
+        recorder = st.session_state.get("recorder")
+        if recorder is not None:
+            recorder.turn(action, turn_ptr, st.session_state.messages.render(state.bundle, start=turn_start),
+                          elapsed_ms=(time.perf_counter() - t_run) * 1000.0, **fields)
+
+
+    @st.fragment
+    def answer_with_hints():
+        """Answer box + live concept checklist. Edits rerun only this fragment, not the whole script."""
+        draft = st.text_area("Your answer", key="answer_box", placeholder="Type and press Submit…")
+
+        spec_key, spec = grounded_spec(module_id, state.ptr.qi, state.ptr.si, state.bundle.questions[state.ptr.qi].get("q") or "")
+        required = (spec.get("required_concepts") or []) if spec else []
+        if not required:
+            return
+
+        # one matcher per question part; each commit of the box only rescans the edited window
+        cached = st.session_state.get("live_matcher")
+        if cached is None or cached[0] != (module_id, spec_key):
+            cached = st.session_state.live_matcher = ((module_id, spec_key), LiveMatcher(spec))
+        matcher = cached[1]
+        matcher.update(guard_answer(draft).text)
+
+        history = st.session_state.get("answer_history", {}).get((module_id, state.ptr.qi))
+        already = set(required) - set(history.missing(spec_key, spec)[0]) if history else set()
+        covered = matcher.covered(already)
+        st.caption(f"💡 Key ideas covered so far: {len(covered)} / {len(required)}"
+                   + (f" — {', '.join(covered)}" if covered else ""))
+
+
+    # 📡 instructor dashboard: every handler that advances the pointer reruns, so this
+    # one O(1) update per run keeps the class-wide position counters current.
+    live = live_stats()
+    live.set_position(session_id, state.student, module_id, event_qkey())
+
+    # ---------- LAYOUT ----------
+    left, right = st.columns([1.5, 1])
+
+    # ----- get diagram spec for this question (if any) -----
+    diag = diagram_for_pointer(state.bundle, state.ptr)
+    is_diag_mcq = (
+        isinstance(diag, dict)
+        and isinstance(diag.get("images"), dict)
+        and len(diag["images"]) > 0
+        and (diag.get("type") in (None, "mcq"))   # allow missing type
+    )
+
+    with left:
+        st.subheader("Session")
+
+        # ---------- Answer Input ----------
+        if is_diag_mcq:
+            st.markdown("**Diagram question**")
+            prompt = (diag.get("prompt") or "").strip()
+            if prompt:
+                st.write(prompt)
+
+            # unique per question *and subpart*
+            # (qi = question index, si = subpart index; si can be None)
+            si = state.ptr.si if state.ptr.si is not None else 0
+            qkey = f"{module_id}_{state.ptr.qi}_{si}"
+            choice_key = f"diag_choice_{qkey}"
+            form_key = f"diag_form_{qkey}"
+
+            images_dict = diag.get("images") or {}
+            options = list(images_dict.keys())  # ["A","B","C"]
+
+            with st.form(key=form_key):
+                choice = st.radio(
+                    "Choose one:",
+                    options,
+                    key=choice_key,
+                    horizontal=True
+                )
+                col_submit, col_skip, col_bonus = st.columns([1, 1, 1])
+                with col_submit:
+                    submit_diag = st.form_submit_button("Submit diagram answer ✅", use_container_width=True)
+                with col_skip:
+                    skip = st.form_submit_button("Skip / Next Question ⏭️", use_container_width=True)
+                with col_bonus:
+                    bonus = st.form_submit_button("Bonus (optional)", use_container_width=True)
+
+            # disable text-submit path in diagram mode
+            submit = False
+            ans = ""
+
+        else:
+            if live_mode:
+                answer_with_hints()
+                ans = st.session_state.get("answer_box", "")
+            else:
+                ans = st.text_area(
+                    "Your answer",
+                    key="answer_box",
+                    placeholder="Type and press Submit…"
+                )
 
-        with st.form(key=form_key):
-            choice = st.radio(
-                "Choose one:",
-                options,
-                key=choice_key,
-                horizontal=True
-            )
             col_submit, col_skip, col_bonus = st.columns([1, 1, 1])
             with col_submit:
-                submit_diag = st.form_submit_button("Submit diagram answer ✅", use_container_width=True)
+                submit = st.button("Submit answer ✅", use_container_width=True)
             with col_skip:
-                skip = st.form_submit_button("Skip / Next Question ⏭️", use_container_width=True)
+                skip = st.button("Skip / Next Question ⏭️", use_container_width=True)
             with col_bonus:
-                bonus = st.form_submit_button("Bonus (optional)", use_container_width=True)
-
-        # disable text-submit path in diagram mode
-        submit = False
-        ans = ""
+                bonus = st.button("Bonus (optional)", use_container_width=True)
 
-    else:
-        ans = st.text_area(
-            "Your answer",
-            key="answer_box",
-            placeholder="Type and press Submit…"
-        )
+            submit_diag = False
+            choice = None
 
-        col_submit, col_skip, col_bonus = st.columns([1, 1, 1])
-        with col_submit:
-            submit = st.button("Submit answer ✅", use_container_width=True)
-        with col_skip:
-            skip = st.button("Skip / Next Question ⏭️", use_container_width=True)
-        with col_bonus:
-            bonus = st.button("Bonus (optional)", use_container_width=True)
+        # ---------- CHAT DISPLAY ----------
+        for role, msg in st.session_state.messages.render(state.bundle, highlight=True):
+            bubble_class = "student" if role == "student" else "tutor"
+            st.markdown(f"<div class='chat-bubble {bubble_class}'>{msg}</div>", unsafe_allow_html=True)
 
-        submit_diag = False
-        choice = None
+    # ---------- Handle DIAGRAM SUBMIT ----------
+    if submit_diag:
+        watch = Stopwatch()
+        si = state.ptr.si if state.ptr.si is not None else 0
+        qkey = f"{module_id}_{state.ptr.qi}_{si}"
+        choice_key = f"diag_choice_{qkey}"
+        picked = st.session_state.get(choice_key)
 
-    # ---------- CHAT DISPLAY ----------
-    for role, msg in st.session_state.messages:
-        bubble_class = "student" if role == "student" else "tutor"
-        st.markdown(f"<div class='chat-bubble {bubble_class}'>{msg}</div>", unsafe_allow_html=True)
+        st.session_state.messages.add_text("student", f"[Diagram choice: {picked}]")
 
-# ---------- Handle DIAGRAM SUBMIT ----------
-if submit_diag:
-    si = state.ptr.si if state.ptr.si is not None else 0
-    qkey = f"{module_id}_{state.ptr.qi}_{si}"
-    choice_key = f"diag_choice_{qkey}"
-    picked = st.session_state.get(choice_key)
+        correct = (diag.get("correct") or "").strip().upper()
+        is_correct = bool(picked and correct and picked.upper() == correct)
+        event_log.log("diagram", module_id, event_qkey(), session=session_id,
+                      flags=FLAG_CORRECT if is_correct else 0)
+        TURNS.labels(kind="diagram").inc()
+        DIAGRAM_ANSWERS.labels(result="correct" if is_correct else "incorrect").inc()
 
-    st.session_state.messages.append(("student", f"[Diagram choice: {picked}]"))
+        if is_correct:
+            # ✅ use per-question/per-part correct_msg if provided
+            msg = (diag.get("correct_msg") or "✅ Correct! Nice work.").strip()
+            st.session_state.messages.add_text("tutor", msg)
 
-    correct = (diag.get("correct") or "").strip().upper()
+            nxt = next_pointer(state.bundle, state.ptr)
+            if nxt:
+                state.ptr = nxt
+                st.session_state.messages.add_question(state.ptr)
+            else:
+                st.session_state.messages.add_text("tutor", "🎉 You've completed this module!")
 
-    if picked and correct and picked.upper() == correct:
-        # ✅ use per-question/per-part correct_msg if provided
-        msg = (diag.get("correct_msg") or "✅ Correct! Nice work.").strip()
-        st.session_state.messages.append(("tutor", msg))
+            # clear choice so it doesn't persist
+            st.session_state.pop(choice_key, None)
 
-        nxt = next_pointer(state.bundle, state.ptr)
-        if nxt:
-            state.ptr = nxt
-            st.session_state.messages.append(("tutor", state.bundle.question_text(state.ptr)))
         else:
-            st.session_state.messages.append(("tutor", "🎉 You've completed this module!"))
-
-        # clear choice so it doesn't persist
-        st.session_state.pop(choice_key, None)
-
-    else:
-        # ✅ use per-question/per-part incorrect_msg if provided
-        msg = (diag.get("incorrect_msg") or
-               "Not quite — try comparing which groups can donate/accept a proton under biological conditions.").strip()
-        st.session_state.messages.append(("tutor", msg))
-
-    st.rerun()
-
-# ---------- Handle SUBMIT ----------
-if submit and ans.strip():
-    # 1️⃣ Log this answer in the chat
-    st.session_state.messages.append(("student", ans.strip()))
-
-    # 2️⃣ Uncertainty tracking should use ONLY the latest submission
-    uncertain_now = is_uncertain(ans.strip())
-    gibberish_now = is_gibberish(ans.strip())
-
-    # Track uncertainty count per (module, question)
-    ukey = (module_id, state.ptr.qi)  # qid is 0-based
-    if "uncertain_counts" not in st.session_state:
-        st.session_state.uncertain_counts = {}
-    if "gibberish_counts" not in st.session_state:
-        st.session_state.gibberish_counts = {}
-
-    prior_uncertain_count = st.session_state.uncertain_counts.get(ukey, 0)
-    prior_gibberish_count = st.session_state.gibberish_counts.get(ukey, 0)
-    if uncertain_now:
-        st.session_state.uncertain_counts[ukey] = prior_uncertain_count + 1
-    if gibberish_now:
-        st.session_state.gibberish_counts[ukey] = prior_gibberish_count + 1
-
-    # 3️⃣ Accumulate answer history for THIS question (but DO NOT store uncertainty answers)
-    key = (module_id, state.ptr.qi)
-    if "answer_history" not in st.session_state:
-        st.session_state.answer_history = {}
-
-    prev = st.session_state.answer_history.get(key, "")
-
-    if uncertain_now:
-        combined = prev  # keep prior real content only
-    else:
-        combined = (prev + " " + ans.strip()).strip()
-        st.session_state.answer_history[key] = combined
-
-    # 4️⃣ Ask ONE concept-based Socratic follow-up using combined history
-    follow = socratic_followup(
-        module_id,
-        state.ptr.qi,
-        combined,
-        part_idx=state.ptr.si,
-        stem=(state.bundle.questions[state.ptr.qi].get("q") or ""),
-        latest_answer=ans.strip(),
-        uncertain_now=uncertain_now,
-        uncertain_count=prior_uncertain_count,  # count BEFORE this submission
-        gibberish_now=gibberish_now,
-        gibberish_count=prior_gibberish_count,
-    )
+            # ✅ use per-question/per-part incorrect_msg if provided
+            msg = (diag.get("incorrect_msg") or
+                   "Not quite — try comparing which groups can donate/accept a proton under biological conditions.").strip()
+            st.session_state.messages.add_text("tutor", msg)
+
+        session_store.save(state.student, state.module_id, snapshot_session(st.session_state))
+        watch.total("diagram")
+        record_turn("diagram", choice=picked)
+        run_kind = "diagram"
+        st.rerun()
 
-    # 5️⃣ If concepts complete → auto-advance
-    if follow is None:
-        st.session_state.messages.append(
-            ("tutor", "Nice work — you've hit the key biochemical ideas for this question 💪.")
+    # ---------- Handle SUBMIT ----------
+    if submit and ans.strip():
+        t_submit = time.perf_counter()
+        watch = Stopwatch()  # 📈 per-stage latency histograms
+        qkey = current_qkey()
+
+        # 🛡️ Cap oversized pastes before any matching (keeps every step below bounded)
+        guarded = guard_answer(ans)
+        answer = guarded.text
+        watch.lap("guard")
+
+        # 1️⃣ Log this answer in the chat
+        st.session_state.messages.add_text("student", answer)
+        answer_idx = len(st.session_state.messages) - 1
+        if guarded.truncated:
+            st.session_state.messages.add_text("tutor", truncation_notice(guarded))
+
+        # 2️⃣ Uncertainty tracking should use ONLY the latest submission
+        signals = classify_text(answer)
+        uncertain_now = signals.uncertain
+        gibberish_now = signals.gibberish
+        watch.lap("classify")
+
+        # Track uncertainty count per (module, question)
+        ukey = (module_id, state.ptr.qi)  # qid is 0-based
+        if "uncertain_counts" not in st.session_state:
+            st.session_state.uncertain_counts = {}
+        if "gibberish_counts" not in st.session_state:
+            st.session_state.gibberish_counts = {}
+
+        prior_uncertain_count = st.session_state.uncertain_counts.get(ukey, 0)
+        prior_gibberish_count = st.session_state.gibberish_counts.get(ukey, 0)
+        if uncertain_now:
+            st.session_state.uncertain_counts[ukey] = prior_uncertain_count + 1
+        if gibberish_now:
+            st.session_state.gibberish_counts[ukey] = prior_gibberish_count + 1
+
+        # 3️⃣ Accumulate answer history for THIS question (but DO NOT store uncertainty answers)
+        key = (module_id, state.ptr.qi)
+        if "answer_history" not in st.session_state:
+            st.session_state.answer_history = {}
+
+        history = st.session_state.answer_history.get(key)
+        if history is None:
+            history = st.session_state.answer_history[key] = AnswerHistory()
+
+        appended = False
+        if not uncertain_now:
+            appended = history.append(answer)  # keep prior real content only otherwise
+
+        # ⚙️ optional eval service: the new segment is scanned in its worker processes and folded
+        # into the history's coverage (otherwise history.missing() scans it here)
+        stem_text = state.bundle.questions[state.ptr.qi].get("q") or ""
+        spec_key, spec = grounded_spec(module_id, state.ptr.qi, state.ptr.si, stem_text)
+        log_key = spec_key or qkey  # == event_qkey(), from the spec resolved above
+        evaluator = eval_client()
+        if evaluator and appended:
+            evaluator.scan_newest(history, module_id, state.ptr.qi, state.ptr.si, stem_text, spec_key, spec)
+
+        # 4️⃣ Ask ONE concept-based Socratic follow-up using the accumulated history
+        follow = socratic_followup(
+            module_id,
+            state.ptr.qi,
+            "",
+            history=history,
+            part_idx=state.ptr.si,
+            stem=stem_text,
+            latest_answer=answer,
+            uncertain_now=uncertain_now,
+            uncertain_count=prior_uncertain_count,  # count BEFORE this submission
+            gibberish_now=gibberish_now,
+            gibberish_count=prior_gibberish_count,
+            as_ref=True,
+            rng=st.session_state.get("rng"),
+            resolved=(spec_key, spec),
         )
-        nxt = next_pointer(state.bundle, state.ptr)
-        if nxt:
-            state.ptr = nxt
-            st.session_state.messages.append(("tutor", state.bundle.question_text(state.ptr)))
-        else:
-            st.session_state.messages.append(("tutor", "🎉 You've completed this module!"))
-    else:
-        st.session_state.messages.append(("tutor", follow))
-
-    # 6️⃣ Clear the input box on next rerun
-    st.session_state.clear_box = True
-    st.rerun()
-
-# ---------- Handle SKIP ----------
-if skip:
-    nxt = next_pointer(state.bundle, state.ptr)
-    if nxt:
-        state.ptr = nxt
-        st.session_state.messages.append(("tutor", "No problem — we'll move on for now ⏭️"))
-        st.session_state.messages.append(("tutor", state.bundle.question_text(state.ptr)))
-    else:
-        st.session_state.messages.append(("tutor", "🎉 You've reached the end of this module!"))
-    st.session_state.clear_box = True
-    st.rerun()
-
-# ---------- RIGHT PANEL ----------
-with right:
-    st.subheader("Diagram / Info")
-    diag = diagram_for_pointer(state.bundle, state.ptr)
 
-    if isinstance(diag, dict):
-        if diag.get("type") == "mcq" and isinstance(diag.get("images"), dict):
-            imgs = diag["images"]  # {"A":"...", "B":"...", "C":"..."}
-
-            for label, filename in sorted(imgs.items()):
-                st.markdown(f"**{label}**")
-                st.image(
-                    diagram_image_path(module_id, diag, filename),
-                    use_column_width=True
-                )
+        # 📝 log the turn (missing concepts re-read from the history's cached coverage)
+        latest_ok = bool(spec) and appended and history.segments[-1] == answer
+        missing_now = history.missing(spec_key, spec)[0] if spec else []
+        # 🖍️ spans come from the same scan that decided coverage (offsets into the newest segment)
+        matches = history.matches(spec_key, spec) if latest_ok else []
+        watch.lap("evaluate")
+        st.session_state.messages.mark(answer_idx, ((m.start, m.end, m.concept) for m in matches))
+        event_log.log(
+            "submit", module_id, log_key, session=session_id,
+            missing=missing_now, required=(spec.get("required_concepts") or []) if spec else [],
+            elapsed_ms=(time.perf_counter() - t_submit) * 1000.0,
+            flags=(FLAG_UNCERTAIN if uncertain_now else 0) | (FLAG_GIBBERISH if gibberish_now else 0),
+            matched=list(dict.fromkeys((m.concept, m.variant) for m in matches)),
+        )
+        event_log.log("advance" if follow is None else "followup", module_id, log_key, session=session_id)
+        live.set_missing(session_id, module_id, log_key, missing_now)
+        TURNS.labels(kind="submit").inc()
+        TURNS.labels(kind="advance" if follow is None else "followup").inc()
+        watch.lap("log")
+
+        # 5️⃣ If concepts complete → auto-advance
+        if follow is None:
+            st.session_state.messages.add_text(
+                "tutor", "Nice work — you've hit the key biochemical ideas for this question 💪."
+            )
+            nxt = next_pointer(state.bundle, state.ptr)
+            if nxt:
+                state.ptr = nxt
+                st.session_state.messages.add_question(state.ptr)
+            else:
+                st.session_state.messages.add_text("tutor", "🎉 You've completed this module!")
         else:
-            # single-image legacy support
-            img = diag.get("image")
-            if img:
-                st.image(diagram_image_path(module_id, diag, img))
-
-        prompt = (diag.get("prompt") or "").strip()
-        if prompt:
-            st.caption(prompt)
-
-    st.markdown("---")
-    st.subheader("Progress")
-    st.write(
-        f"Q{state.ptr.qi+1} · part {state.ptr.si+1} of {state.bundle.subparts_count(state.ptr.qi)}"
-    )
+            if default_scheduler() is not None and not isinstance(follow, str):
+                # 🤖 optional rephrasing; falls back to the template text past the deadline
+                st.session_state.messages.add_text("tutor", rephrase_followup(
+                    render_followup(module_id, follow), concept=follow.name,
+                    question=state.bundle.question_text(state.ptr), module_id=module_id,
+                ))
+            else:
+                st.session_state.messages.add_tutor(follow)
+
+        watch.lap("respond")
+
+        # 6️⃣ Clear the input box on next rerun
+        st.session_state.clear_box = True
+        session_store.save(state.student, state.module_id, snapshot_session(st.session_state))
+        watch.lap("save")
+        watch.total("submit")
+        record_turn("submit", answer=ans)
+        run_kind = "submit"
+        st.rerun()
 
-    if bonus:
-        bq = state.bundle.bonus_question()
-        if bq:
-            st.session_state.messages.append(("tutor", f"**Bonus question:** {bq}"))
+    # ---------- Handle SKIP ----------
+    if skip:
+        event_log.log("skip", module_id, event_qkey(), session=session_id)
+        TURNS.labels(kind="skip").inc()
+        nxt = next_pointer(state.bundle, state.ptr)
+        if nxt:
+            state.ptr = nxt
+            st.session_state.messages.add_text("tutor", "No problem — we'll move on for now ⏭️")
+            st.session_state.messages.add_question(state.ptr)
         else:
-            st.session_state.messages.append(("tutor", "No bonus question found."))
+            st.session_state.messages.add_text("tutor", "🎉 You've reached the end of this module!")
+        st.session_state.clear_box = True
+        session_store.save(state.student, state.module_id, snapshot_session(st.session_state))
+        record_turn("skip")
+        run_kind = "skip"
         st.rerun()
 
-st.write("You can end the session anytime. Switching modules restarts.")
+    # ---------- RIGHT PANEL ----------
+    with right:
+        st.subheader("Diagram / Info")
+        diag = diagram_for_pointer(state.bundle, state.ptr)
+
+        if isinstance(diag, dict):
+            if diag.get("type") == "mcq" and isinstance(diag.get("images"), dict):
+                imgs = diag["images"]  # {"A":"...", "B":"...", "C":"..."}
+
+                for label, filename in sorted(imgs.items()):
+                    st.markdown(f"**{label}**")
+                    st.image(
+                        diagram_image_path(module_id, diag, filename),
+                        use_column_width=True
+                    )
+            else:
+                # single-image legacy support
+                img = diag.get("image")
+                if img:
+                    st.image(diagram_image_path(module_id, diag, img))
+
+            prompt = (diag.get("prompt") or "").strip()
+            if prompt:
+                st.caption(prompt)
+
+        st.markdown("---")
+        st.subheader("Progress")
+        st.write(
+            f"Q{state.ptr.qi+1} · part {state.ptr.si+1} of {state.bundle.subparts_count(state.ptr.qi)}"
+        )
+        st.caption(
+            f"Transcript: {len(st.session_state.messages)} messages · "
+            f"{st.session_state.messages.nbytes() / 1024:.1f} KB this session"
+        )
+
+        if bonus:
+            event_log.log("bonus", module_id, event_qkey(), session=session_id)
+            TURNS.labels(kind="bonus").inc()
+            bq = state.bundle.bonus_question()
+            if bq:
+                st.session_state.messages.add_text("tutor", f"**Bonus question:** {bq}")
+            else:
+                st.session_state.messages.add_text("tutor", "No bonus question found.")
+            session_store.save(state.student, state.module_id, snapshot_session(st.session_state))
+            record_turn("bonus")
+            run_kind = "bonus"
+            st.rerun()
+
+    st.write("You can end the session anytime. Switching modules restarts.")
+except Exception:
+    run_kind = "error"
+    raise
+finally:
+    if run_capture is not None:
+        run_capture.stop(run_kind)